@@ -0,0 +1,214 @@
+import bisect
+import re
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# 事件类型：开始任务、完成（或跳过）步骤、完成任务
+TASK_STARTED = 'taskStarted'
+STEP_COMPLETED = 'stepCompleted'
+TASK_COMPLETED = 'taskCompleted'
+EVENT_TYPES = (TASK_STARTED, STEP_COMPLETED, TASK_COMPLETED)
+COMPLETION_TYPES = (STEP_COMPLETED, TASK_COMPLETED)
+
+# 事件：(时间戳秒, 学生ID, 科目ID, 任务ID, 类型, 步骤序号（任务级事件为 -1）, 原始时间字符串)
+Event = Tuple[float, str, str, str, str, int, str]
+
+# 待合并的变化超过全局列表的该比例（且不少于 REBUILD_MIN 条）时整体重新排序，否则逐条二分插入/删除
+REBUILD_FRACTION = 8
+REBUILD_MIN = 1000
+
+_UTC_OFFSET = re.compile(r'([+-])(\d{2}):(\d{2})')
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """ISO 8601 时间（或日期）转为时间戳秒；没有时区的按 UTC，无法解析时返回 None"""
+    if not isinstance(value, str) or not value:
+        return None
+    # 存储的时间都以 Z 结尾，Python 3.11 之前的 fromisoformat 不接受 Z
+    if value[-1] in 'Zz':
+        value = value[:-1] + '+00:00'
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def progress_events(student_id: str, progress: Optional[Dict[str, Any]]) -> List[Event]:
+    """从学生进度中提取带时间的事件（开始任务、完成步骤、完成任务）"""
+    events = []
+    for subject_id, subject_progress in ((progress or {}).get('subjects') or {}).items():
+        for task_id, task in ((subject_progress or {}).get('tasks') or {}).items():
+            if not task:
+                continue
+            started = parse_time(task.get('startedAt'))
+            if started is not None:
+                events.append((started, student_id, subject_id, task_id, TASK_STARTED, -1, task['startedAt']))
+            for step, step_progress in enumerate(task.get('stepProgress') or []):
+                if step_progress and step_progress.get('completed'):
+                    completed = parse_time(step_progress.get('completedAt'))
+                    if completed is not None:
+                        events.append((completed, student_id, subject_id, task_id, STEP_COMPLETED, step,
+                                       step_progress['completedAt']))
+            if task.get('status') == 'completed':
+                completed = parse_time(task.get('completedAt'))
+                if completed is not None:
+                    events.append((completed, student_id, subject_id, task_id, TASK_COMPLETED, -1,
+                                   task['completedAt']))
+    events.sort()
+    return events
+
+
+class ActivityIndex:
+    """按时间排序的学习事件索引（全局一份、每个学生一份），随进度保存增量维护
+
+    最近活动与按日/周统计都是对有序列表的二分定位加区间扫描，不需要遍历全部进度。
+    单个学生的进度变化只产生少量待合并的事件，查询前按二分插入/删除合并到全局列表；
+    变化很多时（如整体重建）直接对全部事件重新排序。
+    """
+
+    def __init__(self):
+        # 学生ID -> 该学生的有序事件
+        self._students: Dict[str, List[Event]] = {}
+        # 全局有序事件；None 表示需要整体重建
+        self._events: Optional[List[Event]] = None
+        # 尚未合并到全局列表的变化：事件 -> +1（新增）/ -1（删除）
+        self._pending: Dict[Event, int] = {}
+        # 版本：实例标识 + 修改次数，用于生成 ETag
+        self._token = uuid.uuid4().hex[:8]
+        self._changes = 0
+
+    @property
+    def version(self) -> str:
+        return f'{self._token}:{self._changes}'
+
+    def set_student(self, student_id: str, progress: Optional[Dict[str, Any]]) -> None:
+        """按学生当前进度替换其事件"""
+        self._replace(student_id, progress_events(student_id, progress))
+
+    def remove_student(self, student_id: str) -> None:
+        self._replace(student_id, [])
+
+    def _replace(self, student_id: str, events: List[Event]) -> None:
+        old = self._students.get(student_id, [])
+        if events == old:
+            return
+        if events:
+            self._students[student_id] = events
+        else:
+            self._students.pop(student_id, None)
+        self._changes += 1
+        if self._events is None:
+            return
+
+        old_set, new_set = set(old), set(events)
+        for event, delta in chain(((e, -1) for e in old_set - new_set), ((e, 1) for e in new_set - old_set)):
+            net = self._pending.get(event, 0) + delta
+            if net:
+                self._pending[event] = net
+            else:
+                self._pending.pop(event, None)
+        if len(self._pending) > max(REBUILD_MIN, len(self._events) // REBUILD_FRACTION):
+            self._events = None
+            self._pending.clear()
+
+    def _global(self) -> List[Event]:
+        """合并待处理的变化后返回全局有序事件"""
+        if self._events is None:
+            self._events = sorted(chain.from_iterable(self._students.values()))
+            self._pending.clear()
+        elif self._pending:
+            events = self._events
+            for event, delta in self._pending.items():
+                if delta > 0:
+                    bisect.insort(events, event)
+                else:
+                    i = bisect.bisect_left(events, event)
+                    if i < len(events) and events[i] == event:
+                        del events[i]
+            self._pending.clear()
+        return self._events
+
+    def _list(self, student_id: Optional[str]) -> List[Event]:
+        return self._students.get(student_id, []) if student_id else self._global()
+
+    def scan(self, start: float, end: float, student_id: Optional[str] = None) -> Iterator[Event]:
+        """时间在 [start, end) 内的事件（按时间顺序）"""
+        events = self._list(student_id)
+        lo = bisect.bisect_left(events, (start,))
+        hi = bisect.bisect_left(events, (end,), lo)
+        for i in range(lo, hi):
+            yield events[i]
+
+    def latest(self, student_id: Optional[str] = None, before: Optional[Tuple[Any, ...]] = None) -> Iterator[Event]:
+        """从新到旧遍历事件；before 为事件键（Event 的前若干项，如 (时间戳,)），只返回排在其前面的事件"""
+        events = self._list(student_id)
+        i = bisect.bisect_left(events, before) if before is not None else len(events)
+        while i > 0:
+            i -= 1
+            yield events[i]
+
+
+def parse_utc_offset(value: str) -> timezone:
+    """解析 +08:00 / -05:30 / Z 形式的时区偏移，无效时抛出 ValueError"""
+    # 查询参数中未编码的 + 会被解码为空格
+    if value.startswith(' '):
+        value = '+' + value[1:]
+    if value in ('Z', 'z', 'UTC'):
+        return timezone.utc
+    match = _UTC_OFFSET.fullmatch(value)
+    if not match or int(match.group(2)) > 14 or int(match.group(3)) >= 60:
+        raise ValueError(f'Invalid timezone offset: {value}')
+    offset = timedelta(hours=int(match.group(2)), minutes=int(match.group(3)))
+    return timezone(-offset if match.group(1) == '-' else offset)
+
+
+def bucket_starts(start: date, end: date, interval: str) -> List[date]:
+    """[start, end] 内各统计区间的起始日期：按日，或按周（周一开始）"""
+    if interval == 'week':
+        first = start - timedelta(days=start.weekday())
+        return [first + timedelta(weeks=i) for i in range((end - first).days // 7 + 1)]
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def summarize(events: Iterable[Event], buckets: List[date], interval: str, tz: timezone,
+              task_minutes: Callable[[str, str], Optional[int]], subject_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """按区间统计完成的任务数、步骤数、学习分钟数（按完成任务的预计用时）与活跃学生数
+
+    task_minutes(科目ID, 任务ID) 返回任务的预计用时，任务已不存在时返回 None（不计入统计）。
+    """
+    origin = datetime.combine(buckets[0], datetime.min.time(), tz).timestamp()
+    width = 86400 * (7 if interval == 'week' else 1)
+    rows = [{'date': day.isoformat(), 'taskCompletions': 0, 'stepCompletions': 0, 'minutes': 0}
+            for day in buckets]
+    students: List[Set[str]] = [set() for _ in buckets]
+    count = len(rows)
+    # (科目ID, 任务ID) -> 预计用时，同一任务的事件只查询一次
+    known: Dict[Tuple[str, str], Optional[int]] = {}
+    for ts, student_id, event_subject, task_id, kind, _step, _raw in events:
+        if kind == TASK_STARTED or (subject_id and event_subject != subject_id):
+            continue
+        key = (event_subject, task_id)
+        if key in known:
+            minutes = known[key]
+        else:
+            minutes = known[key] = task_minutes(event_subject, task_id)
+        if minutes is None:
+            continue
+        i = int((ts - origin) // width)
+        if not 0 <= i < count:
+            continue
+        row = rows[i]
+        if kind == TASK_COMPLETED:
+            row['taskCompletions'] += 1
+            row['minutes'] += minutes
+        else:
+            row['stepCompletions'] += 1
+        students[i].add(student_id)
+    for row, active in zip(rows, students):
+        row['activeStudents'] = len(active)
+    return rows
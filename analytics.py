@@ -0,0 +1,318 @@
+import math
+import statistics
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from activity import parse_time
+from indexes import SubjectIndex
+from metrics import cache_lookup
+
+# 可选依赖：安装了 numpy 时用数组运算汇总，否则使用等价的纯 Python 实现
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 任务进度状态码（未开始的任务没有进度记录）
+IN_PROGRESS = 1
+COMPLETED = 2
+_STATUS_CODES = {'in_progress': IN_PROGRESS, 'completed': COMPLETED}
+
+# 输出的分位数与直方图格数（每格 10%，100% 计入最后一格）
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+# 一条任务进度：(任务ID, 状态码, 从开始到完成的分钟数（未完成或时间缺失时为 None）)
+Entry = Tuple[str, int, Optional[float]]
+
+
+def subject_entries(subject_progress: Optional[Dict[str, Any]]) -> Tuple[Entry, ...]:
+    """从学生某科目的进度中提取进行中与已完成的任务"""
+    entries = []
+    for task_id, task in ((subject_progress or {}).get('tasks') or {}).items():
+        status = _STATUS_CODES.get((task or {}).get('status'))
+        if status is None:
+            continue
+        minutes = None
+        if status == COMPLETED:
+            started, completed = parse_time(task.get('startedAt')), parse_time(task.get('completedAt'))
+            if started is not None and completed is not None and completed >= started:
+                minutes = (completed - started) / 60
+        entries.append((task_id, status, minutes))
+    return tuple(entries)
+
+
+class CohortColumns:
+    """一个科目下全部学生任务进度的列式数据
+
+    每条任务进度占一行，列为学生序号、任务序号、状态码与用时（分钟，未知为 NaN）；
+    安装了 numpy 时各列为数组，否则为列表。不属于当前科目结构的任务被忽略。
+    """
+
+    def __init__(self, index: SubjectIndex, rows: Dict[str, Tuple[Entry, ...]]):
+        self.student_count = len(rows)
+        self.task_ids = list(index.tasks)
+        self.chapter_ids = list(index.chapter_tasks)
+        task_positions = {task_id: i for i, task_id in enumerate(self.task_ids)}
+        chapter_positions = {chapter_id: i for i, chapter_id in enumerate(self.chapter_ids)}
+        # 任务序号 -> 章节序号；各章节的任务数
+        self.task_chapter = [chapter_positions[index.task_location[task_id][1]] for task_id in self.task_ids]
+        self.chapter_sizes = [len(index.chapter_tasks[chapter_id]) for chapter_id in self.chapter_ids]
+
+        students, tasks, statuses, minutes = [], [], [], []
+        for row, entries in enumerate(rows.values()):
+            for task_id, status, spent in entries:
+                col = task_positions.get(task_id)
+                if col is None:
+                    continue
+                students.append(row)
+                tasks.append(col)
+                statuses.append(status)
+                minutes.append(math.nan if spent is None else spent)
+
+        if np is not None:
+            self.students = np.array(students, dtype=np.int64)
+            self.tasks = np.array(tasks, dtype=np.int64)
+            self.statuses = np.array(statuses, dtype=np.int8)
+            self.minutes = np.array(minutes, dtype=np.float64)
+        else:
+            self.students, self.tasks, self.statuses, self.minutes = students, tasks, statuses, minutes
+
+
+def _percent(count: float, total: float) -> float:
+    return count / total * 100 if total else 0.0
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None and not math.isnan(value) else None
+
+
+def _percentile(ordered: Sequence[float], q: float) -> float:
+    """已排序数值的分位数（线性插值，与 numpy.percentile 默认方式一致）"""
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _summary(values: Sequence[float]) -> Dict[str, Any]:
+    """数值的个数、均值与分位数"""
+    if np is not None:
+        values = np.asarray(values, dtype=np.float64)
+        if not values.size:
+            return {'count': 0, 'mean': None, 'percentiles': {f'p{q}': None for q in PERCENTILES}}
+        mean = float(values.mean())
+        points = np.percentile(values, PERCENTILES).tolist()
+    else:
+        values = sorted(values)
+        if not values:
+            return {'count': 0, 'mean': None, 'percentiles': {f'p{q}': None for q in PERCENTILES}}
+        mean = math.fsum(values) / len(values)
+        points = [_percentile(values, q) for q in PERCENTILES]
+    return {
+        'count': len(values),
+        'mean': _round(mean),
+        'percentiles': {f'p{q}': _round(point) for q, point in zip(PERCENTILES, points)}
+    }
+
+
+def _distribution(percents: Sequence[float]) -> Dict[str, Any]:
+    """完成百分比的分布：均值、分位数与直方图"""
+    width = 100 / HISTOGRAM_BINS
+    if np is not None:
+        bins = np.minimum((np.asarray(percents, dtype=np.float64) // width).astype(np.int64), HISTOGRAM_BINS - 1)
+        histogram = np.bincount(bins, minlength=HISTOGRAM_BINS).tolist()
+    else:
+        histogram = [0] * HISTOGRAM_BINS
+        for value in percents:
+            histogram[min(int(value // width), HISTOGRAM_BINS - 1)] += 1
+    summary = _summary(percents)
+    del summary['count']
+    return {**summary, 'histogram': histogram}
+
+
+def _aggregate(columns: CohortColumns) -> Dict[str, Any]:
+    """按学生、章节、任务汇总：完成百分比、各任务进行中/已完成人数与用时"""
+    student_count, task_count, chapter_count = columns.student_count, len(columns.task_ids), len(columns.chapter_ids)
+    if np is not None:
+        completed = columns.statuses == COMPLETED
+        entry_chapters = np.array(columns.task_chapter, dtype=np.int64)[columns.tasks]
+        completed_students = columns.students[completed]
+        per_student = np.bincount(completed_students, minlength=student_count)
+        per_chapter = np.bincount(completed_students * chapter_count + entry_chapters[completed],
+                                  minlength=student_count * chapter_count).reshape(student_count, chapter_count)
+        sizes = np.array(columns.chapter_sizes, dtype=np.float64)
+        chapter_percents = np.divide(per_chapter * 100.0, sizes, out=np.zeros(per_chapter.shape),
+                                     where=sizes > 0)
+
+        # 有完整开始/完成时间的任务：按任务、用时排序后取每组中位数
+        timed = completed & ~np.isnan(columns.minutes)
+        timed_tasks, timed_minutes = columns.tasks[timed], columns.minutes[timed]
+        order = np.lexsort((timed_minutes, timed_tasks))
+        timed_tasks, timed_minutes = timed_tasks[order], timed_minutes[order]
+        counts = np.bincount(timed_tasks, minlength=task_count)
+        sums = np.bincount(timed_tasks, weights=timed_minutes, minlength=task_count)
+        medians = np.full(task_count, np.nan)
+        if timed_minutes.size:
+            starts = np.cumsum(counts) - counts
+            has = counts > 0
+            lower = timed_minutes[(starts + (counts - 1) // 2)[has]]
+            upper = timed_minutes[(starts + counts // 2)[has]]
+            medians[has] = (lower + upper) / 2
+        timed_chapters = entry_chapters[timed]
+        chapter_counts = np.bincount(timed_chapters, minlength=chapter_count)
+        chapter_sums = np.bincount(timed_chapters, weights=columns.minutes[timed], minlength=chapter_count)
+
+        return {
+            'students': per_student * 100.0 / task_count if task_count else np.zeros(student_count),
+            'chapters': [chapter_percents[:, i] for i in range(chapter_count)],
+            'completed': np.bincount(columns.tasks[completed], minlength=task_count).tolist(),
+            'inProgress': np.bincount(columns.tasks[~completed], minlength=task_count).tolist(),
+            'medianMinutes': [None if math.isnan(value) else value for value in medians.tolist()],
+            'meanMinutes': [total / count if count else None for total, count in zip(sums.tolist(), counts.tolist())],
+            'chapterMinutes': [total / count if count else None
+                               for total, count in zip(chapter_sums.tolist(), chapter_counts.tolist())],
+            'minutes': timed_minutes
+        }
+
+    per_student = [0] * student_count
+    per_chapter = [[0] * chapter_count for _ in range(student_count)]
+    completed_counts = [0] * task_count
+    in_progress_counts = [0] * task_count
+    task_minutes: List[List[float]] = [[] for _ in range(task_count)]
+    chapter_minutes: List[List[float]] = [[] for _ in range(chapter_count)]
+    for student, task, status, minutes in zip(columns.students, columns.tasks, columns.statuses, columns.minutes):
+        if status != COMPLETED:
+            in_progress_counts[task] += 1
+            continue
+        chapter = columns.task_chapter[task]
+        per_student[student] += 1
+        per_chapter[student][chapter] += 1
+        completed_counts[task] += 1
+        if not math.isnan(minutes):
+            task_minutes[task].append(minutes)
+            chapter_minutes[chapter].append(minutes)
+
+    return {
+        'students': [_percent(count, task_count) for count in per_student],
+        'chapters': [[_percent(row[i], size) for row in per_chapter] for i, size in enumerate(columns.chapter_sizes)],
+        'completed': completed_counts,
+        'inProgress': in_progress_counts,
+        'medianMinutes': [statistics.median(values) if values else None for values in task_minutes],
+        'meanMinutes': [math.fsum(values) / len(values) if values else None for values in task_minutes],
+        'chapterMinutes': [math.fsum(values) / len(values) if values else None for values in chapter_minutes],
+        'minutes': [minutes for values in task_minutes for minutes in values]
+    }
+
+
+def cohort_report(index: SubjectIndex, columns: CohortColumns) -> Dict[str, Any]:
+    """科目分析：学生完成度分布、各章节完成度分布、完成用时，以及按进行中人数排序的瓶颈任务"""
+    totals = _aggregate(columns)
+    chapters = {
+        chapter.get('id'): (level.get('id'), chapter.get('name'))
+        for level in index.subject.get('levels') or [] for chapter in level.get('chapters') or []
+    }
+
+    bottlenecks = []
+    for i, task_id in enumerate(columns.task_ids):
+        in_progress, completed = totals['inProgress'][i], totals['completed'][i]
+        if not in_progress:
+            continue
+        level_id, chapter_id = index.task_location[task_id]
+        bottlenecks.append({
+            'taskId': task_id,
+            'taskName': index.tasks[task_id].get('name'),
+            'levelId': level_id,
+            'chapterId': chapter_id,
+            'inProgress': in_progress,
+            'completed': completed,
+            'notStarted': columns.student_count - in_progress - completed,
+            'stallRate': round(in_progress / (in_progress + completed), 3),
+            'estimatedTime': index.tasks[task_id].get('estimatedTime'),
+            'medianMinutes': _round(totals['medianMinutes'][i]),
+            'meanMinutes': _round(totals['meanMinutes'][i])
+        })
+    # 进行中人数多的在前，其次是卡住比例高的；sort 稳定，同分时保持课程顺序
+    bottlenecks.sort(key=lambda item: (-item['inProgress'], -item['stallRate']))
+
+    return {
+        'subjectId': index.subject_id,
+        'subjectName': index.subject.get('name'),
+        'engine': 'numpy' if np is not None else 'python',
+        'students': columns.student_count,
+        'tasks': len(columns.task_ids),
+        'progress': _distribution(totals['students']),
+        'completionMinutes': _summary(totals['minutes']),
+        'chapters': [
+            {
+                'id': chapter_id,
+                'name': chapters.get(chapter_id, (None, None))[1],
+                'levelId': chapters.get(chapter_id, (None, None))[0],
+                'tasks': columns.chapter_sizes[i],
+                'progress': _distribution(totals['chapters'][i]),
+                'meanMinutes': _round(totals['chapterMinutes'][i])
+            }
+            for i, chapter_id in enumerate(columns.chapter_ids)
+        ],
+        'bottlenecks': bottlenecks
+    }
+
+
+class CohortIndex:
+    """各科目下每个学生的任务进度（状态与用时），随进度保存增量维护
+
+    只有任务进度真正变化的科目才会更新版本；分析结果按 (科目版本, 科目索引) 缓存，
+    查询时不需要重新读取全部学生的进度。
+    """
+
+    def __init__(self):
+        # 科目ID -> 学生ID -> 该学生在科目下的任务进度
+        self._subjects: Dict[str, Dict[str, Tuple[Entry, ...]]] = {}
+        # 学生ID -> 有进度记录的科目ID
+        self._students: Dict[str, Set[str]] = {}
+        # 版本：实例标识 + 各科目的修改次数
+        self._token = uuid.uuid4().hex[:8]
+        self._changes: Dict[str, int] = {}
+        # 科目ID -> (版本, 科目索引, 分析结果)
+        self._reports: Dict[str, Tuple[str, SubjectIndex, Dict[str, Any]]] = {}
+
+    def version(self, subject_id: str) -> str:
+        return f'{self._token}:{self._changes.get(subject_id, 0)}'
+
+    def set_student(self, student_id: str, progress: Optional[Dict[str, Any]]) -> None:
+        """按学生当前进度替换其在各科目下的任务进度"""
+        current = {
+            subject_id: subject_entries(subject_progress)
+            for subject_id, subject_progress in ((progress or {}).get('subjects') or {}).items()
+        }
+        for subject_id in self._students.get(student_id, set()) - set(current):
+            self._subjects[subject_id].pop(student_id, None)
+            self._touch(subject_id)
+        for subject_id, entries in current.items():
+            rows = self._subjects.setdefault(subject_id, {})
+            if rows.get(student_id) != entries:
+                rows[student_id] = entries
+                self._touch(subject_id)
+        if current:
+            self._students[student_id] = set(current)
+        else:
+            self._students.pop(student_id, None)
+
+    def remove_student(self, student_id: str) -> None:
+        self.set_student(student_id, None)
+
+    def _touch(self, subject_id: str) -> None:
+        self._changes[subject_id] = self._changes.get(subject_id, 0) + 1
+
+    def report(self, index: SubjectIndex) -> Dict[str, Any]:
+        """科目的分析结果；数据与科目结构都未变化时直接返回缓存"""
+        subject_id = index.subject_id
+        version = self.version(subject_id)
+        cached = self._reports.get(subject_id)
+        hit = cached is not None and cached[0] == version and cached[1] is index
+        cache_lookup('analytics', hit)
+        if hit:
+            return cached[2]
+        report = cohort_report(index, CohortColumns(index, self._subjects.get(subject_id, {})))
+        self._reports[subject_id] = (version, index, report)
+        return report
@@ -1,46 +1,194 @@
 
-from flask import Blueprint, jsonify, request
-from models import data_manager
-import uuid
-from datetime import datetime
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context
+from werkzeug.datastructures import ETags
+from models import data_manager, VersionConflict
+from curriculum import CurriculumError, CurriculumNotFound
+from prerequisites import PrerequisiteError
+from events import format_event, format_reset
+from metrics import ERRORS, REGISTRY, cache_lookup
+from serialization import strip_encoding_suffix
+from activity import EVENT_TYPES, parse_utc_offset
+from transfer import RECORD_TYPES, ImportFormatError, open_stream
+from datetime import date, datetime, timedelta
+import base64
+import serialization
+import functools
+import logging
 
 api = Blueprint('api', __name__)
+logger = logging.getLogger(__name__)
 
 # 错误处理装饰器
 def handle_errors(f):
+    """未处理的异常记录日志（含堆栈与请求ID）并按类型计数，返回 500"""
+    @functools.wraps(f)
     def wrapper(*args, **kwargs):
         try:
             return f(*args, **kwargs)
         except Exception as e:
-            return jsonify({'error': str(e)}), 500
-    wrapper.__name__ = f.__name__
+            logger.exception("处理请求 %s %s 时出错", request.method, request.path)
+            ERRORS.inc(1, type(e).__name__, request.url_rule.rule if request.url_rule else 'unmatched')
+            return jsonify({'error': str(e), 'requestId': g.get('request_id')}), 500
     return wrapper
 
+@api.before_request
+def sync_external_changes():
+    """每个请求开始时检查一次其他进程的修改，请求内的计数与统计查询不再访问存储"""
+    data_manager.sync_external_changes()
+
+def _student_from_request(data):
+    """由请求数据构造学生对象（ID 由 DataManager 在事务内分配）"""
+    return {
+        'name': data.get('name'),
+        'avatar': data.get('avatar', '👦'),
+        'subjects': data.get('subjects', []),
+        'grade': data.get('grade', '一年级'),
+        'notes': data.get('notes', '')
+    }
+
+# 条件请求
+def _if_none_match():
+    """If-None-Match 中的版本（去掉压缩编码后缀，按弱比较）"""
+    return ETags([strip_encoding_suffix(tag) for tag in request.if_none_match.as_set(include_weak=True)],
+                 star_tag=request.if_none_match.star_tag)
+
+def _if_match():
+    """If-Match 中的强版本（去掉压缩编码后缀）"""
+    return ETags([strip_encoding_suffix(tag) for tag in request.if_match.as_set()],
+                 star_tag=request.if_match.star_tag)
+
+def _conditional(etag, build):
+    """带强 ETag 的 GET 响应：If-None-Match 命中时直接返回 304，不再构造和序列化响应体"""
+    not_modified = _if_none_match().contains(etag)
+    cache_lookup('conditional_get', not_modified)
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+        if isinstance(response, tuple):
+            return response
+    response.set_etag(etag)
+    # 允许浏览器缓存，但每次使用前都要用 ETag 重新验证
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _version_conflict():
+    return jsonify({'error': 'Resource has been modified, reload and retry'}), 412
+
+# 列表接口的分页与字段投影
+def _requested_fields():
+    """解析 fields=a,b,c 参数，未指定时返回 None（返回全部字段）"""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()} | {'id'}
+
+def _project(item, fields):
+    """只保留请求的字段"""
+    if fields is None:
+        return item
+    return {key: value for key, value in item.items() if key in fields}
+
+def _paginate(items):
+    """按 limit/cursor 取一页，返回 (本页, 下一页游标)；参数无效时抛出 ValueError
+    
+    游标为上一页最后一项ID的编码，翻页期间有增删时不会重复或跳过未变化的项。
+    """
+    cursor = request.args.get('cursor')
+    max_size = current_app.config['MAX_PAGE_SIZE']
+    try:
+        limit = int(request.args.get('limit', max_size))
+    except ValueError:
+        limit = 0
+    if not 0 < limit <= max_size:
+        raise ValueError(f'limit must be between 1 and {max_size}')
+    
+    start = 0
+    if cursor:
+        try:
+            last_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        except ValueError:
+            raise ValueError('Invalid cursor')
+        positions = [i for i, item in enumerate(items) if item['id'] == last_id]
+        if not positions:
+            raise ValueError('Invalid cursor')
+        start = positions[0] + 1
+    
+    page = items[start:start + limit]
+    next_cursor = None
+    if start + limit < len(items):
+        next_cursor = base64.urlsafe_b64encode(page[-1]['id'].encode('utf-8')).decode('ascii').rstrip('=')
+    return page, next_cursor
+
+def _list_response(items, fields, build, item_version=None):
+    """列表响应：传入 limit 或 cursor 时返回 {items, nextCursor}，否则返回数组
+    
+    build(item, fields) 只对当前页的数据调用，计算字段按需生成；
+    ETag 由查询参数、本页对象与 item_version(item) 给出的计算值组成。
+    """
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    next_cursor = None
+    if paginated:
+        try:
+            items, next_cursor = _paginate(items)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    etag = data_manager.make_etag(
+        request.query_string.decode('utf-8'), next_cursor, items,
+        [item_version(item) for item in items] if item_version else None
+    )
+    
+    def build_response():
+        result = [_project(build(item, fields), fields) for item in items]
+        if paginated:
+            return jsonify({'items': result, 'nextCursor': next_cursor})
+        return jsonify(result)
+    
+    return _conditional(etag, build_response)
+
 # 学生相关API
 @api.route('/students', methods=['GET'])
 @handle_errors
 def get_students():
-    """获取所有学生"""
+    """获取学生列表，支持 grade/subject 过滤、limit/cursor 分页与 fields 字段投影"""
     students = data_manager.get_all_students()
     
-    # 为每个学生添加进度信息
-    for student in students:
-        student['overallProgress'] = data_manager.calculate_overall_progress(student['id'])
+    grade = request.args.get('grade')
+    subject_id = request.args.get('subject')
+    if grade:
+        students = [student for student in students if student.get('grade') == grade]
+    if subject_id:
+        students = [student for student in students if subject_id in student.get('subjects', [])]
+    
+    fields = _requested_fields()
+    with_progress = fields is None or 'overallProgress' in fields
+    
+    def build(student, fields):
+        # 复制后再添加进度信息，避免污染缓存；未请求 overallProgress 时不计算
+        if not with_progress:
+            return student
+        return {**student, 'overallProgress': data_manager.calculate_overall_progress(student['id'])}
     
-    return jsonify(students)
+    def item_version(student):
+        return data_manager.calculate_overall_progress(student['id']) if with_progress else None
+    
+    return _list_response(students, fields, build, item_version)
 
 @api.route('/students/<student_id>', methods=['GET'])
 @handle_errors
 def get_student(student_id):
     """获取单个学生"""
-    student = data_manager.get_student_by_id(student_id)
-    if not student:
+    etag = data_manager.student_etag(student_id)
+    if not etag:
         return jsonify({'error': 'Student not found'}), 404
     
-    # 添加进度信息
-    student['overallProgress'] = data_manager.calculate_overall_progress(student_id)
+    def build():
+        # 添加进度信息
+        student = data_manager.get_student_by_id(student_id)
+        return jsonify({**student, 'overallProgress': data_manager.calculate_overall_progress(student_id)})
     
-    return jsonify(student)
+    return _conditional(etag, build)
 
 @api.route('/students', methods=['POST'])
 @handle_errors
@@ -51,17 +199,7 @@ def add_student():
     if not data or not data.get('name'):
         return jsonify({'error': 'Name is required'}), 400
     
-    # 生成唯一ID
-    student_id = f"student_{int(datetime.now().timestamp())}"
-    
-    student_data = {
-        'id': student_id,
-        'name': data['name'],
-        'avatar': data.get('avatar', '👦'),
-        'subjects': data.get('subjects', []),
-        'grade': data.get('grade', '一年级'),
-        'notes': data.get('notes', '')
-    }
+    student_data = _student_from_request(data)
     
     if data_manager.add_student(student_data):
         return jsonify(student_data), 201
@@ -77,8 +215,15 @@ def update_student(student_id):
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
-    if data_manager.update_student(student_id, data):
-        return jsonify({'message': 'Student updated successfully'})
+    try:
+        updated = data_manager.update_student(student_id, data, if_match=_if_match())
+    except VersionConflict:
+        return _version_conflict()
+    
+    if updated:
+        response = jsonify({'message': 'Student updated successfully'})
+        response.set_etag(data_manager.student_etag(student_id))
+        return response
     else:
         return jsonify({'error': 'Failed to update student'}), 500
 
@@ -95,9 +240,33 @@ def delete_student(student_id):
 @api.route('/subjects', methods=['GET'])
 @handle_errors
 def get_subjects():
-    """获取所有科目"""
+    """获取科目列表，支持 student 过滤、limit/cursor 分页与 fields 字段投影
+    
+    fields 可包含计算字段 levelCount/chapterCount/taskCount，省略 levels 即可只取摘要。
+    """
     subjects = data_manager.get_all_subjects()
-    return jsonify(subjects)
+    
+    student_id = request.args.get('student')
+    if student_id:
+        student = data_manager.get_student_by_id(student_id)
+        if not student:
+            return jsonify({'error': 'Student not found'}), 404
+        subject_ids = set(student.get('subjects', []))
+        subjects = [subject for subject in subjects if subject['id'] in subject_ids]
+    
+    def build(subject, fields):
+        if fields is None or not fields & {'levelCount', 'chapterCount', 'taskCount'}:
+            return subject
+        # 计数来自缓存的科目索引，不遍历科目树
+        index = data_manager.get_subject_index(subject['id'])
+        return {
+            **subject,
+            'levelCount': index.level_count,
+            'chapterCount': index.chapter_count,
+            'taskCount': index.total
+        }
+    
+    return _list_response(subjects, _requested_fields(), build)
 
 @api.route('/subjects/<subject_id>', methods=['GET'])
 @handle_errors
@@ -107,7 +276,7 @@ def get_subject(subject_id):
     if not subject:
         return jsonify({'error': 'Subject not found'}), 404
     
-    return jsonify(subject)
+    return _conditional(data_manager.make_etag(subject), lambda: jsonify(subject))
 
 @api.route('/subjects', methods=['POST'])
 @handle_errors
@@ -127,7 +296,12 @@ def add_subject():
         'levels': data.get('levels', [])
     }
     
-    if data_manager.add_subject(subject_data):
+    try:
+        added = data_manager.add_subject(subject_data)
+    except PrerequisiteError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if added:
         return jsonify(subject_data), 201
     else:
         return jsonify({'error': 'Subject ID already exists or failed to add'}), 400
@@ -141,8 +315,17 @@ def update_subject(subject_id):
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
-    if data_manager.update_subject(subject_id, data):
-        return jsonify({'message': 'Subject updated successfully'})
+    try:
+        updated = data_manager.update_subject(subject_id, data, if_match=_if_match())
+    except VersionConflict:
+        return _version_conflict()
+    except PrerequisiteError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if updated:
+        response = jsonify({'message': 'Subject updated successfully'})
+        response.set_etag(data_manager.subject_etag(subject_id))
+        return response
     else:
         return jsonify({'error': 'Failed to update subject'}), 500
 
@@ -155,13 +338,177 @@ def delete_subject(subject_id):
     else:
         return jsonify({'error': 'Failed to delete subject'}), 500
 
+# 科目结构的定点修改：年级、章节、任务与步骤
+def _edit_subject(subject_id, edit, status=200):
+    """执行一次科目结构修改（只写入变化的部分），响应头带科目的新 ETag；支持 If-Match"""
+    try:
+        result = data_manager.edit_subject(subject_id, edit, if_match=_if_match())
+    except VersionConflict:
+        return _version_conflict()
+    except CurriculumNotFound as e:
+        return jsonify({'error': str(e)}), 404
+    except (CurriculumError, PrerequisiteError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if result is None:
+        return jsonify({'error': 'Failed to update subject'}), 500
+    response = jsonify(result)
+    response.set_etag(data_manager.subject_etag(subject_id))
+    return response, status
+
+def _node_fields():
+    """请求体中节点的字段（position 为插入位置，不属于节点）"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    return {key: value for key, value in data.items() if key != 'position'}
+
+def _position_arg():
+    data = request.get_json(silent=True)
+    return data.get('position') if isinstance(data, dict) else None
+
+def _target_arg(name):
+    data = request.get_json(silent=True)
+    return data.get(name) if isinstance(data, dict) else None
+
+@api.route('/subjects/<subject_id>/levels', methods=['POST'])
+@handle_errors
+def add_level(subject_id):
+    """添加年级（可指定 position，默认追加到末尾）"""
+    fields = _node_fields()
+    if not fields or not fields.get('name'):
+        return jsonify({'error': 'Name is required'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.add_level(fields, _position_arg()), 201)
+
+@api.route('/subjects/<subject_id>/levels/<level_id>', methods=['PATCH'])
+@handle_errors
+def update_level(subject_id, level_id):
+    """修改年级字段（不含章节）"""
+    fields = _node_fields()
+    if not fields:
+        return jsonify({'error': 'No data provided'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.update_level(level_id, fields))
+
+@api.route('/subjects/<subject_id>/levels/<level_id>', methods=['DELETE'])
+@handle_errors
+def delete_level(subject_id, level_id):
+    """删除年级及其章节、任务"""
+    def edit(editor):
+        editor.delete_level(level_id)
+        return {'message': 'Level deleted successfully'}
+    return _edit_subject(subject_id, edit)
+
+@api.route('/subjects/<subject_id>/levels/<level_id>/move', methods=['POST'])
+@handle_errors
+def move_level(subject_id, level_id):
+    """调整年级顺序：{ position }"""
+    return _edit_subject(subject_id, lambda editor: editor.move_level(level_id, _position_arg()))
+
+@api.route('/subjects/<subject_id>/levels/<level_id>/chapters', methods=['POST'])
+@handle_errors
+def add_chapter(subject_id, level_id):
+    """在年级中添加章节"""
+    fields = _node_fields()
+    if not fields or not fields.get('name'):
+        return jsonify({'error': 'Name is required'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.add_chapter(level_id, fields, _position_arg()), 201)
+
+@api.route('/subjects/<subject_id>/chapters/<chapter_id>', methods=['PATCH'])
+@handle_errors
+def update_chapter(subject_id, chapter_id):
+    """修改章节字段（不含任务）"""
+    fields = _node_fields()
+    if not fields:
+        return jsonify({'error': 'No data provided'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.update_chapter(chapter_id, fields))
+
+@api.route('/subjects/<subject_id>/chapters/<chapter_id>', methods=['DELETE'])
+@handle_errors
+def delete_chapter(subject_id, chapter_id):
+    """删除章节及其任务"""
+    def edit(editor):
+        editor.delete_chapter(chapter_id)
+        return {'message': 'Chapter deleted successfully'}
+    return _edit_subject(subject_id, edit)
+
+@api.route('/subjects/<subject_id>/chapters/<chapter_id>/move', methods=['POST'])
+@handle_errors
+def move_chapter(subject_id, chapter_id):
+    """移动章节：{ levelId, position }，省略 levelId 时在原年级内调整顺序"""
+    return _edit_subject(subject_id, lambda editor: editor.move_chapter(
+        chapter_id, _target_arg('levelId'), _position_arg()))
+
+@api.route('/subjects/<subject_id>/chapters/<chapter_id>/tasks', methods=['POST'])
+@handle_errors
+def add_task(subject_id, chapter_id):
+    """在章节中添加任务"""
+    fields = _node_fields()
+    if not fields or not fields.get('name'):
+        return jsonify({'error': 'Name is required'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.add_task(chapter_id, fields, _position_arg()), 201)
+
+@api.route('/subjects/<subject_id>/tasks/<task_id>', methods=['PATCH'])
+@handle_errors
+def update_task(subject_id, task_id):
+    """修改任务字段（可整体替换 steps）"""
+    fields = _node_fields()
+    if not fields:
+        return jsonify({'error': 'No data provided'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.update_task(task_id, fields))
+
+@api.route('/subjects/<subject_id>/tasks/<task_id>', methods=['DELETE'])
+@handle_errors
+def delete_task(subject_id, task_id):
+    """删除任务，并从其他任务的前置任务中移除"""
+    def edit(editor):
+        editor.delete_task(task_id)
+        return {'message': 'Task deleted successfully'}
+    return _edit_subject(subject_id, edit)
+
+@api.route('/subjects/<subject_id>/tasks/<task_id>/move', methods=['POST'])
+@handle_errors
+def move_task(subject_id, task_id):
+    """移动任务：{ chapterId, position }，省略 chapterId 时在原章节内调整顺序"""
+    return _edit_subject(subject_id, lambda editor: editor.move_task(
+        task_id, _target_arg('chapterId'), _position_arg()))
+
+@api.route('/subjects/<subject_id>/tasks/<task_id>/steps', methods=['POST'])
+@handle_errors
+def add_step(subject_id, task_id):
+    """添加步骤：{ text, position }"""
+    text = _target_arg('text')
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({'error': 'Text is required'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.add_step(task_id, text, _position_arg()), 201)
+
+@api.route('/subjects/<subject_id>/tasks/<task_id>/steps/<int:step>', methods=['PUT'])
+@handle_errors
+def update_step(subject_id, task_id, step):
+    """修改步骤内容：{ text }"""
+    text = _target_arg('text')
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({'error': 'Text is required'}), 400
+    return _edit_subject(subject_id, lambda editor: editor.update_step(task_id, step, text))
+
+@api.route('/subjects/<subject_id>/tasks/<task_id>/steps/<int:step>', methods=['DELETE'])
+@handle_errors
+def delete_step(subject_id, task_id, step):
+    """删除步骤"""
+    return _edit_subject(subject_id, lambda editor: editor.delete_step(task_id, step))
+
+@api.route('/subjects/<subject_id>/tasks/<task_id>/steps/<int:step>/move', methods=['POST'])
+@handle_errors
+def move_step(subject_id, task_id, step):
+    """调整步骤顺序：{ position }"""
+    return _edit_subject(subject_id, lambda editor: editor.move_step(task_id, step, _position_arg()))
+
 # 进度相关API
 @api.route('/students/<student_id>/progress', methods=['GET'])
 @handle_errors
 def get_student_progress(student_id):
     """获取学生进度"""
     progress = data_manager.get_student_progress(student_id)
-    return jsonify(progress)
+    return _conditional(data_manager.make_etag(progress), lambda: jsonify(progress))
 
 @api.route('/students/<student_id>/progress', methods=['POST'])
 @handle_errors
@@ -182,7 +529,219 @@ def save_student_progress(student_id):
 def get_subject_progress(student_id, subject_id):
     """获取学科进度统计"""
     progress_stats = data_manager.calculate_subject_progress(student_id, subject_id)
-    return jsonify(progress_stats)
+    return _conditional(data_manager.make_etag(tuple(progress_stats.values())), lambda: jsonify(progress_stats))
+
+@api.route('/students/<student_id>/subjects/<subject_id>/tasks/<task_id>', methods=['PATCH'])
+@handle_errors
+def update_task_progress(student_id, subject_id, task_id):
+    """按步骤修改单个任务进度（start/complete/skip/uncomplete/reset）"""
+    data = request.get_json()
+    
+    if not data or not data.get('action'):
+        return jsonify({'error': 'Action is required'}), 400
+    
+    try:
+        result = data_manager.update_task_progress(student_id, subject_id, task_id,
+                                                   data['action'], data.get('step'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if result is None:
+        return jsonify({'error': 'Student, subject or task not found'}), 404
+    
+    return jsonify(result)
+
+@api.route('/students/<student_id>/subjects/<subject_id>/rollup', methods=['GET'])
+@handle_errors
+def get_subject_rollup(student_id, subject_id):
+    """学生某科目按 年级 -> 章节 汇总的进度（完成数、任务数、剩余预计用时）"""
+    subject = data_manager.get_subject_by_id(subject_id)
+    if not subject or not data_manager.get_student_by_id(student_id):
+        return jsonify({'error': 'Student or subject not found'}), 404
+    
+    progress = data_manager.get_student_progress(student_id).get('subjects', {}).get(subject_id)
+    etag = data_manager.make_etag(subject, progress)
+    return _conditional(etag, lambda: jsonify(data_manager.get_subject_rollup(student_id, subject_id)))
+
+@api.route('/students/<student_id>/subjects/<subject_id>/unlocked', methods=['GET'])
+@handle_errors
+def get_unlocked_tasks(student_id, subject_id):
+    """学生在某科目下已解锁的任务与推荐的下一步任务"""
+    limit = max(1, min(request.args.get('limit', 3, type=int), 50))
+    subject = data_manager.get_subject_by_id(subject_id)
+    if not subject or not data_manager.get_student_by_id(student_id):
+        return jsonify({'error': 'Student or subject not found'}), 404
+    
+    progress = data_manager.get_student_progress(student_id).get('subjects', {}).get(subject_id)
+    etag = data_manager.make_etag(subject, progress, limit)
+    return _conditional(etag, lambda: jsonify(data_manager.get_available_tasks(student_id, subject_id, limit)))
+
+@api.route('/students/<student_id>/dashboard', methods=['GET'])
+@handle_errors
+def get_student_dashboard(student_id):
+    """学生看板：学生、科目/章节进度、任务锁定状态与最近活动（一次返回）"""
+    recent_limit = max(0, min(request.args.get('recent', 5, type=int), 50))
+    etag = data_manager.dashboard_etag(student_id, recent_limit)
+    if not etag:
+        return jsonify({'error': 'Student not found'}), 404
+    
+    return _conditional(etag, lambda: jsonify(data_manager.get_student_dashboard(student_id, recent_limit)))
+
+# 变更事件
+@api.route('/events', methods=['GET'])
+@handle_errors
+def stream_events():
+    """数据变更事件流（Server-Sent Events）
+
+    每条事件包含资源类型（student/subject/progress）、ID、操作、新版本与少量变化内容；
+    断线重连时浏览器自动带上 Last-Event-ID，补发缓冲区内错过的事件，已被淘汰时发送 reset 事件。
+    types 参数可只订阅部分资源类型，如 ?types=student,progress。
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    types = {t for t in (request.args.get('types') or '').split(',') if t}
+    heartbeat = current_app.config['EVENT_HEARTBEAT']
+    bus = data_manager.events
+    
+    def generate(last_id):
+        # 新连接从当前位置开始，只推送之后的事件
+        if last_id is None:
+            last_id = bus.last_id
+        yield 'retry: 3000\n\n'
+        while True:
+            events, last_id = bus.wait(last_id, heartbeat)
+            if events is None:
+                yield format_reset(last_id)
+            elif not events:
+                yield ': keep-alive\n\n'
+            for event in events or []:
+                if not types or event['type'] in types:
+                    yield format_event(event)
+    
+    return Response(stream_with_context(generate(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# 运行指标
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 文本格式的运行指标：各路由延迟直方图、存储读写、缓存命中与错误计数"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# 搜索API
+SEARCH_TYPES = {'subject', 'level', 'chapter', 'task', 'step'}
+
+@api.route('/search', methods=['GET'])
+@handle_errors
+def search():
+    """在科目结构中搜索：q 为关键词，可用 subject、type（逗号分隔）过滤，limit 控制条数"""
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'Query is required'}), 400
+    if len(query) > current_app.config['SEARCH_MAX_QUERY_LENGTH']:
+        return jsonify({'error': 'Query is too long'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), current_app.config['MAX_PAGE_SIZE']))
+    subject_id = request.args.get('subject') or None
+    kinds = {kind.strip() for kind in (request.args.get('type') or '').split(',') if kind.strip()} or None
+    if kinds and not kinds <= SEARCH_TYPES:
+        return jsonify({'error': f"type must be one of {', '.join(sorted(SEARCH_TYPES))}"}), 400
+    
+    etag = data_manager.make_etag(data_manager.get_all_subjects(), query, limit, subject_id, sorted(kinds or ()))
+    return _conditional(etag, lambda: jsonify(data_manager.search(query, limit, subject_id, kinds)))
+
+# 学习活动API
+def _activity_filters():
+    """学习活动接口的 student、subject 参数；返回 (学生ID, 科目ID, 错误响应)"""
+    student_id = request.args.get('student') or None
+    subject_id = request.args.get('subject') or None
+    if student_id and not data_manager.get_student_by_id(student_id):
+        return None, None, (jsonify({'error': 'Student not found'}), 404)
+    if subject_id and not data_manager.get_subject_by_id(subject_id):
+        return None, None, (jsonify({'error': 'Subject not found'}), 404)
+    return student_id, subject_id, None
+
+@api.route('/activity/recent', methods=['GET'])
+@handle_errors
+def get_recent_activity():
+    """最近的学习事件（由新到旧），可按 student、subject、type 过滤，limit/cursor 翻页"""
+    student_id, subject_id, error = _activity_filters()
+    if error:
+        return error
+    limit = max(1, min(request.args.get('limit', 20, type=int), current_app.config['MAX_PAGE_SIZE']))
+    kinds = {kind.strip() for kind in (request.args.get('type') or '').split(',') if kind.strip()} or None
+    if kinds and not kinds <= set(EVENT_TYPES):
+        return jsonify({'error': f"type must be one of {', '.join(EVENT_TYPES)}"}), 400
+    cursor = request.args.get('cursor')
+    before = None
+    if cursor:
+        # 游标为上一页最后一个事件的键 [时间戳, 学生ID, 科目ID, 任务ID, 类型, 步骤]
+        try:
+            before = serialization.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except ValueError:
+            pass
+        if not (isinstance(before, list) and len(before) == 6 and isinstance(before[0], (int, float))
+                and all(isinstance(part, str) for part in before[1:5]) and isinstance(before[5], int)):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        before = tuple(before)
+    
+    def build():
+        items, next_before = data_manager.get_recent_activity(limit, student_id, subject_id, kinds, before)
+        next_cursor = None
+        if next_before:
+            next_cursor = base64.urlsafe_b64encode(serialization.dumps(list(next_before))).decode('ascii').rstrip('=')
+        return jsonify({'items': items, 'nextCursor': next_cursor})
+    
+    etag = data_manager.activity_etag('recent', student_id, subject_id, sorted(kinds or ()), limit, cursor)
+    return _conditional(etag, build)
+
+@api.route('/activity/summary', methods=['GET'])
+@handle_errors
+def get_activity_summary():
+    """按日/周统计完成的任务数、步骤数与学习分钟数
+
+    from、to 为日期（含两端，默认最近30天），interval 为 day 或 week，tz 为分组使用的时区偏移（如 +08:00），
+    可按 student、subject 过滤。
+    """
+    student_id, subject_id, error = _activity_filters()
+    if error:
+        return error
+    interval = request.args.get('interval', 'day')
+    if interval not in ('day', 'week'):
+        return jsonify({'error': 'interval must be day or week'}), 400
+    try:
+        tz = parse_utc_offset(request.args.get('tz') or current_app.config['ACTIVITY_TIMEZONE'])
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else datetime.now(tz).date()
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=29)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if (end - start).days >= current_app.config['ACTIVITY_MAX_DAYS']:
+        return jsonify({'error': f"Date range must not exceed {current_app.config['ACTIVITY_MAX_DAYS']} days"}), 400
+    
+    etag = data_manager.activity_etag('summary', start.isoformat(), end.isoformat(), interval, str(tz),
+                                      student_id, subject_id)
+    return _conditional(etag, lambda: jsonify(
+        data_manager.get_activity_summary(start, end, interval, tz, student_id, subject_id)))
+
+# 科目分析API
+@api.route('/analytics/subjects/<subject_id>', methods=['GET'])
+@handle_errors
+def get_subject_analytics(subject_id):
+    """科目下全部学生的完成度分布（总体与各章节）、完成用时与卡住人数最多的任务，limit 控制瓶颈任务条数"""
+    limit = max(1, min(request.args.get('limit', current_app.config['ANALYTICS_BOTTLENECKS'], type=int),
+                       current_app.config['MAX_PAGE_SIZE']))
+    etag = data_manager.analytics_etag(subject_id, limit)
+    if etag is None:
+        return jsonify({'error': 'Subject not found'}), 404
+    
+    def build():
+        report = data_manager.get_subject_analytics(subject_id)
+        return jsonify({**report, 'bottlenecks': report['bottlenecks'][:limit]})
+    
+    return _conditional(etag, build)
 
 # 统计API
 @api.route('/stats/overall', methods=['GET'])
@@ -195,24 +754,48 @@ def get_overall_stats():
     total_students = len(students)
     total_subjects = len(subjects)
     
-    # 计算平均进度
-    if total_students > 0:
-        total_progress = sum(data_manager.calculate_overall_progress(s['id']) for s in students)
-        average_progress = total_progress / total_students
-    else:
-        average_progress = 0
+    # 平均进度由增量维护的计数直接给出
+    average_progress = data_manager.calculate_average_progress() if total_students > 0 else 0
     
-    return jsonify({
+    stats = {
         'totalStudents': total_students,
         'totalSubjects': total_subjects,
         'averageProgress': round(average_progress, 1)
-    })
+    }
+    return _conditional(data_manager.make_etag(tuple(stats.values())), lambda: jsonify(stats))
 
 # 批量操作API
+@api.route('/batch', methods=['POST'])
+@handle_errors
+def apply_batch():
+    """在一个事务内执行一组学生/科目分配/进度重置操作，返回逐项结果"""
+    data = request.get_json()
+    operations = (data or {}).get('operations')
+    
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Operations are required'}), 400
+    if not all(isinstance(operation, dict) for operation in operations):
+        return jsonify({'error': 'Each operation must be an object'}), 400
+    
+    # 新建学生的字段与单个添加接口一致
+    operations = [
+        {**operation, 'data': _student_from_request(operation.get('data') or {})}
+        if operation.get('op') == 'createStudent' else operation
+        for operation in operations
+    ]
+    
+    committed, results = data_manager.apply_batch(operations, atomic=bool(data.get('atomic')))
+    return jsonify({
+        'committed': committed,
+        'successCount': sum(1 for result in results if result['success']),
+        'totalCount': len(operations),
+        'results': results
+    }), 200 if committed else 409
+
 @api.route('/batch/add-subject-to-students', methods=['POST'])
 @handle_errors
 def add_subject_to_students():
-    """批量为学生添加科目"""
+    """批量为学生添加科目（一次写入）"""
     data = request.get_json()
     subject_id = data.get('subjectId')
     student_ids = data.get('studentIds', [])
@@ -220,16 +803,53 @@ def add_subject_to_students():
     if not subject_id or not student_ids:
         return jsonify({'error': 'Subject ID and student IDs are required'}), 400
     
-    success_count = 0
-    for student_id in student_ids:
-        student = data_manager.get_student_by_id(student_id)
-        if student and subject_id not in student.get('subjects', []):
-            updated_subjects = student['subjects'] + [subject_id]
-            if data_manager.update_student(student_id, {'subjects': updated_subjects}):
-                success_count += 1
+    # 不存在的学生跳过，其余学生在同一个事务中更新
+    existing_ids = [student_id for student_id in student_ids if data_manager.get_student_by_id(student_id)]
+    committed, results = data_manager.apply_batch(
+        [{'op': 'assignSubject', 'subjectId': subject_id, 'studentIds': existing_ids}]
+    )
+    success_count = len(results[0].get('updated', [])) if committed else 0
     
     return jsonify({
         'message': f'Successfully added subject to {success_count} students',
         'successCount': success_count,
         'totalCount': len(student_ids)
     })
+
+# 导入导出API
+@api.route('/export', methods=['GET'])
+@handle_errors
+def export_data():
+    """以 NDJSON 流式导出科目、学生与进度（types=subject,student,progress 只导出部分类型）"""
+    types = {t.strip() for t in (request.args.get('types') or '').split(',') if t.strip()} or None
+    if types and not types <= set(RECORD_TYPES):
+        return jsonify({'error': f"types must be one of {', '.join(RECORD_TYPES)}"}), 400
+    
+    filename = f"education-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}.ndjson"
+    return Response(stream_with_context(data_manager.export_ndjson(types)), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"',
+                             'Cache-Control': 'no-store'})
+
+@api.route('/import', methods=['POST'])
+@handle_errors
+def import_data():
+    """从 NDJSON 请求体（可 gzip 压缩）分批导入，返回导入报告
+
+    batchSize 为每批提交的记录数，dryRun=1 只校验不写入，skipExisting=1 跳过ID已存在的记录。
+    """
+    batch_size = request.args.get('batchSize', type=int)
+    if batch_size is not None and batch_size < 1:
+        return jsonify({'error': 'batchSize must be a positive integer'}), 400
+    try:
+        stream = open_stream(request.stream, request.headers.get('Content-Encoding'))
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 415
+    
+    report = data_manager.import_ndjson(
+        stream, batch_size=batch_size,
+        dry_run=request.args.get('dryRun', '').lower() in ('1', 'true', 'yes'),
+        skip_existing=request.args.get('skipExisting', '').lower() in ('1', 'true', 'yes')
+    )
+    if report['aborted']:
+        return jsonify(report), 500 if report['error'].startswith('Storage error') else 400
+    return jsonify(report)
@@ -1,13 +1,18 @@
 
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, render_template, request, send_from_directory
 from flask_cors import CORS
 from api import api
 from config import Config
+import instrumentation
+import profiling
+from serialization import FastJSONProvider, choose_encoding, compress_cached, encoded_etag
 import os
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    # 更快的 JSON 编码（安装 orjson 时使用），输出 UTF-8 而非 \u 转义
+    app.json = FastJSONProvider(app)
     
     # 启用CORS
     CORS(app)
@@ -15,6 +20,12 @@ def create_app():
     # 注册API蓝图
     app.register_blueprint(api, url_prefix='/api')
     
+    # 按需剖析（最先注册，剖析范围覆盖其余钩子）
+    profiling.init_app(app)
+    
+    # 请求ID、延迟指标与访问日志（需在压缩钩子之前注册，计时才包含压缩）
+    instrumentation.init_app(app)
+    
     # 主页路由
     @app.route('/')
     def index():
@@ -25,6 +36,30 @@ def create_app():
     def static_files(filename):
         return send_from_directory('static', filename)
     
+    # 响应压缩
+    @app.after_request
+    def compress_response(response):
+        """按 Accept-Encoding 压缩超过阈值的 JSON/文本响应"""
+        min_size = app.config['COMPRESS_MIN_SIZE']
+        if (not min_size or response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype == 'application/json' or response.mimetype.startswith('text/'))):
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        data = response.get_data()
+        if not encoding or len(data) < min_size:
+            return response
+        
+        # 相同 ETag 的响应体相同，压缩结果可复用
+        etag, weak = response.get_etag()
+        response.set_data(compress_cached(None if weak else etag, data, encoding, app.config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak)
+        return response
+    
     # 错误处理
     @app.errorhandler(404)
     def not_found(error):
@@ -3,8 +3,50 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    # 数据目录，可用环境变量 DATA_DIR 指向其他数据集（如 tools/generate_data.py 生成的数据）
+    DATA_DIR = os.environ.get('DATA_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+    # 存储后端：'json'（默认，data/ 下的 JSON 文件）或 'sqlite'
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH') or os.path.join(DATA_DIR, 'education.db')
     STUDENTS_FILE = os.path.join(DATA_DIR, 'students.json')
     SUBJECTS_FILE = os.path.join(DATA_DIR, 'subjects.json')
+    # 学生进度按学生ID分文件存放；PROGRESS_FILE 为旧版单文件，仅用于一次性迁移
+    PROGRESS_DIR = os.path.join(DATA_DIR, 'progress')
     PROGRESS_FILE = os.path.join(DATA_DIR, 'progress.json')
-
+    # 进度变更先追加写入日志（每行一条JSON），后台定期压缩进各学生分片
+    PROGRESS_JOURNAL_FILE = os.path.join(DATA_DIR, 'progress_journal.ndjson')
+    # 压缩后的日志归档目录，可回放完成记录；设为 None 则压缩后直接删除
+    PROGRESS_JOURNAL_ARCHIVE_DIR = os.path.join(DATA_DIR, 'journal_archive')
+    JOURNAL_FSYNC_INTERVAL = 1.0  # 批量 fsync 间隔（秒），0 表示每次追加都 fsync
+    JOURNAL_COMPACT_INTERVAL = 60  # 压缩间隔（秒）
+    JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024  # 日志超过该大小时提前压缩
+    # 事务已持有进度日志锁后再修改学生/科目（逆序加锁）时最多等待的秒数，超时放弃事务以避免死锁
+    LOCK_ORDER_TIMEOUT = 10
+    MAX_PAGE_SIZE = 200  # 列表接口分页时单页最大条数
+    SEARCH_MAX_QUERY_LENGTH = 100  # /api/search 查询词的最大长度
+    # 学习活动统计：按日/周分组的默认时区（UTC 偏移，接口可用 tz 参数覆盖）与单次统计的最大天数
+    ACTIVITY_TIMEZONE = os.environ.get('ACTIVITY_TIMEZONE', '+08:00')
+    ACTIVITY_MAX_DAYS = 366
+    ANALYTICS_BOTTLENECKS = 10  # /api/analytics/subjects/<id> 默认返回的瓶颈任务数
+    # NDJSON 导入：每批最多的记录数与字节数（一批在一个事务内提交），单行最大字节数，报告中保留的错误明细数
+    IMPORT_BATCH_SIZE = 500
+    IMPORT_BATCH_BYTES = 8 * 1024 * 1024
+    IMPORT_MAX_LINE_BYTES = 16 * 1024 * 1024
+    IMPORT_MAX_ERRORS = 100
+    # 数据文件默认写成紧凑 JSON；设为 True（或环境变量 JSON_PRETTY=1）时缩进，便于人工查看
+    JSON_PRETTY = os.environ.get('JSON_PRETTY', '').lower() in ('1', 'true', 'yes')
+    # 响应体超过该字节数且客户端支持时压缩（gzip，安装 brotli 后优先 br）；0 表示不压缩
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = 6
+    # 日志：级别与格式（json 为每行一条结构化日志，text 为普通文本）；访问日志为 INFO 级别
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    # 变更事件（/api/events）：环形缓冲保留的事件数，断线重连可补发其中的事件
+    EVENT_BUFFER_SIZE = 1000
+    EVENT_HEARTBEAT = 15  # 无事件时发送心跳注释的间隔（秒）
+    # 按需剖析：请求头 X-Profile 等于 PROFILE_TOKEN 时剖析该请求（未设置时关闭按需剖析）；
+    # PROFILE_SAMPLE_RATE 为随机剖析的请求比例（0 表示关闭）。结果写入 PROFILE_DIR，只保留最近 PROFILE_KEEP 次
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE') or 0)
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+    PROFILE_KEEP = 100
@@ -0,0 +1,277 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from indexes import SubjectIndex
+
+# 年级、章节的子节点列表不能通过字段修改接口整体替换（需用对应的增删/移动接口）；任务的步骤可以
+CHILD_KEYS = {'level': 'chapters', 'chapter': 'tasks', 'task': 'steps'}
+REPLACEABLE_CHILDREN = {'steps'}
+
+
+class CurriculumError(ValueError):
+    """科目结构修改的参数无效（位置越界、ID重复等）"""
+
+
+class CurriculumNotFound(CurriculumError):
+    """要修改的年级、章节、任务或步骤不存在"""
+
+
+def _check_steps(steps: Any) -> None:
+    if steps is not None and not (isinstance(steps, list) and all(isinstance(step, str) for step in steps)):
+        raise CurriculumError('Steps must be a list of strings')
+
+
+def _position(position: Any, size: int, inserting: bool) -> int:
+    """校验目标位置；None 表示末尾，插入时可取 size，移动时最大为 size - 1"""
+    limit = size if inserting else size - 1
+    if position is None:
+        return limit
+    if isinstance(position, bool) or not isinstance(position, int) or position < 0:
+        raise CurriculumError('Position must be a non-negative integer')
+    return min(position, limit)
+
+
+class SubjectEditor:
+    """对科目树做定点修改（写时复制）
+
+    只复制从科目根到被修改节点的路径，其余年级、章节、任务沿用原对象：
+    存储层与缓存（汇总树、内容哈希）可以按对象身份跳过未变化的部分。原科目对象不会被修改。
+    每个方法完成一项修改，返回被修改的节点；self.change 记录本次修改，用于变更事件。
+    """
+
+    def __init__(self, subject: Dict[str, Any], index: SubjectIndex):
+        self.index = index
+        self.subject = {**subject, 'levels': list(subject.get('levels') or [])}
+        self.change: Dict[str, Any] = {}
+
+    # 定位与路径复制
+    def _level_position(self, level_id: str) -> int:
+        for position, level in enumerate(self.subject['levels']):
+            if level.get('id') == level_id:
+                return position
+        raise CurriculumNotFound('Level not found')
+
+    def _chapter_position(self, chapter_id: str) -> Tuple[int, int]:
+        for level_pos, level in enumerate(self.subject['levels']):
+            for chapter_pos, chapter in enumerate(level.get('chapters') or []):
+                if chapter.get('id') == chapter_id:
+                    return level_pos, chapter_pos
+        raise CurriculumNotFound('Chapter not found')
+
+    def _task_position(self, task_id: str) -> Tuple[int, int, int]:
+        location = self.index.task_location.get(task_id)
+        if location is None:
+            raise CurriculumNotFound('Task not found')
+        level_pos, chapter_pos = self._chapter_position(location[1])
+        tasks = self.subject['levels'][level_pos]['chapters'][chapter_pos].get('tasks') or []
+        for task_pos, task in enumerate(tasks):
+            if task.get('id') == task_id:
+                return level_pos, chapter_pos, task_pos
+        raise CurriculumNotFound('Task not found')
+
+    def _copy_level(self, level_pos: int) -> Dict[str, Any]:
+        level = self.subject['levels'][level_pos]
+        level = self.subject['levels'][level_pos] = {**level, 'chapters': list(level.get('chapters') or [])}
+        return level
+
+    def _copy_chapter(self, level_pos: int, chapter_pos: int) -> Dict[str, Any]:
+        level = self._copy_level(level_pos)
+        chapter = level['chapters'][chapter_pos]
+        chapter = level['chapters'][chapter_pos] = {**chapter, 'tasks': list(chapter.get('tasks') or [])}
+        return chapter
+
+    def _copy_task(self, level_pos: int, chapter_pos: int, task_pos: int) -> Dict[str, Any]:
+        chapter = self._copy_chapter(level_pos, chapter_pos)
+        task = chapter['tasks'][task_pos]
+        task = chapter['tasks'][task_pos] = {**task, 'steps': list(task.get('steps') or [])}
+        return task
+
+    def _new_id(self, kind: str, existing: Iterable[str]) -> str:
+        """与前端相同的ID格式（kind_毫秒时间戳），冲突时追加序号"""
+        taken = set(existing)
+        node_id = f'{kind}_{int(time.time() * 1000)}'
+        candidate, n = node_id, 1
+        while candidate in taken:
+            candidate = f'{node_id}_{n}'
+            n += 1
+        return candidate
+
+    def _prepare(self, kind: str, data: Dict[str, Any], existing: Iterable[str]) -> Dict[str, Any]:
+        existing = set(existing)
+        node = dict(data)
+        if not node.get('id'):
+            node['id'] = self._new_id(kind, existing)
+        elif node['id'] in existing:
+            raise CurriculumError(f'{kind.capitalize()} ID already exists')
+        node.setdefault(CHILD_KEYS[kind], [])
+        return node
+
+    def _chapter_ids(self) -> List[str]:
+        return [chapter.get('id') for level in self.subject['levels'] for chapter in level.get('chapters') or []]
+
+    def _check_new_tasks(self, chapters: Iterable[Dict[str, Any]]) -> None:
+        """随新年级/章节一起添加的任务：ID 不能与科目中已有的任务重复"""
+        task_ids = [task.get('id') for chapter in chapters for task in chapter.get('tasks') or []]
+        if len(set(task_ids)) != len(task_ids) or set(task_ids) & self.index.task_ids:
+            raise CurriculumError('Task ID already exists')
+        for chapter in chapters:
+            for task in chapter.get('tasks') or []:
+                _check_steps(task.get('steps'))
+
+    def _drop_prerequisites(self, removed: Iterable[str]) -> None:
+        """被删除的任务不再作为其他任务的前置任务（只修改依赖它们的任务）"""
+        removed = set(removed)
+        dependents = {dependent for task_id in removed for dependent in self.index.graph.dependents.get(task_id, ())}
+        for dependent in dependents - removed:
+            task = self._copy_task(*self._task_position(dependent))
+            task['prerequisites'] = [p for p in task.get('prerequisites') or [] if p not in removed]
+
+    @staticmethod
+    def _apply_fields(node: Dict[str, Any], kind: str, fields: Dict[str, Any]) -> None:
+        if 'id' in fields and fields['id'] != node.get('id'):
+            raise CurriculumError('ID cannot be changed')
+        child_key = CHILD_KEYS[kind]
+        if child_key in fields:
+            if child_key not in REPLACEABLE_CHILDREN:
+                raise CurriculumError(f'Use the {child_key} endpoints to change {child_key}')
+            _check_steps(fields[child_key])
+        node.update(fields)
+
+    # 年级
+    def add_level(self, data: Dict[str, Any], position: Optional[int] = None) -> Dict[str, Any]:
+        levels = self.subject['levels']
+        level = self._prepare('level', data, (level.get('id') for level in levels))
+        # 新年级可以带章节与任务，ID 不能与已有的重复
+        chapter_ids = [chapter.get('id') for chapter in level['chapters']]
+        if len(set(chapter_ids)) != len(chapter_ids) or set(chapter_ids) & set(self._chapter_ids()):
+            raise CurriculumError('Chapter ID already exists')
+        self._check_new_tasks(level['chapters'])
+        levels.insert(_position(position, len(levels), True), level)
+        self.change = {'op': 'addLevel', 'levelId': level['id']}
+        return level
+
+    def update_level(self, level_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        level = self._copy_level(self._level_position(level_id))
+        self._apply_fields(level, 'level', fields)
+        self.change = {'op': 'updateLevel', 'levelId': level_id}
+        return level
+
+    def delete_level(self, level_id: str) -> Dict[str, Any]:
+        """删除年级及其章节、任务，并从其余任务的前置列表中移除被删除的任务"""
+        level = self.subject['levels'].pop(self._level_position(level_id))
+        self._drop_prerequisites(task.get('id') for chapter in level.get('chapters') or []
+                                 for task in chapter.get('tasks') or [])
+        self.change = {'op': 'deleteLevel', 'levelId': level_id}
+        return level
+
+    def move_level(self, level_id: str, position: Optional[int]) -> Dict[str, Any]:
+        levels = self.subject['levels']
+        level = levels.pop(self._level_position(level_id))
+        position = _position(position, len(levels) + 1, False)
+        levels.insert(position, level)
+        self.change = {'op': 'moveLevel', 'levelId': level_id, 'position': position}
+        return {'id': level_id, 'position': position}
+
+    # 章节
+    def add_chapter(self, level_id: str, data: Dict[str, Any], position: Optional[int] = None) -> Dict[str, Any]:
+        level = self._copy_level(self._level_position(level_id))
+        chapter = self._prepare('chapter', data, self._chapter_ids())
+        self._check_new_tasks([chapter])
+        level['chapters'].insert(_position(position, len(level['chapters']), True), chapter)
+        self.change = {'op': 'addChapter', 'levelId': level_id, 'chapterId': chapter['id']}
+        return chapter
+
+    def update_chapter(self, chapter_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        chapter = self._copy_chapter(*self._chapter_position(chapter_id))
+        self._apply_fields(chapter, 'chapter', fields)
+        self.change = {'op': 'updateChapter', 'chapterId': chapter_id}
+        return chapter
+
+    def delete_chapter(self, chapter_id: str) -> Dict[str, Any]:
+        """删除章节及其任务，并从其余任务的前置列表中移除被删除的任务"""
+        level_pos, chapter_pos = self._chapter_position(chapter_id)
+        chapter = self._copy_level(level_pos)['chapters'].pop(chapter_pos)
+        self._drop_prerequisites(task.get('id') for task in chapter.get('tasks') or [])
+        self.change = {'op': 'deleteChapter', 'chapterId': chapter_id}
+        return chapter
+
+    def move_chapter(self, chapter_id: str, level_id: Optional[str], position: Optional[int]) -> Dict[str, Any]:
+        """移动章节：level_id 为目标年级（None 表示在原年级内调整顺序）"""
+        level_pos, chapter_pos = self._chapter_position(chapter_id)
+        target_pos = self._level_position(level_id) if level_id else level_pos
+        chapter = self._copy_level(level_pos)['chapters'].pop(chapter_pos)
+        target = self._copy_level(target_pos)
+        position = _position(position, len(target['chapters']), True)
+        target['chapters'].insert(position, chapter)
+        self.change = {'op': 'moveChapter', 'chapterId': chapter_id, 'levelId': target.get('id'),
+                       'position': position}
+        return {'id': chapter_id, 'levelId': target.get('id'), 'position': position}
+
+    # 任务
+    def add_task(self, chapter_id: str, data: Dict[str, Any], position: Optional[int] = None) -> Dict[str, Any]:
+        chapter = self._copy_chapter(*self._chapter_position(chapter_id))
+        task = self._prepare('task', data, self.index.task_ids)
+        _check_steps(task['steps'])
+        task.setdefault('prerequisites', [])
+        chapter['tasks'].insert(_position(position, len(chapter['tasks']), True), task)
+        self.change = {'op': 'addTask', 'chapterId': chapter_id, 'taskId': task['id']}
+        return task
+
+    def update_task(self, task_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        task = self._copy_task(*self._task_position(task_id))
+        self._apply_fields(task, 'task', fields)
+        self.change = {'op': 'updateTask', 'taskId': task_id}
+        return task
+
+    def delete_task(self, task_id: str) -> Dict[str, Any]:
+        """删除任务，并从依赖它的任务的前置列表中移除"""
+        level_pos, chapter_pos, task_pos = self._task_position(task_id)
+        task = self._copy_chapter(level_pos, chapter_pos)['tasks'].pop(task_pos)
+        self._drop_prerequisites([task_id])
+        self.change = {'op': 'deleteTask', 'taskId': task_id}
+        return task
+
+    def move_task(self, task_id: str, chapter_id: Optional[str], position: Optional[int]) -> Dict[str, Any]:
+        """移动任务：chapter_id 为目标章节（可在其他年级，None 表示在原章节内调整顺序）"""
+        level_pos, chapter_pos, task_pos = self._task_position(task_id)
+        target_path = self._chapter_position(chapter_id) if chapter_id else (level_pos, chapter_pos)
+        task = self._copy_chapter(level_pos, chapter_pos)['tasks'].pop(task_pos)
+        target = self._copy_chapter(*target_path)
+        position = _position(position, len(target['tasks']), True)
+        target['tasks'].insert(position, task)
+        self.change = {'op': 'moveTask', 'taskId': task_id, 'chapterId': target.get('id'), 'position': position}
+        return {'id': task_id, 'chapterId': target.get('id'), 'position': position}
+
+    # 步骤（任务的 steps 为字符串列表，按位置寻址）
+    def _step_task(self, task_id: str, step: Optional[int] = None) -> Dict[str, Any]:
+        task = self._copy_task(*self._task_position(task_id))
+        if step is not None and not 0 <= step < len(task['steps']):
+            raise CurriculumNotFound('Step not found')
+        return task
+
+    def add_step(self, task_id: str, text: str, position: Optional[int] = None) -> Dict[str, Any]:
+        task = self._step_task(task_id)
+        position = _position(position, len(task['steps']), True)
+        task['steps'].insert(position, text)
+        self.change = {'op': 'addStep', 'taskId': task_id, 'step': position}
+        return {'taskId': task_id, 'steps': task['steps']}
+
+    def update_step(self, task_id: str, step: int, text: str) -> Dict[str, Any]:
+        task = self._step_task(task_id, step)
+        task['steps'][step] = text
+        self.change = {'op': 'updateStep', 'taskId': task_id, 'step': step}
+        return {'taskId': task_id, 'steps': task['steps']}
+
+    def delete_step(self, task_id: str, step: int) -> Dict[str, Any]:
+        task = self._step_task(task_id, step)
+        del task['steps'][step]
+        self.change = {'op': 'deleteStep', 'taskId': task_id, 'step': step}
+        return {'taskId': task_id, 'steps': task['steps']}
+
+    def move_step(self, task_id: str, step: int, position: Optional[int]) -> Dict[str, Any]:
+        task = self._step_task(task_id, step)
+        text = task['steps'].pop(step)
+        position = _position(position, len(task['steps']) + 1, False)
+        task['steps'].insert(position, text)
+        self.change = {'op': 'moveStep', 'taskId': task_id, 'step': step, 'position': position}
+        return {'taskId': task_id, 'steps': task['steps']}
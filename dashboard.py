@@ -0,0 +1,75 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from activity import STEP_COMPLETED, Event
+from indexes import SubjectIndex
+from rollups import RollupTree
+
+
+def build_subject_rollup(subject: Dict[str, Any], subject_progress: Optional[Dict[str, Any]],
+                         rollup: RollupTree, unlocked: Set[str]) -> Dict[str, Any]:
+    """单个科目的汇总：科目进度、各章节进度与每个任务的状态/锁定情况
+
+    章节进度取自学生的汇总树，unlocked 为已解锁的任务ID（来自学生的解锁状态缓存）。
+    """
+    tasks_progress = (subject_progress or {}).get('tasks') or {}
+    tree = rollup.to_dict()
+
+    tasks = {}
+    for task_id, task in rollup.index.tasks.items():
+        task_progress = tasks_progress.get(task_id) or {}
+        tasks[task_id] = {
+            'status': task_progress.get('status') or 'pending',
+            'locked': task_id not in unlocked,
+            'currentStep': task_progress.get('currentStep') or 0,
+            'totalSteps': len(task.get('steps') or [])
+        }
+
+    return {
+        'id': subject['id'],
+        'name': subject.get('name'),
+        'icon': subject.get('icon'),
+        'color': subject.get('color'),
+        'progress': tree['progress'],
+        'completed': tree['completed'],
+        'total': tree['total'],
+        'remainingMinutes': tree['remainingMinutes'],
+        'chapters': [
+            {**chapter, 'levelId': level['id']}
+            for level in tree['levels'] for chapter in level['chapters']
+        ],
+        'tasks': tasks
+    }
+
+
+def recent_activity(subjects: List[Tuple[Dict[str, Any], SubjectIndex]], progress: Dict[str, Any],
+                    events: Iterable[Event], limit: int) -> List[Dict[str, Any]]:
+    """最近的任务活动（按完成时间或开始时间倒序）
+
+    events 为该学生由新到旧的学习事件（ActivityIndex.latest），每个任务取最近一次开始或完成，
+    取够 limit 条即停止，不需要遍历全部任务进度。
+    """
+    subjects_by_id = {subject['id']: (subject, index) for subject, index in subjects}
+    subjects_progress = progress.get('subjects') or {}
+    activities = []
+    seen = set()
+    for _ts, _student_id, subject_id, task_id, kind, _step, time in events:
+        if len(activities) >= limit:
+            break
+        if kind == STEP_COMPLETED or subject_id not in subjects_by_id or (subject_id, task_id) in seen:
+            continue
+        seen.add((subject_id, task_id))
+        subject, index = subjects_by_id[subject_id]
+        task = index.tasks.get(task_id)
+        task_progress = ((subjects_progress.get(subject_id) or {}).get('tasks') or {}).get(task_id)
+        if not task or not task_progress:
+            continue
+        activities.append({
+            'subjectId': subject_id,
+            'subjectName': subject.get('name'),
+            'taskId': task_id,
+            'taskName': task.get('name'),
+            'status': task_progress.get('status'),
+            'time': time,
+            'currentStep': task_progress.get('currentStep') or 0
+        })
+    return activities
@@ -0,0 +1,82 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import serialization
+
+
+class EventBus:
+    """进程内的发布/订阅总线：DataManager 修改数据后发布事件，SSE 连接按事件ID订阅
+
+    最近的事件保存在定长环形缓冲中，断线重连的客户端可用 Last-Event-ID 补齐错过的事件。
+    """
+
+    def __init__(self, buffer_size: int = 1000):
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._last_id = 0
+
+    @property
+    def last_id(self) -> int:
+        """最新事件的ID（尚无事件时为 0）"""
+        return self._last_id
+
+    def publish(self, resource: str, resource_id: str, action: str,
+                version: Optional[str] = None, delta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """发布事件并唤醒等待中的订阅者
+
+        resource 为 student/subject/progress，action 为 created/updated/deleted，
+        version 为资源的新版本（与 GET 接口的 ETag 一致，删除时为 None），delta 为少量变化内容。
+        """
+        with self._condition:
+            self._last_id += 1
+            event = {
+                'id': self._last_id,
+                'type': resource,
+                'action': action,
+                'resourceId': resource_id,
+                'version': version,
+                'delta': delta or {}
+            }
+            self._events.append(event)
+            self._condition.notify_all()
+        return event
+
+    def reset(self) -> None:
+        """清空缓冲区：数据被整体替换（如批量导入）时使用，所有订阅者会收到 reset 事件并重新拉取数据"""
+        with self._condition:
+            self._last_id += 1
+            self._events.clear()
+            self._condition.notify_all()
+
+    def since(self, last_id: int) -> Optional[List[Dict[str, Any]]]:
+        """last_id 之后的事件；所需事件已被环形缓冲淘汰（或 ID 不属于本进程）时返回 None"""
+        with self._condition:
+            return self._since(last_id)
+
+    def _since(self, last_id: int) -> Optional[List[Dict[str, Any]]]:
+        if last_id > self._last_id:
+            return None
+        if last_id == self._last_id:
+            return []
+        oldest = self._events[0]['id'] if self._events else self._last_id + 1
+        if last_id < oldest - 1:
+            return None
+        return [event for event in self._events if event['id'] > last_id]
+
+    def wait(self, last_id: int, timeout: float) -> Tuple[Optional[List[Dict[str, Any]]], int]:
+        """等待 last_id 之后的事件，最多等待 timeout 秒；返回 (事件列表或 None, 新的 last_id)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id != last_id, timeout)
+            events = self._since(last_id)
+            return events, (events[-1]['id'] if events else self._last_id)
+
+
+def format_event(event: Dict[str, Any]) -> str:
+    """按 SSE 格式输出一条事件"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {serialization.dumps_text(event)}\n\n"
+
+
+def format_reset(last_id: int) -> str:
+    """客户端的 Last-Event-ID 已不在缓冲区内，通知其重新拉取全部数据"""
+    return f"id: {last_id}\nevent: reset\ndata: {serialization.dumps_text({'id': last_id})}\n\n"
@@ -0,0 +1,160 @@
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from prerequisites import PrerequisiteGraph
+
+
+def completed_task_ids(tasks_progress: Optional[Dict[str, Any]]) -> Set[str]:
+    """从科目进度的 tasks 映射中取出已完成的任务ID"""
+    return {
+        task_id for task_id, task_progress in (tasks_progress or {}).items()
+        if task_progress and task_progress.get('status') == 'completed'
+    }
+
+
+class SubjectIndex:
+    """科目任务索引：科目加载或更新时预先计算，进度统计只需做集合运算"""
+
+    def __init__(self, subject: Dict[str, Any]):
+        # 保留对原科目对象的引用，用于判断索引是否过期
+        self.subject = subject
+        self.subject_id = subject.get('id')
+        self.task_ids: Set[str] = set()
+        self.level_tasks: Dict[str, Set[str]] = {}
+        self.chapter_tasks: Dict[str, Set[str]] = {}
+        # 任务ID -> (年级ID, 章节ID)
+        self.task_location: Dict[str, Tuple[str, str]] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.level_count = 0
+        self.chapter_count = 0
+
+        for level in subject.get('levels') or []:
+            level_id = level.get('id')
+            level_task_ids = self.level_tasks.setdefault(level_id, set())
+            self.level_count += 1
+            for chapter in level.get('chapters') or []:
+                self.chapter_count += 1
+                chapter_id = chapter.get('id')
+                chapter_task_ids = self.chapter_tasks.setdefault(chapter_id, set())
+                for task in chapter.get('tasks') or []:
+                    task_id = task.get('id')
+                    self.task_ids.add(task_id)
+                    level_task_ids.add(task_id)
+                    chapter_task_ids.add(task_id)
+                    self.task_location[task_id] = (level_id, chapter_id)
+                    self.tasks[task_id] = task
+
+        # 前置依赖图，随科目版本构建一次
+        self.graph = PrerequisiteGraph(self.tasks)
+
+    @property
+    def total(self) -> int:
+        """科目任务总数"""
+        return len(self.task_ids)
+
+    def count_completed(self, completed: Set[str]) -> int:
+        """统计属于本科目的已完成任务数"""
+        return len(self.task_ids & completed)
+
+    def progress(self, completed: Set[str]) -> Dict[str, int]:
+        """计算科目进度 {progress, completed, total}"""
+        completed_count = self.count_completed(completed)
+        return {
+            'progress': round((completed_count / self.total) * 100) if self.total > 0 else 0,
+            'completed': completed_count,
+            'total': self.total
+        }
+
+
+class ProgressCounters:
+    """学生 × 科目的完成计数，随进度保存与科目修改增量维护，统计接口直接读取汇总值"""
+
+    def __init__(self):
+        # 学生ID -> 科目ID -> 已完成任务ID集合
+        self._completed: Dict[str, Dict[str, Set[str]]] = {}
+        # 学生ID -> 科目ID -> [完成数, 总数]
+        self._counts: Dict[str, Dict[str, List[int]]] = {}
+        # 科目ID -> 拥有该科目的学生ID
+        self._subject_students: Dict[str, Set[str]] = {}
+        # 学生ID -> 总体进度百分比
+        self._overall: Dict[str, int] = {}
+        self._overall_sum = 0
+
+    def set_student(self, student_id: str, subjects: Dict[str, Set[str]],
+                    indexes: Dict[str, Optional[SubjectIndex]]) -> None:
+        """整体替换某学生的各科目完成情况"""
+        self._drop_subjects(student_id)
+        self._completed[student_id] = {}
+        self._counts[student_id] = {}
+        for subject_id, completed in subjects.items():
+            self._set_subject(student_id, subject_id, completed, indexes.get(subject_id))
+        self._update_overall(student_id)
+
+    def remove_student(self, student_id: str) -> None:
+        """移除学生的全部计数"""
+        self._drop_subjects(student_id)
+        self._completed.pop(student_id, None)
+        self._counts.pop(student_id, None)
+        self._overall_sum -= self._overall.pop(student_id, 0)
+
+    def update_subject_index(self, subject_id: str, old_index: Optional[SubjectIndex],
+                             new_index: Optional[SubjectIndex]) -> None:
+        """科目任务增删后，只按新增/删除的任务调整拥有该科目的学生计数"""
+        old_ids = old_index.task_ids if old_index else set()
+        new_ids = new_index.task_ids if new_index else set()
+        added = new_ids - old_ids
+        removed = old_ids - new_ids
+
+        for student_id in self._subject_students.get(subject_id, ()):
+            completed = self._completed[student_id][subject_id]
+            counts = self._counts[student_id][subject_id]
+            counts[0] += len(added & completed) - len(removed & completed)
+            counts[1] = len(new_ids)
+            self._update_overall(student_id)
+
+    def subject_students(self, subject_id: str) -> Set[str]:
+        """拥有某科目的学生ID"""
+        return set(self._subject_students.get(subject_id, ()))
+
+    def overall_progress(self, student_id: str) -> Optional[int]:
+        """学生总体进度百分比，未统计的学生返回 None"""
+        return self._overall.get(student_id)
+
+    def subject_progress(self, student_id: str, subject_id: str) -> Optional[Dict[str, int]]:
+        """学生某科目的进度 {progress, completed, total}，未统计时返回 None"""
+        counts = self._counts.get(student_id, {}).get(subject_id)
+        if counts is None:
+            return None
+        completed, total = counts
+        return {
+            'progress': round((completed / total) * 100) if total > 0 else 0,
+            'completed': completed,
+            'total': total
+        }
+
+    def completed_tasks(self, student_id: str, subject_id: str) -> Optional[Set[str]]:
+        """学生某科目的已完成任务ID集合，未统计时返回 None（调用方不应修改）"""
+        return self._completed.get(student_id, {}).get(subject_id)
+
+    def average_progress(self) -> float:
+        """所有学生的平均进度"""
+        return self._overall_sum / len(self._overall) if self._overall else 0
+
+    def _set_subject(self, student_id: str, subject_id: str, completed: Set[str],
+                     index: Optional[SubjectIndex]) -> None:
+        self._completed.setdefault(student_id, {})[subject_id] = completed
+        self._counts.setdefault(student_id, {})[subject_id] = (
+            [index.count_completed(completed), index.total] if index else [0, 0]
+        )
+        self._subject_students.setdefault(subject_id, set()).add(student_id)
+
+    def _drop_subjects(self, student_id: str) -> None:
+        for subject_id in self._completed.get(student_id, {}):
+            self._subject_students.get(subject_id, set()).discard(student_id)
+
+    def _update_overall(self, student_id: str) -> None:
+        counts = self._counts.get(student_id, {}).values()
+        completed = sum(c[0] for c in counts)
+        total = sum(c[1] for c in counts)
+        progress = round((completed / total) * 100) if total > 0 else 0
+        self._overall_sum += progress - self._overall.get(student_id, 0)
+        self._overall[student_id] = progress
@@ -0,0 +1,101 @@
+import json
+import logging
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from flask import Flask, g, has_request_context, request
+
+from metrics import REQUEST_DURATION, RESPONSE_BYTES
+
+access_logger = logging.getLogger('education.access')
+
+
+class RequestIdFilter(logging.Filter):
+    """给请求内产生的每条日志附加 request_id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, 'request_id'):
+            record.request_id = getattr(g, 'request_id', None) if has_request_context() else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON；extra={'fields': {...}} 中的字段并入输出"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['requestId'] = record.request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = 'INFO', fmt: str = 'json') -> None:
+    """配置根日志：输出到 stderr，fmt 为 json（结构化）或 text"""
+    handler = logging.StreamHandler(sys.stderr)
+    handler.addFilter(RequestIdFilter())
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'))
+
+    root = logging.getLogger()
+    # 重复创建应用（如测试中）时替换而不是叠加处理器
+    for existing in [h for h in root.handlers if getattr(h, '_education', False)]:
+        root.removeHandler(existing)
+    handler._education = True
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+
+def _route_label() -> str:
+    """路由模板作为指标标签（如 /api/students/<student_id>），未匹配的路径归为一类，避免标签数量无限增长"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def init_app(app: Flask) -> None:
+    """注册请求钩子：分配请求ID、记录延迟直方图与访问日志
+
+    应在其他 after_request 钩子之前调用——Flask 按注册的逆序执行，这样计时包含压缩等后续处理。
+    """
+    configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+
+    @app.before_request
+    def start_request():
+        # 沿用上游（网关、负载均衡）传入的请求ID，便于串联日志
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = getattr(g, 'request_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        route = _route_label()
+        REQUEST_DURATION.observe(duration, request.method, route, str(response.status_code))
+        size = None if response.is_streamed else response.calculate_content_length()
+        if size:
+            RESPONSE_BYTES.inc(size, request.method, route)
+        response.headers['X-Request-ID'] = g.request_id
+
+        if access_logger.isEnabledFor(logging.INFO):
+            access_logger.info('request', extra={'fields': {
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'route': route,
+                'status': response.status_code,
+                'durationMs': round(duration * 1000, 3),
+                'bytes': size,
+            }})
+        return response
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import serialization
+from metrics import observe_storage
+from persistence import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressJournal:
+    """学生进度的追加式日志（每行一条JSON记录）
+
+    写入方需持有 ``lock`` 并先调用 ``read_new`` 追上其他进程的记录；
+    压缩时把日志改名归档（或删除），其他进程通过文件 inode 变化感知轮换。
+    """
+
+    def __init__(self, path: str, fsync_interval: float = 1.0):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.lock = FileLock(path)
+        self._offset = 0
+        self._ident: Optional[Tuple[int, int]] = None
+        self._needs_fsync = False
+        self._fsync_lock = threading.Lock()
+
+    def read_new(self) -> Tuple[bool, List[Dict[str, Any]]]:
+        """读取上次位置之后新增的完整记录，返回 (日志是否已被轮换, 新记录)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+        ident = (stat.st_dev, stat.st_ino) if stat else None
+
+        rotated = False
+        if self._ident is not None and (ident != self._ident or stat.st_size < self._offset):
+            rotated = True
+            self._offset = 0
+        self._ident = ident
+
+        if stat is None or stat.st_size == self._offset:
+            return rotated, []
+
+        started = time.perf_counter()
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(stat.st_size - self._offset)
+        observe_storage('read', 'journal', len(chunk), time.perf_counter() - started)
+
+        # 只处理以换行结尾的完整记录，未写完的最后一行留到下次读取
+        end = chunk.rfind(b'\n') + 1
+        self._offset += end
+        records = []
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(serialization.loads(line))
+            except json.JSONDecodeError:
+                logger.warning("跳过无法解析的日志记录: %r", line[:80])
+        return rotated, records
+
+    def append(self, *records: Dict[str, Any]) -> None:
+        """追加记录，多条记录一次写入（调用方持有锁且已调用 read_new）"""
+        started = time.perf_counter()
+        ts = datetime.now().isoformat()
+        lines = b''.join(serialization.dumps({**record, 'ts': ts}) + b'\n' for record in records)
+        with open(self.path, 'ab') as f:
+            f.write(lines)
+            f.flush()
+            if self.fsync_interval <= 0:
+                os.fsync(f.fileno())
+            self._offset = f.tell()
+            stat = os.fstat(f.fileno())
+            self._ident = (stat.st_dev, stat.st_ino)
+        if self.fsync_interval > 0:
+            self._needs_fsync = True
+        observe_storage('append', 'journal', len(lines), time.perf_counter() - started)
+
+    def fsync(self) -> None:
+        """把已追加但尚未落盘的记录 fsync 到磁盘（批量执行）"""
+        with self._fsync_lock:
+            if not self._needs_fsync:
+                return
+            self._needs_fsync = False
+            try:
+                with open(self.path, 'ab') as f:
+                    os.fsync(f.fileno())
+            except OSError as e:
+                logger.error("日志 fsync 失败: %s", e)
+
+    def size(self) -> int:
+        """当前日志文件大小（字节）"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def rotate(self, archive_dir: Optional[str] = None) -> None:
+        """轮换日志：归档到 archive_dir（为空则删除），调用方持有锁"""
+        self.fsync()
+        if os.path.exists(self.path):
+            if archive_dir:
+                os.makedirs(archive_dir, exist_ok=True)
+                timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+                os.replace(self.path, os.path.join(archive_dir, f'progress-{timestamp}.ndjson'))
+            else:
+                os.remove(self.path)
+        self._offset = 0
+        self._ident = None
@@ -0,0 +1,159 @@
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+# 延迟直方图的默认桶（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Counter:
+    """只增不减的计数器，按标签值分别计数"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """累计分桶的直方图（Prometheus 语义：每个桶统计小于等于上界的观测数）"""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数（非累计）..., +Inf 桶, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        # 线性查找：桶数少，比 bisect 的函数调用开销更低
+        position = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                position = i
+                break
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                counts = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            counts[position] += 1
+            counts[-1] += value
+
+    def count(self, *label_values: str) -> int:
+        counts = self._values.get(label_values)
+        return int(sum(counts[:-1])) if counts else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        for label_values, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:-1]):
+                cumulative += count
+                le = 'le="{}"'.format('+Inf' if bound == float('inf') else repr(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {int(cumulative)}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(counts[-1])}')
+            lines.append(f'{self.name}_count{labels} {int(cumulative)}')
+        return lines
+
+
+class Registry:
+    """指标注册表，按注册顺序输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self._metrics: List[object] = []
+        self.started = time.time()
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = [
+            '# HELP process_start_time_seconds Start time of the process since unix epoch in seconds.',
+            '# TYPE process_start_time_seconds gauge',
+            f'process_start_time_seconds {self.started:.3f}',
+        ]
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# 请求
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route', 'status'))
+RESPONSE_BYTES = REGISTRY.counter(
+    'http_response_bytes_total', 'Bytes sent in response bodies by route.', ('method', 'route'))
+ERRORS = REGISTRY.counter(
+    'app_errors_total', 'Unhandled exceptions by type and route.', ('type', 'route'))
+
+# 存储读写：op 为 read/write/append/transaction，target 为 students/subjects/progress/journal/sqlite 等
+STORAGE_OPERATIONS = REGISTRY.counter(
+    'storage_operations_total', 'Storage reads and writes.', ('op', 'target'))
+STORAGE_BYTES = REGISTRY.counter(
+    'storage_bytes_total', 'Bytes read from or written to storage files.', ('op', 'target'))
+STORAGE_DURATION = REGISTRY.histogram(
+    'storage_operation_duration_seconds', 'Duration of storage reads and writes.', ('op', 'target'))
+
+# 缓存命中
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit/miss).', ('cache', 'result'))
+
+
+def observe_storage(op: str, target: str, nbytes: int, seconds: float) -> None:
+    """记录一次存储读写"""
+    STORAGE_OPERATIONS.inc(1, op, target)
+    STORAGE_DURATION.observe(seconds, op, target)
+    if nbytes:
+        STORAGE_BYTES.inc(nbytes, op, target)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """记录一次缓存查找"""
+    CACHE_REQUESTS.inc(1, cache, 'hit' if hit else 'miss')
@@ -1,454 +1,1038 @@
-
-import json
-import os
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Dict, Any, BinaryIO, Callable, Iterator, Optional, Set, Tuple
+import serialization
 from config import Config
+from curriculum import CurriculumNotFound, SubjectEditor
+from activity import ActivityIndex, COMPLETION_TYPES, bucket_starts, summarize
+from analytics import CohortIndex
+from dashboard import build_subject_rollup, recent_activity
+from events import EventBus
+from indexes import SubjectIndex, ProgressCounters, completed_task_ids
+from metrics import cache_lookup
+from prerequisites import UnlockState
+from rollups import RollupTree, task_minutes
+from search import SearchIndex
+from storage import Storage, StorageError, create_storage
+from transfer import Importer, encode_lines, export_records
+
+logger = logging.getLogger(__name__)
+
+# 内容哈希缓存保留的对象数（按最近使用淘汰）
+CONTENT_HASH_CACHE_SIZE = 10000
+
+class VersionConflict(Exception):
+    """If-Match 给出的版本与资源当前版本不一致"""
+
+
+class _BatchAborted(Exception):
+    """原子批量操作中有失败项，用于回滚整个事务"""
+
 
 class DataManager:
-    def __init__(self):
+    def __init__(self, storage: Optional[Storage] = None):
         self.config = Config()
-        self._ensure_data_dir()
-        self._ensure_files()
-    
-    def _ensure_data_dir(self):
-        """确保数据目录存在"""
-        if not os.path.exists(self.config.DATA_DIR):
-            os.makedirs(self.config.DATA_DIR)
-    
-    def _ensure_files(self):
-        """确保数据文件存在"""
-        # 如果文件不存在，创建默认数据
-        if not os.path.exists(self.config.STUDENTS_FILE):
-            self._create_default_students()
-        if not os.path.exists(self.config.SUBJECTS_FILE):
-            self._create_default_subjects()
-        if not os.path.exists(self.config.PROGRESS_FILE):
-            self._create_default_progress()
-    
-    def _create_default_students(self):
-        """创建默认学生数据"""
-        default_students = [
-            {
-                "id": "student_001",
-                "name": "张小明",
-                "avatar": "👦",
-                "subjects": ["math", "chinese", "english"],
-                "createdAt": "2024-01-15",
-                "lastUpdate": "2024-01-20",
-                "grade": "一年级",
-                "notes": "学习积极主动，数学基础较好"
-            },
-            {
-                "id": "student_002",
-                "name": "李小红",
-                "avatar": "👧",
-                "subjects": ["math", "chinese", "science"],
-                "createdAt": "2024-01-10",
-                "lastUpdate": "2024-01-18",
-                "grade": "一年级",
-                "notes": "语文表达能力强，喜欢科学实验"
-            },
-            {
-                "id": "student_003",
-                "name": "王大强",
-                "avatar": "👨",
-                "subjects": ["math", "english", "science"],
-                "createdAt": "2024-01-12",
-                "lastUpdate": "2024-01-19",
-                "grade": "一年级",
-                "notes": "动手能力强，逻辑思维清晰"
-            }
-        ]
-        self._write_json(self.config.STUDENTS_FILE, default_students)
-    
-    def _create_default_subjects(self):
-        """创建默认科目数据"""
-        default_subjects = [
-            {
-                "id": "math",
-                "name": "数学",
-                "icon": "🧮",
-                "color": "#4285f4",
-                "description": "基础数学概念和运算能力培养",
-                "levels": [
-                    {
-                        "id": "grade_1",
-                        "name": "一年级数学",
-                        "chapters": [
-                            {
-                                "id": "numbers_basic",
-                                "name": "数字认知",
-                                "description": "学习0-100的数字概念",
-                                "tasks": [
-                                    {
-                                        "id": "task_001",
-                                        "name": "认识1-10",
-                                        "type": "concept",
-                                        "steps": [
-                                            "符号灌输：数字1,2,3...的写法和读音",
-                                            "现实意义：用物品数数，理解数量概念",
-                                            "题目训练：数字连线、填空练习",
-                                            "测试：口算测验和应用题"
-                                        ],
-                                        "estimatedTime": 30,
-                                        "difficulty": 1,
-                                        "prerequisites": []
-                                    },
-                                    {
-                                        "id": "task_002",
-                                        "name": "数字比较大小",
-                                        "type": "skill",
-                                        "steps": [
-                                            "符号灌输：大于号>、小于号<、等于号=",
-                                            "现实意义：比较糖果数量、身高体重",
-                                            "题目训练：填空比较、选择题练习",
-                                            "测试：综合比较判断题"
-                                        ],
-                                        "estimatedTime": 25,
-                                        "difficulty": 2,
-                                        "prerequisites": ["task_001"]
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "chinese",
-                "name": "语文",
-                "icon": "📚",
-                "color": "#34a853",
-                "description": "汉语拼音、汉字认识和阅读理解",
-                "levels": [
-                    {
-                        "id": "grade_1",
-                        "name": "一年级语文",
-                        "chapters": [
-                            {
-                                "id": "pinyin_basic",
-                                "name": "拼音基础",
-                                "description": "学习声母韵母和拼读",
-                                "tasks": [
-                                    {
-                                        "id": "task_001",
-                                        "name": "认识声母",
-                                        "type": "concept",
-                                        "steps": [
-                                            "符号灌输：23个声母的读音和写法",
-                                            "现实意义：结合生活中的词汇记忆",
-                                            "题目训练：声母认读和书写练习",
-                                            "测试：声母默写和发音测试"
-                                        ],
-                                        "estimatedTime": 40,
-                                        "difficulty": 2,
-                                        "prerequisites": []
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "english",
-                "name": "英语",
-                "icon": "🇺🇸",
-                "color": "#ea4335",
-                "description": "英语字母、单词和简单句型学习",
-                "levels": [
-                    {
-                        "id": "grade_1",
-                        "name": "一年级英语",
-                        "chapters": [
-                            {
-                                "id": "alphabet_basic",
-                                "name": "字母学习",
-                                "description": "认识26个英文字母",
-                                "tasks": [
-                                    {
-                                        "id": "task_001",
-                                        "name": "认识字母A-M",
-                                        "type": "concept",
-                                        "steps": [
-                                            "符号灌输：字母A-M的大小写形式和发音",
-                                            "现实意义：字母在生活中的应用（标识、品牌等）",
-                                            "题目训练：字母描红和发音练习",
-                                            "测试：字母认读和书写测试"
-                                        ],
-                                        "estimatedTime": 35,
-                                        "difficulty": 2,
-                                        "prerequisites": []
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            },
-            {
-                "id": "science",
-                "name": "科学",
-                "icon": "🔬",
-                "color": "#fbbc04",
-                "description": "自然现象观察和科学思维培养",
-                "levels": [
-                    {
-                        "id": "grade_1",
-                        "name": "一年级科学",
-                        "chapters": [
-                            {
-                                "id": "nature_observation",
-                                "name": "自然观察",
-                                "description": "观察身边的自然现象",
-                                "tasks": [
-                                    {
-                                        "id": "task_001",
-                                        "name": "观察植物",
-                                        "type": "concept",
-                                        "steps": [
-                                            "符号灌输：植物的基本部位（根、茎、叶、花、果）",
-                                            "现实意义：观察校园和家周围的植物",
-                                            "题目训练：植物部位标识和分类练习",
-                                            "测试：植物观察记录和部位识别"
-                                        ],
-                                        "estimatedTime": 45,
-                                        "difficulty": 2,
-                                        "prerequisites": []
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                ]
-            }
-        ]
-        self._write_json(self.config.SUBJECTS_FILE, default_subjects)
-    
-    def _create_default_progress(self):
-        """创建默认进度数据"""
-        self._write_json(self.config.PROGRESS_FILE, {})
-    
-    def _read_json(self, filepath: str) -> Any:
-        """读取JSON文件"""
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return None
-    
-    def _write_json(self, filepath: str, data: Any) -> bool:
-        """写入JSON文件"""
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            print(f"写入文件失败: {e}")
-            return False
+        # 持久化由存储层负责（默认 JSON 文件，可通过 Config.STORAGE_BACKEND 切换为 SQLite）
+        self.storage = storage or create_storage(self.config)
+        # 保护内存索引与计数的进程内锁
+        self._lock = threading.RLock()
+        # 已在内存中对齐科目、但尚未持久化的学生进度: 学生ID -> (学生对象, 原进度对象, 对齐后的进度)
+        self._reconciled: Dict[str, Tuple[Dict[str, Any], Optional[Dict[str, Any]], Dict[str, Any]]] = {}
+        # 科目ID -> 任务索引（按科目对象身份判断是否过期）
+        self._subject_indexes: Dict[str, SubjectIndex] = {}
+        # 增量维护的进度计数；其他进程的修改只重算受影响的学生
+        self._counters: Optional[ProgressCounters] = None
+        # 按时间排序的学习事件（开始任务、完成步骤/任务），与进度计数一起维护
+        self._activity: Optional[ActivityIndex] = None
+        # 各科目下每个学生的任务状态与用时（科目分析用），与进度计数一起维护
+        self._cohorts: Optional[CohortIndex] = None
+        # (学生ID, 科目ID) -> 解锁状态，随完成情况增量更新
+        self._unlock_states: Dict[Tuple[str, str], UnlockState] = {}
+        # (学生ID, 科目ID) -> 年级/章节汇总树，随完成情况与科目修改增量更新
+        self._rollups: Dict[Tuple[str, str], RollupTree] = {}
+        # 科目结构的全文索引，查询时按科目对象身份增量同步
+        self._search = SearchIndex()
+        # 对象内容哈希（LRU）: id(对象) -> (对象, 哈希)；存储层返回的对象在修改前保持同一身份，哈希只算一次。
+        # 缓存持有对象引用，对象在缓存中时其 id 不会被复用
+        self._content_hashes: 'OrderedDict[int, Tuple[Any, str]]' = OrderedDict()
+        # 数据变更事件（供 /api/events 推送）
+        self.events = EventBus(self.config.EVENT_BUFFER_SIZE)
     
     # 学生相关方法
     def get_all_students(self) -> List[Dict[str, Any]]:
         """获取所有学生"""
-        return self._read_json(self.config.STUDENTS_FILE) or []
+        return self.storage.list_students()
     
     def get_student_by_id(self, student_id: str) -> Optional[Dict[str, Any]]:
         """根据ID获取学生"""
-        students = self.get_all_students()
-        return next((s for s in students if s['id'] == student_id), None)
+        return self.storage.get_student(student_id)
+    
+    def allocate_student_id(self) -> str:
+        """分配未被占用的学生ID（需在事务内调用，保证与并发创建不冲突）"""
+        student_id = f"student_{int(time.time() * 1000)}"
+        candidate, n = student_id, 1
+        while self.storage.get_student(candidate):
+            candidate = f"{student_id}_{n}"
+            n += 1
+        return candidate
     
     def add_student(self, student_data: Dict[str, Any]) -> bool:
-        """添加新学生"""
-        students = self.get_all_students()
-        
-        # 检查ID是否已存在
-        if any(s['id'] == student_data['id'] for s in students):
+        """添加新学生（未提供ID时自动分配并写回 student_data）"""
+        try:
+            with self.storage.transaction():
+                if not student_data.get('id'):
+                    student_data['id'] = self.allocate_student_id()
+                # 检查ID是否已存在
+                elif self.storage.get_student(student_data['id']):
+                    return False
+                
+                # 添加时间戳
+                student_data['createdAt'] = datetime.now().strftime('%Y-%m-%d')
+                student_data['lastUpdate'] = datetime.now().strftime('%Y-%m-%d')
+                self.storage.put_student(student_data)
+        except StorageError as e:
+            logger.error("添加学生失败: %s", e)
             return False
         
-        # 添加时间戳
-        student_data['createdAt'] = datetime.now().strftime('%Y-%m-%d')
-        student_data['lastUpdate'] = datetime.now().strftime('%Y-%m-%d')
-        
-        students.append(student_data)
-        return self._write_json(self.config.STUDENTS_FILE, students)
+        self._refresh_student_counters(student_data['id'])
+        self._publish('student', student_data['id'], 'created', student_data)
+        return True
     
-    def update_student(self, student_id: str, student_data: Dict[str, Any]) -> bool:
-        """更新学生信息"""
-        students = self.get_all_students()
-        
-        for i, student in enumerate(students):
-            if student['id'] == student_id:
+    def update_student(self, student_id: str, student_data: Dict[str, Any],
+                       if_match: Optional[Any] = None) -> bool:
+        """更新学生信息；if_match 为 If-Match 版本集合，与当前版本不符时抛出 VersionConflict"""
+        try:
+            with self.storage.transaction():
+                student = self.storage.get_student(student_id)
+                if not student:
+                    return False
+                if if_match and not if_match.contains(self.student_etag(student_id)):
+                    raise VersionConflict(student_id)
+                
                 student_data['lastUpdate'] = datetime.now().strftime('%Y-%m-%d')
-                students[i] = {**student, **student_data}
-                return self._write_json(self.config.STUDENTS_FILE, students)
+                updated = {**student, **student_data}
+                self.storage.put_student(updated)
+        except StorageError as e:
+            logger.error("更新学生失败: %s", e)
+            return False
         
-        return False
+        # 科目列表变化时同步并持久化进度数据
+        synced = True
+        if set(updated.get('subjects', [])) != set(student.get('subjects', [])):
+            synced = self._sync_student_subjects(student_id)
+            self._refresh_student_counters(student_id)
+        self._publish('student', student_id, 'updated', student_data)
+        return synced
     
     def delete_student(self, student_id: str) -> bool:
         """删除学生"""
-        students = self.get_all_students()
-        students = [s for s in students if s['id'] != student_id]
-        return self._write_json(self.config.STUDENTS_FILE, students)
+        try:
+            self.storage.delete_student(student_id)
+        except StorageError as e:
+            logger.error("删除学生失败: %s", e)
+            return False
+        
+        with self._lock:
+            self._reconciled.pop(student_id, None)
+            self._forget_student(student_id)
+        self._publish('student', student_id, 'deleted')
+        return True
     
     # 科目相关方法
     def get_all_subjects(self) -> List[Dict[str, Any]]:
         """获取所有科目"""
-        return self._read_json(self.config.SUBJECTS_FILE) or []
+        return self.storage.list_subjects()
     
     def get_subject_by_id(self, subject_id: str) -> Optional[Dict[str, Any]]:
         """根据ID获取科目"""
-        subjects = self.get_all_subjects()
-        return next((s for s in subjects if s['id'] == subject_id), None)
+        return self.storage.get_subject(subject_id)
     
-    def add_subject(self, subject_data: Dict[str, Any]) -> bool:
-        """添加新科目"""
-        subjects = self.get_all_subjects()
+    def get_subject_index(self, subject_id: str) -> Optional[SubjectIndex]:
+        """获取科目任务索引，科目内容变化（重新加载或更新）后才重建"""
+        subject = self.get_subject_by_id(subject_id)
+        if not subject:
+            return None
         
-        # 检查ID是否已存在
-        if any(s['id'] == subject_data['id'] for s in subjects):
+        with self._lock:
+            index = self._subject_indexes.get(subject_id)
+            hit = index is not None and index.subject is subject
+            cache_lookup('subject_index', hit)
+            if not hit:
+                index = SubjectIndex(subject)
+                self._subject_indexes[subject_id] = index
+            return index
+    
+    def add_subject(self, subject_data: Dict[str, Any]) -> bool:
+        """添加新科目；前置任务关系无效时抛出 PrerequisiteError"""
+        index = SubjectIndex(subject_data)
+        index.graph.validate()
+        try:
+            with self.storage.transaction():
+                # 检查ID是否已存在
+                if self.storage.get_subject(subject_data['id']):
+                    return False
+                self.storage.put_subject(subject_data)
+        except StorageError as e:
+            logger.error("添加科目失败: %s", e)
             return False
         
-        subjects.append(subject_data)
-        return self._write_json(self.config.SUBJECTS_FILE, subjects)
+        self._replace_subject_index(subject_data['id'], index)
+        self._publish('subject', subject_data['id'], 'created', self._subject_delta(subject_data, index))
+        return True
     
-    def update_subject(self, subject_id: str, subject_data: Dict[str, Any]) -> bool:
-        """更新科目信息"""
-        subjects = self.get_all_subjects()
-        
-        for i, subject in enumerate(subjects):
-            if subject['id'] == subject_id:
-                subjects[i] = {**subject, **subject_data}
-                return self._write_json(self.config.SUBJECTS_FILE, subjects)
+    def update_subject(self, subject_id: str, subject_data: Dict[str, Any],
+                       if_match: Optional[Any] = None) -> bool:
+        """更新科目信息；if_match 为 If-Match 版本集合，与当前版本不符时抛出 VersionConflict，
+        前置任务关系无效时抛出 PrerequisiteError"""
+        try:
+            with self.storage.transaction():
+                subject = self.storage.get_subject(subject_id)
+                if not subject:
+                    return False
+                if if_match and not if_match.contains(self.subject_etag(subject_id)):
+                    raise VersionConflict(subject_id)
+                updated = {**subject, **subject_data}
+                # 前置任务关系无效时抛出 PrerequisiteError，不写入
+                index = SubjectIndex(updated)
+                index.graph.validate()
+                self.storage.put_subject(updated)
+        except StorageError as e:
+            logger.error("更新科目失败: %s", e)
+            return False
         
-        return False
+        # 只重建被修改科目的索引
+        self._replace_subject_index(subject_id, index)
+        self._publish('subject', subject_id, 'updated', self._subject_delta(subject_data, index))
+        return True
+    
+    def edit_subject(self, subject_id: str, edit: Callable[[SubjectEditor], Any],
+                     if_match: Optional[Any] = None) -> Any:
+        """对科目树做一次定点修改（增删改、移动年级/章节/任务/步骤），返回 edit 的结果
+    
+        edit 接收 SubjectEditor，只复制被修改的路径，未变化的年级、章节与任务保持原对象，
+        存储层只写入变化的部分。科目不存在时抛出 CurriculumNotFound，参数无效时抛出 CurriculumError，
+        前置任务关系无效时抛出 PrerequisiteError，版本不符时抛出 VersionConflict；存储失败时返回 None。
+        """
+        try:
+            with self.storage.transaction():
+                subject = self.storage.get_subject(subject_id)
+                if not subject:
+                    raise CurriculumNotFound('Subject not found')
+                if if_match and not if_match.contains(self.subject_etag(subject_id)):
+                    raise VersionConflict(subject_id)
+                editor = SubjectEditor(subject, self.get_subject_index(subject_id))
+                result = edit(editor)
+                index = SubjectIndex(editor.subject)
+                index.graph.validate()
+                self.storage.put_subject(editor.subject)
+        except StorageError as e:
+            logger.error("修改科目结构失败: %s", e)
+            return None
+    
+        self._replace_subject_index(subject_id, index)
+        self._publish('subject', subject_id, 'updated', {**editor.change, 'taskCount': index.total})
+        return result
     
-
     def delete_subject(self, subject_id: str) -> bool:
         """删除科目"""
-        subjects = self.get_all_subjects()  # 🔧 修复这里的错误
-        subjects = [s for s in subjects if s['id'] != subject_id]
-        return self._write_json(self.config.SUBJECTS_FILE, subjects)
-
+        try:
+            self.storage.delete_subject(subject_id)
+        except StorageError as e:
+            logger.error("删除科目失败: %s", e)
+            return False
+        
+        self._replace_subject_index(subject_id, None)
+        self._publish('subject', subject_id, 'deleted')
+        return True
+    
+    def _replace_subject_index(self, subject_id: str, index: Optional[SubjectIndex]) -> None:
+        """替换科目索引，并按任务增删调整进度计数"""
+        with self._lock:
+            old_index = self._subject_indexes.pop(subject_id, None)
+            if index:
+                self._subject_indexes[subject_id] = index
+            if self._counters:
+                self._counters.update_subject_index(subject_id, old_index, index)
+    
+    def _reconcile_progress(self, student: Dict[str, Any],
+                            progress: Optional[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """按学生的科目列表对齐进度数据（纯内存操作，不修改传入对象），返回 (进度, 是否有变化)"""
+        student_subjects = student.get('subjects', [])
+        subjects_progress = (progress or {}).get('subjects') or {}
+        
+        if progress is not None and set(subjects_progress) == set(student_subjects):
+            return progress, False
+        
+        # 保留已有科目的进度，补齐新科目，移除学生不再拥有的科目
+        reconciled = {}
+        for subject_id in student_subjects:
+            reconciled[subject_id] = subjects_progress.get(subject_id) or {
+                'currentLevel': 'grade_1',
+                'totalProgress': 0,
+                'tasks': {}
+            }
+        
+        return {**(progress or {}), 'studentId': student['id'], 'subjects': reconciled}, True
     
-    def _sync_student_subjects(self, student_id: str) -> None:
-        """同步学生的科目进度数据 - 关键修复"""
+    def _sync_student_subjects(self, student_id: str) -> bool:
+        """同步学生的科目进度数据，仅在内容确有变化时持久化"""
         student = self.get_student_by_id(student_id)
+        try:
+            with self.storage.transaction():
+                progress = self.get_student_progress(student_id, student)
+                if student_id not in self._reconciled:
+                    return True
+                
+                logger.info("同步学生 %s 的科目进度数据", student_id)
+                self.storage.put_progress(student_id, progress)
+        except StorageError as e:
+            logger.error("同步学生科目进度失败: %s", e)
+            return False
+        
+        with self._lock:
+            self._reconciled.pop(student_id, None)
+        return True
+    
+    # 进度相关方法 - 修复版本
+    def get_student_progress(self, student_id: str, student: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """获取学生进度 - 在内存中对齐科目数据，读取不会写入存储
+
+        student 为调用方事务外已读取的学生，传入后事务内不再读取（也就不锁定）学生文件。
+        """
+        if student is None:
+            student = self.get_student_by_id(student_id)
+        current = self.storage.get_progress(student_id)
         if not student:
-            return
+            return current or {}
         
-        all_progress = self._read_json(self.config.PROGRESS_FILE) or {}
-        student_progress = all_progress.get(student_id, {
-            'studentId': student_id,
-            'subjects': {}
+        with self._lock:
+            cached = self._reconciled.get(student_id)
+            if cached and cached[0] is student and cached[1] is current:
+                return cached[2]
+            
+            progress, changed = self._reconcile_progress(student, current)
+            if changed:
+                # 对齐结果只保存在内存中，随该学生下一次进度写入一起持久化
+                self._reconciled[student_id] = (student, current, progress)
+            else:
+                self._reconciled.pop(student_id, None)
+            return progress
+    
+    def save_student_progress(self, student_id: str, progress_data: Dict[str, Any]) -> bool:
+        """保存学生进度，同时写入各科目的 totalProgress 并更新进度计数"""
+        progress_data = self._fill_total_progress(progress_data)
+        try:
+            self.storage.put_progress(student_id, progress_data)
+        except StorageError as e:
+            logger.error("保存学生进度失败: %s", e)
+            return False
+        
+        with self._lock:
+            self._reconciled.pop(student_id, None)
+        self._refresh_student_counters(student_id)
+        self._publish('progress', student_id, 'updated', {
+            'subjects': {
+                subject_id: {'totalProgress': data['totalProgress']}
+                for subject_id, data in progress_data['subjects'].items()
+            },
+            'overallProgress': self.calculate_overall_progress(student_id)
         })
+        return True
+    
+    def _fill_total_progress(self, progress_data: Dict[str, Any]) -> Dict[str, Any]:
+        """计算各科目进度百分比并写入 totalProgress 字段（返回新对象）"""
+        subjects = {}
+        for subject_id, subject_data in (progress_data.get('subjects') or {}).items():
+            index = self.get_subject_index(subject_id)
+            completed = completed_task_ids(subject_data.get('tasks'))
+            subjects[subject_id] = {
+                **subject_data,
+                'totalProgress': index.progress(completed)['progress'] if index else 0
+            }
+        return {**progress_data, 'subjects': subjects}
+    
+    # 单任务进度修改
+    TASK_ACTIONS = ('start', 'complete', 'skip', 'uncomplete', 'reset')
+    
+    def update_task_progress(self, student_id: str, subject_id: str, task_id: str,
+                             action: str, step: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """按步骤操作修改单个任务的进度，状态与时间戳由服务端推导
         
-        # 确保学生拥有的每个科目都有进度数据
-        for subject_id in student.get('subjects', []):
-            if subject_id not in student_progress['subjects']:
-                student_progress['subjects'][subject_id] = {
-                    'currentLevel': 'grade_1',
-                    'totalProgress': 0,
-                    'tasks': {}
-                }
-                print(f"为学生 {student_id} 创建科目 {subject_id} 的进度数据")
+        返回 {task, subjectProgress, overallProgress, unlockedTasks, lockedTasks}；学生、科目或任务不存在时返回 None，
+        操作或步骤序号无效、开始未解锁的任务时抛出 ValueError，存储失败时抛出 StorageError。
+        """
+        if action not in self.TASK_ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        
+        index = self.get_subject_index(subject_id)
+        task = index.tasks.get(task_id) if index else None
+        student = self.get_student_by_id(student_id)
+        if not task or not student or subject_id not in student.get('subjects', []):
+            return None
         
-        # 移除学生不再拥有的科目进度数据
-        current_subjects = set(student.get('subjects', []))
-        existing_subjects = set(student_progress['subjects'].keys())
-        for subject_id in existing_subjects - current_subjects:
-            del student_progress['subjects'][subject_id]
-            print(f"移除学生 {student_id} 科目 {subject_id} 的进度数据")
+        steps_count = len(task.get('steps') or [])
+        if action in ('complete', 'skip', 'uncomplete'):
+            if not isinstance(step, int) or isinstance(step, bool) or not 0 <= step < steps_count:
+                raise ValueError('Invalid step index')
         
-        all_progress[student_id] = student_progress
-        self._write_json(self.config.PROGRESS_FILE, all_progress)
+        with self.storage.transaction():
+            progress = self.get_student_progress(student_id, student)
+            if student_id in self._reconciled:
+                # 先持久化科目对齐结果，任务记录叠加在其上
+                self.storage.put_progress(student_id, progress)
+            
+            subject_progress = progress['subjects'][subject_id]
+            completed = completed_task_ids(subject_progress.get('tasks'))
+            current = (subject_progress.get('tasks') or {}).get(task_id)
+            if not current and action != 'reset' and not index.graph.is_unlocked(task_id, completed):
+                raise ValueError('Task is locked by prerequisites')
+            
+            updated = self._apply_task_action(current, action, step, steps_count)
+            new_completed = completed
+            if updated is not current:
+                tasks = {**(subject_progress.get('tasks') or {}), task_id: updated}
+                if updated is None:
+                    del tasks[task_id]
+                new_completed = completed_task_ids(tasks)
+                total_progress = index.progress(new_completed)['progress']
+                self.storage.put_task_progress(student_id, subject_id, task_id, updated, total_progress)
+        
+        # 完成状态变化时只检查该任务的后继任务
+        unlocked_tasks, locked_tasks = [], []
+        if (task_id in completed) != (task_id in new_completed):
+            for dependent in index.graph.dependents.get(task_id, []):
+                if task_id in new_completed and index.graph.is_unlocked(dependent, new_completed):
+                    unlocked_tasks.append(dependent)
+                elif task_id in completed and index.graph.is_unlocked(dependent, completed):
+                    locked_tasks.append(dependent)
+        
+        with self._lock:
+            self._reconciled.pop(student_id, None)
+        self._refresh_student_counters(student_id)
+        
+        result = {
+            'task': updated,
+            'subjectProgress': self.calculate_subject_progress(student_id, subject_id),
+            'overallProgress': self.calculate_overall_progress(student_id),
+            'unlockedTasks': unlocked_tasks,
+            'lockedTasks': locked_tasks
+        }
+        if updated is not current:
+            self._publish('progress', student_id, 'updated', {'subjectId': subject_id, 'taskId': task_id, **result})
+        return result
     
-    # 进度相关方法 - 修复版本
-    def get_student_progress(self, student_id: str) -> Dict[str, Any]:
-        """获取学生进度 - 自动同步科目数据"""
-        # 首先同步科目数据
-        self._sync_student_subjects(student_id)
+    def _apply_task_action(self, current: Optional[Dict[str, Any]], action: str,
+                           step: Optional[int], steps_count: int) -> Optional[Dict[str, Any]]:
+        """计算操作后的任务进度（返回新对象，未变化时返回原对象）"""
+        if action == 'reset':
+            return None
+        if action == 'start' and current:
+            return current
+        
+        now = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        task = dict(current or {
+            'status': 'in_progress',
+            'currentStep': 0,
+            'startedAt': now,
+            'stepProgress': [{'completed': False} for _ in range(steps_count)]
+        })
+        if action == 'start':
+            return task
+        
+        step_progress = [dict(s or {'completed': False}) for s in task.get('stepProgress') or []]
+        step_progress += [{'completed': False} for _ in range(steps_count - len(step_progress))]
+        current_step = task.get('currentStep') or 0
+        
+        if action == 'uncomplete':
+            step_progress[step] = {'completed': False}
+            task['currentStep'] = min(step, current_step)
+        else:
+            step_progress[step] = {'completed': True, 'completedAt': now}
+            if action == 'skip':
+                step_progress[step]['skipped'] = True
+            if step == current_step:
+                task['currentStep'] = min(step + 1, steps_count)
+        task['stepProgress'] = step_progress
+        
+        # 所有步骤完成（含跳过）即任务完成
+        if all(s['completed'] for s in step_progress[:steps_count]):
+            if task.get('status') != 'completed':
+                task['status'] = 'completed'
+                task['completedAt'] = now
+        else:
+            task['status'] = 'in_progress'
+            task.pop('completedAt', None)
+        return task
+    
+    # 批量操作
+    def apply_batch(self, operations: List[Dict[str, Any]], atomic: bool = False) -> Tuple[bool, List[Dict[str, Any]]]:
+        """在一个事务内执行一组操作，所有修改只持久化一次
+        
+        返回 (是否已提交, 逐项结果)。单项失败只记录在结果中；atomic 为 True 时任一项失败则全部回滚。
+        """
+        results = []
+        # 科目列表可能变化的学生，以及被删除的学生
+        touched, deleted = set(), set()
+        try:
+            with self.storage.transaction():
+                for i, operation in enumerate(operations):
+                    try:
+                        result = self._apply_batch_operation(operation, touched, deleted)
+                        results.append({'index': i, 'op': operation.get('op'), 'success': True, **result})
+                    except ValueError as e:
+                        results.append({'index': i, 'op': operation.get('op'), 'success': False, 'error': str(e)})
+                        if atomic:
+                            raise _BatchAborted()
+                
+                # 在同一事务内对齐科目有变化的学生进度
+                for student_id in touched - deleted:
+                    progress = self.get_student_progress(student_id)
+                    if student_id in self._reconciled:
+                        self.storage.put_progress(student_id, progress)
+        except _BatchAborted:
+            return False, results
         
-        all_progress = self._read_json(self.config.PROGRESS_FILE) or {}
+        with self._lock:
+            for student_id in touched | deleted:
+                self._reconciled.pop(student_id, None)
+            for student_id in deleted:
+                if self._counters:
+                    self._counters.remove_student(student_id)
+                    self._activity.remove_student(student_id)
+                    self._cohorts.remove_student(student_id)
+                self._drop_student_states(student_id)
+        for student_id in touched - deleted:
+            self._refresh_student_counters(student_id)
         
-        if student_id not in all_progress:
-            # 创建默认进度
+        created = {r['id'] for r in results if r['success'] and r['op'] == 'createStudent'}
+        for student_id in deleted - created:
+            self._publish('student', student_id, 'deleted')
+        for student_id in touched - deleted:
             student = self.get_student_by_id(student_id)
-            if not student:
-                return {}
+            self._publish('student', student_id, 'created' if student_id in created else 'updated', student)
+        for student_id in {r['id'] for r in results if r['success'] and r['op'] == 'resetProgress'} - deleted:
+            self._publish('progress', student_id, 'updated',
+                          {'overallProgress': self.calculate_overall_progress(student_id)})
+        return True, results
+    
+    def _apply_batch_operation(self, operation: Dict[str, Any], touched: Set[str], deleted: Set[str]) -> Dict[str, Any]:
+        """执行单个批量操作（在事务内），失败时抛出 ValueError"""
+        op = operation.get('op')
+        today = datetime.now().strftime('%Y-%m-%d')
+        
+        if op == 'createStudent':
+            student = dict(operation.get('data') or {})
+            if not student.get('name'):
+                raise ValueError('Name is required')
+            if not student.get('id'):
+                student['id'] = self.allocate_student_id()
+            elif self.storage.get_student(student['id']):
+                raise ValueError('Student ID already exists')
+            student['createdAt'] = today
+            student['lastUpdate'] = today
+            self.storage.put_student(student)
+            touched.add(student['id'])
+            deleted.discard(student['id'])
+            return {'id': student['id']}
+        
+        if op == 'updateStudent':
+            student = self._batch_student(operation.get('id'))
+            data = {k: v for k, v in (operation.get('data') or {}).items() if k != 'id'}
+            self.storage.put_student({**student, **data, 'lastUpdate': today})
+            touched.add(student['id'])
+            return {'id': student['id']}
+        
+        if op == 'deleteStudent':
+            student = self._batch_student(operation.get('id'))
+            self.storage.delete_student(student['id'])
+            deleted.add(student['id'])
+            return {'id': student['id']}
+        
+        if op in ('assignSubject', 'unassignSubject'):
+            subject_id = operation.get('subjectId')
+            if op == 'assignSubject' and not self.storage.get_subject(subject_id):
+                raise ValueError('Subject not found')
+            
+            # 只返回科目列表确实发生变化的学生
+            updated = []
+            students = [self._batch_student(student_id) for student_id in operation.get('studentIds') or []]
+            for student in students:
+                subjects = student.get('subjects', [])
+                if op == 'assignSubject' and subject_id not in subjects:
+                    subjects = subjects + [subject_id]
+                elif op == 'unassignSubject' and subject_id in subjects:
+                    subjects = [s for s in subjects if s != subject_id]
+                else:
+                    continue
+                self.storage.put_student({**student, 'subjects': subjects, 'lastUpdate': today})
+                touched.add(student['id'])
+                updated.append(student['id'])
+            return {'updated': updated}
+        
+        if op == 'resetProgress':
+            student = self._batch_student(operation.get('studentId'))
+            subject_id = operation.get('subjectId')
+            progress = self.get_student_progress(student['id'])
+            subjects = progress.get('subjects', {})
+            if subject_id and subject_id not in subjects:
+                raise ValueError('Subject not found for student')
             
-            default_progress = {
-                'studentId': student_id,
-                'subjects': {}
+            # 指定科目时只清空该科目，否则清空全部科目的任务进度
+            reset = {
+                sid: ({**data, 'totalProgress': 0, 'tasks': {}} if not subject_id or sid == subject_id else data)
+                for sid, data in subjects.items()
             }
+            self.storage.put_progress(student['id'], {**progress, 'subjects': reset})
+            touched.add(student['id'])
+            return {'id': student['id']}
+        
+        raise ValueError(f"Unknown operation: {op}")
+    
+    def _batch_student(self, student_id: Optional[str]) -> Dict[str, Any]:
+        """批量操作中读取学生（包含本事务内已修改的数据），不存在时抛出 ValueError"""
+        student = self.storage.get_student(student_id) if student_id else None
+        if not student:
+            raise ValueError(f"Student not found: {student_id}")
+        return student
+    
+    # 批量导入/导出（NDJSON）
+    def export_ndjson(self, types: Optional[Set[str]] = None) -> Iterator[bytes]:
+        """逐行产生导出数据（科目、学生、进度），不在内存中拼接整个文档"""
+        return encode_lines(export_records(self.storage, types))
+    
+    def import_ndjson(self, stream: BinaryIO, batch_size: Optional[int] = None, dry_run: bool = False,
+                      skip_existing: bool = False) -> Dict[str, Any]:
+        """从 NDJSON 流分批导入（见 transfer.Importer），每批提交后刷新相关缓存，返回导入报告"""
+        def committed(_report: Dict[str, Any], changes: Dict[str, Any]) -> None:
+            for subject_id, index in changes['subjects'].items():
+                self._replace_subject_index(subject_id, index)
+            student_ids = changes['students'] | changes['progress']
+            with self._lock:
+                for student_id in student_ids:
+                    self._reconciled.pop(student_id, None)
+                    self._drop_student_states(student_id)
+            for student_id in student_ids:
+                self._refresh_student_counters(student_id)
+        
+        importer = Importer(self.storage, batch_size=batch_size or self.config.IMPORT_BATCH_SIZE,
+                            batch_bytes=self.config.IMPORT_BATCH_BYTES,
+                            max_line_bytes=self.config.IMPORT_MAX_LINE_BYTES,
+                            max_errors=self.config.IMPORT_MAX_ERRORS,
+                            dry_run=dry_run, skip_existing=skip_existing, on_batch=committed)
+        report = importer.run(stream)
+        # 不逐条发布事件（会冲掉事件缓冲），改为通知订阅者重新拉取
+        if not dry_run and any(report['imported'].values()):
+            self.events.reset()
+        return report
+    
+    # 进度计数
+    def sync_external_changes(self) -> None:
+        """应用其他进程造成的修改（每个请求开始时调用一次）：只重算有变化的学生与拥有被修改科目的学生"""
+        with self._lock:
+            students, subjects, stale = self.storage.consume_changes()
+            if self._counters is None:
+                return
+            if students is None or subjects is None:
+                self._rebuild_counters()
+                return
             
-            for subject_id in student.get('subjects', []):
-                default_progress['subjects'][subject_id] = {
-                    'currentLevel': 'grade_1',
-                    'totalProgress': 0,
-                    'tasks': {}
-                }
+            affected = set(stale)
+            for subject_id in subjects:
+                # 科目索引在下次使用时按新内容重建
+                self._subject_indexes.pop(subject_id, None)
+                affected |= self._counters.subject_students(subject_id)
+            for student_id in students:
+                self._reconciled.pop(student_id, None)
+                if not self.get_student_by_id(student_id):
+                    self._forget_student(student_id)
+            affected |= students
+            for student_id in affected:
+                if self.get_student_by_id(student_id):
+                    self._refresh_student_counters(student_id)
+    
+    def _get_counters(self) -> ProgressCounters:
+        """获取进度计数器，首次使用时整体构建；其他进程的修改由 sync_external_changes 按请求应用"""
+        with self._lock:
+            if self._counters is None:
+                # 构建前已有的变化都包含在本次构建中
+                self.storage.consume_changes()
+                self._rebuild_counters()
+            return self._counters
+    
+    def _rebuild_counters(self) -> None:
+        """按全部学生的当前进度重建计数、学习事件与科目分析数据"""
+        with self._lock:
+            self._counters = ProgressCounters()
+            self._activity = ActivityIndex()
+            self._cohorts = CohortIndex()
+            for student in self.get_all_students():
+                self._refresh_student_counters(student['id'])
+    
+    def _refresh_student_counters(self, student_id: str) -> None:
+        """按学生当前进度重新计算其计数、学习事件与科目分析数据，只影响该学生"""
+        with self._lock:
+            if self._counters is None:
+                return
             
-            all_progress[student_id] = default_progress
-            self._write_json(self.config.PROGRESS_FILE, all_progress)
+            progress = self.get_student_progress(student_id)
+            subjects = {
+                subject_id: completed_task_ids(subject_data.get('tasks'))
+                for subject_id, subject_data in progress.get('subjects', {}).items()
+            }
+            indexes = {subject_id: self.get_subject_index(subject_id) for subject_id in subjects}
+            self._counters.set_student(student_id, subjects, indexes)
+            self._activity.set_student(student_id, progress)
+            self._cohorts.set_student(student_id, progress)
+    
+    # 前置任务与解锁状态
+    def get_unlock_state(self, student_id: str, subject_id: str) -> Optional[UnlockState]:
+        """学生在某科目下的解锁状态；只按上次以来完成情况的变化更新受影响的后继任务"""
+        index = self.get_subject_index(subject_id)
+        if not index:
+            return None
         
-        return all_progress[student_id]
+        with self._lock:
+            completed = self._completed_tasks(student_id, subject_id)
+            state = self._unlock_states.get((student_id, subject_id))
+            if state is None or state.graph is not index.graph:
+                state = self._unlock_states[(student_id, subject_id)] = UnlockState(index.graph)
+            state.sync(completed)
+            return state
     
-    def save_student_progress(self, student_id: str, progress_data: Dict[str, Any]) -> bool:
-        """保存学生进度"""
-        all_progress = self._read_json(self.config.PROGRESS_FILE) or {}
-        all_progress[student_id] = progress_data
-        return self._write_json(self.config.PROGRESS_FILE, all_progress)
+    def get_available_tasks(self, student_id: str, subject_id: str, limit: int = 3) -> Optional[Dict[str, Any]]:
+        """学生在某科目下已解锁、未完成的任务，以及推荐的下一步任务（进行中的优先，其余按拓扑序）"""
+        student = self.get_student_by_id(student_id)
+        state = self.get_unlock_state(student_id, subject_id) if student else None
+        if not state:
+            return None
+        
+        index = self.get_subject_index(subject_id)
+        subject_data = self.get_student_progress(student_id).get('subjects', {}).get(subject_id, {})
+        tasks_progress = subject_data.get('tasks') or {}
+        
+        available = state.available()
+        recommended = sorted(
+            available,
+            key=lambda task_id: (tasks_progress.get(task_id) or {}).get('status') != 'in_progress'
+        )[:limit]
+        return {
+            'subjectId': subject_id,
+            'available': available,
+            'locked': [task_id for task_id in index.graph.order if task_id not in state.unlocked],
+            'recommended': [
+                {
+                    'id': task_id,
+                    'name': index.tasks[task_id].get('name'),
+                    'chapterId': index.task_location[task_id][1],
+                    'status': (tasks_progress.get(task_id) or {}).get('status') or 'pending',
+                    'estimatedTime': index.tasks[task_id].get('estimatedTime'),
+                    'difficulty': index.tasks[task_id].get('difficulty')
+                }
+                for task_id in recommended
+            ]
+        }
     
-    # 统计方法
-    def calculate_overall_progress(self, student_id: str) -> int:
-        """计算学生总体进度"""
-        progress_data = self.get_student_progress(student_id)
-        subjects = self.get_all_subjects()
+    def _completed_tasks(self, student_id: str, subject_id: str) -> Set[str]:
+        """学生某科目的已完成任务ID（调用方持有 self._lock，不应修改返回值）"""
+        completed = self._get_counters().completed_tasks(student_id, subject_id)
+        if completed is None:
+            # 学生未拥有该科目时按进度数据计算
+            subject_data = self.get_student_progress(student_id).get('subjects', {}).get(subject_id, {})
+            completed = completed_task_ids(subject_data.get('tasks'))
+        return completed
+    
+    def _forget_student(self, student_id: str) -> None:
+        """学生被删除后移除其计数、学习事件、科目分析数据、解锁状态与汇总树"""
+        with self._lock:
+            if self._counters:
+                self._counters.remove_student(student_id)
+                self._activity.remove_student(student_id)
+                self._cohorts.remove_student(student_id)
+            self._drop_student_states(student_id)
+    
+    def _drop_student_states(self, student_id: str) -> None:
+        """删除学生时清除其解锁状态与汇总树"""
+        for states in (self._unlock_states, self._rollups):
+            for key in [key for key in states if key[0] == student_id]:
+                del states[key]
+    
+    # 年级/章节汇总
+    def get_rollup_tree(self, student_id: str, subject_id: str) -> Optional[RollupTree]:
+        """学生某科目的汇总树；任务完成情况变化只更新所在章节与年级，科目修改后只重算有变化的章节"""
+        index = self.get_subject_index(subject_id)
+        if not index:
+            return None
         
-        total_tasks = 0
-        completed_tasks = 0
+        with self._lock:
+            completed = self._completed_tasks(student_id, subject_id)
+            tree = self._rollups.get((student_id, subject_id))
+            if tree is None:
+                tree = self._rollups[(student_id, subject_id)] = RollupTree(index, completed)
+            else:
+                if tree.index is not index:
+                    tree.rebase(index)
+                tree.sync(completed)
+            return tree
+    
+    def get_subject_rollup(self, student_id: str, subject_id: str) -> Optional[Dict[str, Any]]:
+        """学生某科目的 科目 -> 年级 -> 章节 进度汇总（完成数、任务数、剩余预计用时）"""
+        if not self.get_student_by_id(student_id):
+            return None
+        tree = self.get_rollup_tree(student_id, subject_id)
+        return tree.to_dict() if tree else None
+    
+    # 全文搜索
+    def search(self, query: str, limit: int = 20, subject_id: Optional[str] = None,
+               kinds: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """在科目、年级、章节、任务名称与步骤内容中搜索，返回按相关度排序的命中"""
+        # 只重新索引自上次查询以来被修改过的科目
+        self._search.sync(self.get_all_subjects())
+        total, hits = self._search.search(query, limit, subject_id, kinds)
+        return {'query': query, 'total': total, 'hits': hits}
+    
+    # 学习活动时间线
+    def _get_activity(self) -> ActivityIndex:
+        """学习事件索引（与进度计数一起构建与维护）"""
+        with self._lock:
+            self._get_counters()
+            return self._activity
+    
+    def _task_lookup(self) -> Callable[[str, str], Optional[Tuple[SubjectIndex, Dict[str, Any]]]]:
+        """按 (科目ID, 任务ID) 查找事件对应的 (科目索引, 任务)，科目或任务已被删除时为 None；同一次查询内缓存科目索引"""
+        indexes: Dict[str, Optional[SubjectIndex]] = {}
         
-        for subject_id in progress_data.get('subjects', {}):
-            subject_data = progress_data['subjects'][subject_id]
-            subject = next((s for s in subjects if s['id'] == subject_id), None)
-            
-            if subject and subject.get('levels'):
-                for level in subject['levels']:
-                    for chapter in level.get('chapters', []):
-                        for task in chapter.get('tasks', []):
-                            total_tasks += 1
-                            task_progress = subject_data.get('tasks', {}).get(task['id'])
-                            if task_progress and task_progress.get('status') == 'completed':
-                                completed_tasks += 1
+        def lookup(subject_id: str, task_id: str) -> Optional[Tuple[SubjectIndex, Dict[str, Any]]]:
+            if subject_id not in indexes:
+                indexes[subject_id] = self.get_subject_index(subject_id)
+            index = indexes[subject_id]
+            task = index.tasks.get(task_id) if index else None
+            return (index, task) if task is not None else None
         
-        return round((completed_tasks / total_tasks) * 100) if total_tasks > 0 else 0
+        return lookup
     
-    def calculate_subject_progress(self, student_id: str, subject_id: str) -> Dict[str, int]:
-        """计算学科进度"""
-        progress_data = self.get_student_progress(student_id)
-        subject = self.get_subject_by_id(subject_id)
+    def get_recent_activity(self, limit: int = 20, student_id: Optional[str] = None,
+                            subject_id: Optional[str] = None, kinds: Optional[Set[str]] = None,
+                            before: Optional[Tuple[Any, ...]] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[Any, ...]]]:
+        """最近的学习事件（由新到旧），默认只包含完成步骤与完成任务
+    
+        返回 (事件列表, 下一页的 before)；before 为上一页最后一个事件的键，没有更多事件时为 None。
+        """
+        kinds = kinds or set(COMPLETION_TYPES)
+        activities = []
+        next_before = None
+        lookup = self._task_lookup()
+        with self._lock:
+            for ts, event_student, event_subject, task_id, kind, step, raw in \
+                    self._get_activity().latest(student_id, before):
+                if kind not in kinds or (subject_id and event_subject != subject_id):
+                    continue
+                found = lookup(event_subject, task_id)
+                if found is None:
+                    continue
+                index, task = found
+                activities.append({
+                    'type': kind,
+                    'time': raw,
+                    'studentId': event_student,
+                    'subjectId': event_subject,
+                    'subjectName': index.subject.get('name'),
+                    'taskId': task_id,
+                    'taskName': task.get('name'),
+                    'step': step if step >= 0 else None
+                })
+                if len(activities) >= limit:
+                    next_before = (ts, event_student, event_subject, task_id, kind, step)
+                    break
+        return activities, next_before
+    
+    def get_activity_summary(self, start: date, end: date, interval: str = 'day', tz: timezone = timezone.utc,
+                             student_id: Optional[str] = None, subject_id: Optional[str] = None) -> Dict[str, Any]:
+        """按日或按周（周一开始）统计 [start, end] 内完成的任务数、步骤数与学习分钟数（按任务预计用时）"""
+        buckets = bucket_starts(start, end, interval)
+        range_start = datetime.combine(start, datetime.min.time(), tz).timestamp()
+        range_end = datetime.combine(end + timedelta(days=1), datetime.min.time(), tz).timestamp()
+        lookup = self._task_lookup()
         
-        if not subject or not subject.get('levels'):
-            return {'progress': 0, 'completed': 0, 'total': 0}
+        def minutes(event_subject: str, task_id: str) -> Optional[int]:
+            found = lookup(event_subject, task_id)
+            return task_minutes(found[1]) if found is not None else None
         
-        total_tasks = 0
-        completed_tasks = 0
+        with self._lock:
+            events = self._get_activity().scan(range_start, range_end, student_id)
+            rows = summarize(events, buckets, interval, tz, minutes, subject_id)
+        return {
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'interval': interval,
+            'timezone': str(tz).replace('UTC', '') or 'Z',
+            'studentId': student_id,
+            'subjectId': subject_id,
+            'buckets': rows,
+            'totals': {key: sum(row[key] for row in rows) for key in ('taskCompletions', 'stepCompletions', 'minutes')}
+        }
+    
+    def activity_etag(self, *parts: Any) -> str:
+        """学习活动接口的版本：事件索引的修改次数、科目（名称与预计用时）与查询参数"""
+        return self.make_etag(self._get_activity().version, self.get_all_subjects(), parts)
+    
+    # 科目分析（全体学生）
+    def _get_cohorts(self) -> CohortIndex:
+        """科目分析数据（与进度计数一起构建与维护）"""
+        with self._lock:
+            self._get_counters()
+            return self._cohorts
+    
+    def get_subject_analytics(self, subject_id: str) -> Optional[Dict[str, Any]]:
+        """科目下全部学生的完成度分布、章节完成度分布、完成用时与瓶颈任务；科目不存在时返回 None"""
+        index = self.get_subject_index(subject_id)
+        if not index:
+            return None
+        with self._lock:
+            return self._get_cohorts().report(index)
+    
+    def analytics_etag(self, subject_id: str, *parts: Any) -> Optional[str]:
+        """科目分析的版本：该科目学生进度的修改次数、科目内容与查询参数；科目不存在时返回 None"""
+        subject = self.get_subject_by_id(subject_id)
+        if not subject:
+            return None
+        return self.make_etag(self._get_cohorts().version(subject_id), subject, parts)
+    
+    # 学生看板
+    def get_student_dashboard(self, student_id: str, recent_limit: int = 5) -> Optional[Dict[str, Any]]:
+        """学生看板：学生信息、各科目及章节进度、任务状态（含锁定）与最近活动，一次请求返回"""
+        student = self.get_student_by_id(student_id)
+        if not student:
+            return None
         
-        for level in subject['levels']:
-            for chapter in level.get('chapters', []):
-                for task in chapter.get('tasks', []):
-                    total_tasks += 1
-                    subject_data = progress_data.get('subjects', {}).get(subject_id, {})
-                    task_progress = subject_data.get('tasks', {}).get(task['id'])
-                    if task_progress and task_progress.get('status') == 'completed':
-                        completed_tasks += 1
+        progress = self.get_student_progress(student_id)
+        overall = self.calculate_overall_progress(student_id)
+        subjects = []
+        for subject_id in student.get('subjects', []):
+            index = self.get_subject_index(subject_id)
+            if index:
+                subjects.append((index.subject, index))
         
         return {
-            'progress': round((completed_tasks / total_tasks) * 100) if total_tasks > 0 else 0,
-            'completed': completed_tasks,
-            'total': total_tasks
+            'student': {**student, 'overallProgress': overall},
+            'overallProgress': overall,
+            'subjects': [
+                build_subject_rollup(subject, (progress.get('subjects') or {}).get(subject['id']),
+                                     self.get_rollup_tree(student_id, subject['id']),
+                                     self.get_unlock_state(student_id, subject['id']).unlocked)
+                for subject, index in subjects
+            ],
+            'recentActivity': recent_activity(subjects, progress, self._get_activity().latest(student_id),
+                                              recent_limit)
         }
+    
+    def dashboard_etag(self, student_id: str, recent_limit: int = 5) -> Optional[str]:
+        """学生看板的版本：由学生、进度与所属科目的版本组成，学生不存在时返回 None"""
+        student = self.get_student_by_id(student_id)
+        if not student:
+            return None
+        subjects = [self.get_subject_by_id(subject_id) for subject_id in student.get('subjects', [])]
+        return self.make_etag(student, self.get_student_progress(student_id),
+                              [subject for subject in subjects if subject], recent_limit)
+    
+    # 变更事件
+    def _publish(self, resource: str, resource_id: str, action: str,
+                 delta: Optional[Dict[str, Any]] = None) -> None:
+        """事务提交后发布变更事件，附带资源的新版本（与对应 GET 接口的 ETag 一致）"""
+        version = None
+        if action != 'deleted':
+            if resource == 'student':
+                version = self.student_etag(resource_id)
+            elif resource == 'subject':
+                version = self.subject_etag(resource_id)
+            else:
+                version = self.make_etag(self.get_student_progress(resource_id))
+        self.events.publish(resource, resource_id, action, version, delta)
+    
+    @staticmethod
+    def _subject_delta(subject_data: Dict[str, Any], index: SubjectIndex) -> Dict[str, Any]:
+        """科目事件只携带简单字段，levels 以任务数代替"""
+        delta = {key: value for key, value in subject_data.items() if key != 'levels'}
+        if 'levels' in subject_data:
+            delta['taskCount'] = index.total
+        return delta
+    
+    # 资源版本（ETag）
+    def _content_hash(self, obj: Any) -> str:
+        """对象内容哈希；字典按对象身份缓存，同一对象只序列化一次"""
+        if not isinstance(obj, dict):
+            return hashlib.sha1(serialization.dumps(obj, sort_keys=True)).hexdigest()
+        
+        with self._lock:
+            cached = self._content_hashes.get(id(obj))
+            hit = cached is not None and cached[0] is obj
+            if hit:
+                self._content_hashes.move_to_end(id(obj))
+        cache_lookup('content_hash', hit)
+        if hit:
+            return cached[1]
+        
+        digest = hashlib.sha1(serialization.dumps(obj, sort_keys=True)).hexdigest()
+        with self._lock:
+            # 只淘汰最久未使用的对象，常用对象的哈希一直保留
+            self._content_hashes[id(obj)] = (obj, digest)
+            self._content_hashes.move_to_end(id(obj))
+            if len(self._content_hashes) > CONTENT_HASH_CACHE_SIZE:
+                self._content_hashes.popitem(last=False)
+        return digest
+    
+    def make_etag(self, *parts: Any) -> str:
+        """由资源对象与附加值（查询参数、计算字段等）组合出强 ETag"""
+        digest = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, (list, tuple)):
+                for item in part:
+                    digest.update(self._content_hash(item).encode('ascii'))
+                digest.update(b';')
+            else:
+                digest.update(self._content_hash(part).encode('ascii'))
+            digest.update(b'|')
+        return digest.hexdigest()[:32]
+    
+    def student_etag(self, student_id: str) -> Optional[str]:
+        """学生资源的版本（内容与总体进度），学生不存在时返回 None"""
+        student = self.get_student_by_id(student_id)
+        if not student:
+            return None
+        return self.make_etag(student, self.calculate_overall_progress(student_id))
+    
+    def subject_etag(self, subject_id: str) -> Optional[str]:
+        """科目资源的版本，科目不存在时返回 None"""
+        subject = self.get_subject_by_id(subject_id)
+        return self.make_etag(subject) if subject else None
+    
+    # 统计方法
+    def calculate_overall_progress(self, student_id: str) -> int:
+        """计算学生总体进度（读取增量维护的计数）"""
+        progress = self._get_counters().overall_progress(student_id)
+        return progress if progress is not None else 0
+    
+    def calculate_subject_progress(self, student_id: str, subject_id: str) -> Dict[str, int]:
+        """计算学科进度"""
+        index = self.get_subject_index(subject_id)
+        if not index:
+            return {'progress': 0, 'completed': 0, 'total': 0}
+        
+        progress = self._get_counters().subject_progress(student_id, subject_id)
+        if progress is not None:
+            return progress
+        
+        # 学生未拥有该科目时按进度数据直接计算
+        progress_data = self.get_student_progress(student_id)
+        subject_data = progress_data.get('subjects', {}).get(subject_id, {})
+        return index.progress(completed_task_ids(subject_data.get('tasks')))
+    
+    def calculate_average_progress(self) -> float:
+        """计算所有学生的平均进度"""
+        return self._get_counters().average_progress()
 
 # 全局数据管理器实例
 data_manager = DataManager()
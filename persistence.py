@@ -0,0 +1,117 @@
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+import serialization
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock_fd(fd: int, blocking: bool = True) -> bool:
+    """对文件描述符加排他锁；blocking 为 False 时锁被占用立即返回 False"""
+    if fcntl:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+    if not blocking:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return True
+        except OSError:
+            # LK_LOCK 重试约10秒后仍失败会抛出异常，继续等待
+            continue
+
+
+def _unlock_fd(fd: int) -> None:
+    """释放文件描述符上的锁"""
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """单个数据文件的锁：进程内为可重入线程锁，进程间为 <文件>.lock 上的文件锁"""
+
+    def __init__(self, filepath: str):
+        self.lock_path = filepath + '.lock'
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """加锁；指定 timeout（秒）时最多等待这么久，超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        if self._depth == 0:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                while not _lock_fd(fd, blocking=deadline is None):
+                    if time.monotonic() >= deadline:
+                        os.close(fd)
+                        self._thread_lock.release()
+                        return False
+                    time.sleep(0.01)
+            except BaseException:
+                os.close(fd)
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock_fd(self._fd)
+            finally:
+                os.close(self._fd)
+                self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+def atomic_write_json(filepath: str, data: Any, pretty: bool = False) -> int:
+    """原子写入JSON：先写同目录临时文件并 fsync，再用 os.replace 替换目标文件，返回写入的字节数
+
+    读取方只会看到旧文件或完整的新文件，不会读到写了一半的内容。默认紧凑格式，pretty 时缩进。
+    """
+    directory = os.path.dirname(filepath) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filepath), suffix='.tmp')
+    try:
+        content = serialization.dumps(data, pretty=pretty)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+        return len(content)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
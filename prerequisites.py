@@ -0,0 +1,121 @@
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class PrerequisiteError(ValueError):
+    """科目的前置任务关系无效（引用不存在的任务或存在循环依赖）"""
+
+
+class PrerequisiteGraph:
+    """科目内任务的前置依赖图（有向无环图），随科目索引构建一次
+
+    tasks 为按科目树顺序排列的 任务ID -> 任务 映射。
+    """
+
+    def __init__(self, tasks: Dict[str, Dict[str, Any]]):
+        # 任务ID -> 去重后的前置任务ID
+        self.prerequisites: Dict[str, Tuple[str, ...]] = {}
+        # 反向边：任务ID -> 以它为前置的任务ID
+        self.dependents: Dict[str, List[str]] = {task_id: [] for task_id in tasks}
+        # 引用了不存在任务的 (任务ID, 前置任务ID)
+        self.dangling: List[Tuple[str, str]] = []
+
+        for task_id, task in tasks.items():
+            prereqs = tuple(dict.fromkeys(task.get('prerequisites') or []))
+            self.prerequisites[task_id] = prereqs
+            for prereq in prereqs:
+                if prereq in self.dependents:
+                    self.dependents[prereq].append(task_id)
+                else:
+                    self.dangling.append((task_id, prereq))
+
+        self.order, self.cycle = self._topological_order(tasks)
+        # 任务在拓扑序中的位置，用于推荐排序
+        self.position: Dict[str, int] = {task_id: i for i, task_id in enumerate(self.order)}
+
+    def _topological_order(self, tasks: Dict[str, Dict[str, Any]]) -> Tuple[List[str], Optional[List[str]]]:
+        """Kahn 算法求拓扑序（同层保持科目树顺序）；有环时返回其中一个环"""
+        missing = {
+            task_id: sum(1 for prereq in prereqs if prereq in self.dependents)
+            for task_id, prereqs in self.prerequisites.items()
+        }
+        queue = deque(task_id for task_id in tasks if missing[task_id] == 0)
+        order = []
+        while queue:
+            task_id = queue.popleft()
+            order.append(task_id)
+            for dependent in self.dependents[task_id]:
+                missing[dependent] -= 1
+                if missing[dependent] == 0:
+                    queue.append(dependent)
+
+        if len(order) == len(tasks):
+            return order, None
+        return order, self._find_cycle({task_id for task_id, count in missing.items() if count > 0})
+
+    def _find_cycle(self, remaining: Set[str]) -> List[str]:
+        """在未能排序的任务中沿前置边找出一个环"""
+        task_id = next(iter(remaining))
+        seen: Dict[str, int] = {}
+        path = []
+        while task_id not in seen:
+            seen[task_id] = len(path)
+            path.append(task_id)
+            task_id = next(prereq for prereq in self.prerequisites[task_id] if prereq in remaining)
+        return path[seen[task_id]:] + [task_id]
+
+    def validate(self) -> None:
+        """检查悬空引用与循环依赖，无效时抛出 PrerequisiteError"""
+        if self.dangling:
+            task_id, prereq = self.dangling[0]
+            raise PrerequisiteError(f"Task {task_id} has unknown prerequisite {prereq}")
+        if self.cycle:
+            raise PrerequisiteError(f"Prerequisite cycle: {' -> '.join(reversed(self.cycle))}")
+
+    def is_unlocked(self, task_id: str, completed: Set[str]) -> bool:
+        """前置任务是否全部完成"""
+        return all(prereq in completed for prereq in self.prerequisites.get(task_id, ()))
+
+
+class UnlockState:
+    """某学生在某科目下的解锁状态：记录每个任务未完成的前置数，完成情况变化时只更新相关的后继任务"""
+
+    def __init__(self, graph: PrerequisiteGraph):
+        self.graph = graph
+        self.completed: Set[str] = set()
+        # 任务ID -> 未完成的前置任务数（悬空引用永远无法完成）
+        self.missing: Dict[str, int] = {
+            task_id: len(prereqs) for task_id, prereqs in graph.prerequisites.items()
+        }
+        self.unlocked: Set[str] = {task_id for task_id, count in self.missing.items() if count == 0}
+
+    def sync(self, completed: Iterable[str]) -> Tuple[Set[str], Set[str]]:
+        """同步到新的已完成集合，返回 (新解锁的任务, 重新锁定的任务)"""
+        completed = set(completed) & self.graph.dependents.keys()
+        added = completed - self.completed
+        removed = self.completed - completed
+        self.completed = completed
+
+        unlocked, locked = set(), set()
+        for task_id in added:
+            for dependent in self.graph.dependents[task_id]:
+                self.missing[dependent] -= 1
+                if self.missing[dependent] == 0:
+                    unlocked.add(dependent)
+        for task_id in removed:
+            for dependent in self.graph.dependents[task_id]:
+                if self.missing[dependent] == 0:
+                    locked.add(dependent)
+                self.missing[dependent] += 1
+
+        # 同一次同步中先解锁又锁定（或相反）的任务以最终状态为准
+        unlocked, locked = unlocked - locked, locked - unlocked
+        self.unlocked |= unlocked
+        self.unlocked -= locked
+        return unlocked, locked
+
+    def available(self) -> List[str]:
+        """已解锁且未完成的任务（按拓扑序）"""
+        position = self.graph.position
+        return sorted((task_id for task_id in self.unlocked if task_id not in self.completed),
+                      key=lambda task_id: position.get(task_id, len(position)))
@@ -0,0 +1,247 @@
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import flask.json
+from flask import Flask, g, request
+
+import serialization
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 按文件划分耗时类别：DataManager 及其调用的索引、汇总与存储模块，响应序列化（含 Flask 的 jsonify）
+DATA_MANAGER_FILES = {os.path.join(_ROOT, name) for name in (
+    'models.py', 'indexes.py', 'rollups.py', 'dashboard.py', 'prerequisites.py', 'events.py',
+    'storage.py', 'journal.py', 'persistence.py')}
+STORAGE_FILES = {os.path.join(_ROOT, name) for name in ('storage.py', 'journal.py', 'persistence.py')}
+SERIALIZATION_FILES = {os.path.join(_ROOT, 'serialization.py')}
+_FLASK_JSON_DIR = os.path.dirname(os.path.abspath(flask.json.__file__)) + os.sep
+
+# 调用栈最大深度，以及低于总耗时该比例的分支并入父节点（控制折叠栈的规模）
+MAX_DEPTH = 64
+MIN_FRACTION = 0.0005
+
+# 同一时间只剖析一个请求：cProfile 会拖慢被剖析的请求，也避免并发剖析互相干扰
+_profile_lock = threading.Lock()
+
+Function = Tuple[str, int, str]
+
+
+def _category(func: Function) -> Optional[str]:
+    filename = os.path.abspath(func[0]) if func[0] != '~' else func[0]
+    if filename in SERIALIZATION_FILES or filename.startswith(_FLASK_JSON_DIR):
+        return 'serialization'
+    if filename in DATA_MANAGER_FILES:
+        return 'dataManager'
+    return None
+
+
+def _label(func: Function) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{os.path.basename(filename)}:{name}:{line}'
+
+
+def collapse_stacks(stats: pstats.Stats) -> Dict[Tuple[Function, ...], float]:
+    """由 cProfile 的调用关系推导折叠栈：{(根, ..., 叶): 自身耗时秒}
+
+    cProfile 只记录调用者->被调用者的边，不记录完整调用栈；被多处调用的函数按各条边的耗时比例分摊，
+    因此结果是近似的（与 gprof2dot、flameprof 的做法相同），但各栈耗时之和等于总耗时。
+    """
+    entries = stats.stats
+    callees: Dict[Function, Dict[Function, float]] = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    total = sum(entries[func][3] for func in roots)
+    threshold = total * MIN_FRACTION
+    stacks: Dict[Tuple[Function, ...], float] = {}
+
+    def walk(func: Function, stack: Tuple[Function, ...], share: float) -> None:
+        _cc, _nc, tt, ct, _callers = entries[func]
+        fraction = share / ct if ct else 0.0
+        own = tt * fraction
+        if len(stack) < MAX_DEPTH:
+            for callee, edge_ct in callees.get(func, {}).items():
+                child = edge_ct * fraction
+                if child >= threshold and callee not in stack and callee in entries:
+                    walk(callee, stack + (callee,), child)
+                else:
+                    own += child
+        else:
+            own = share
+        if own > 0:
+            stacks[stack] = stacks.get(stack, 0.0) + own
+
+    for root in roots:
+        walk(root, (root,), entries[root][3])
+    return stacks
+
+
+def summarize(stats: pstats.Stats, stacks: Dict[Tuple[Function, ...], float]) -> Dict[str, Any]:
+    """按类别汇总耗时（毫秒）
+
+    每段栈归入最外层有类别的帧：DataManager 内部的序列化（如计算 ETag）计入 dataManager，
+    视图函数直接序列化响应计入 serialization，其余（路由、钩子、视图自身）计入 other。
+    dataManagerMethods 为各 DataManager 入口方法的耗时（含其内部调用的全部函数）。
+    """
+    breakdown = {'dataManager': 0.0, 'serialization': 0.0, 'other': 0.0}
+    methods: Dict[Function, float] = {}
+    storage = 0.0
+    for stack, seconds in stacks.items():
+        category = None
+        for func in stack:
+            category = _category(func)
+            if category:
+                if category == 'dataManager':
+                    methods[func] = methods.get(func, 0.0) + seconds
+                break
+        breakdown[category or 'other'] += seconds
+        if any(os.path.abspath(func[0]) in STORAGE_FILES for func in stack if func[0] != '~'):
+            storage += seconds
+
+    entries = stats.stats
+    return {
+        'profiledMs': round(sum(breakdown.values()) * 1000, 3),
+        'breakdown': {name: round(seconds * 1000, 3) for name, seconds in breakdown.items()},
+        'storageMs': round(storage * 1000, 3),
+        'dataManagerMethods': [
+            {'method': func[2], 'file': os.path.basename(func[0]), 'calls': entries[func][1],
+             'ms': round(seconds * 1000, 3)}
+            for func, seconds in sorted(methods.items(), key=lambda item: -item[1])
+        ]
+    }
+
+
+def write_collapsed(path: str, stacks: Dict[Tuple[Function, ...], float]) -> None:
+    """折叠栈格式（每行 `帧;帧;帧 微秒数`），可直接交给 flamegraph.pl / speedscope 生成火焰图"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, seconds in sorted(stacks.items()):
+            micros = int(round(seconds * 1_000_000))
+            if micros:
+                f.write(';'.join(_label(func) for func in stack) + f' {micros}\n')
+
+
+def _prune(directory: str, keep: int) -> None:
+    """只保留最近 keep 次剖析的结果文件"""
+    reports = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+    for name in reports[keep:]:
+        base = name[:-len('.json')]
+        for suffix in ('.json', '.prof', '.collapsed'):
+            try:
+                os.remove(os.path.join(directory, base + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def _authorized(app: Flask, token: str) -> bool:
+    """令牌与 PROFILE_TOKEN 一致；未设置 PROFILE_TOKEN 时按需剖析关闭（不以 SECRET_KEY 代替）"""
+    expected = app.config.get('PROFILE_TOKEN') or ''
+    return bool(expected) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def init_app(app: Flask) -> None:
+    """注册按需剖析的请求钩子
+
+    两种方式触发：请求头 `X-Profile` 等于 Config.PROFILE_TOKEN（未设置时不接受按需剖析），
+    响应会带 Server-Timing 与 X-Profile-Id 头；或按 Config.PROFILE_SAMPLE_RATE 随机采样。
+    令牌只接受请求头，不接受查询参数，避免出现在访问日志与代理日志中。
+    结果（.prof、折叠栈、耗时汇总 .json）写入 Config.PROFILE_DIR，并输出一条汇总日志。
+    应在其他钩子之前调用，使剖析覆盖其余全部 before_request/after_request 钩子。
+    """
+
+    @app.before_request
+    def start_profile():
+        token = request.headers.get('X-Profile')
+        requested = bool(token) and _authorized(app, token)
+        if token and not requested:
+            logger.warning('剖析令牌不正确或未设置 PROFILE_TOKEN，忽略剖析请求')
+        sampled = not requested and random.random() < app.config.get('PROFILE_SAMPLE_RATE', 0)
+        if not (requested or sampled) or not _profile_lock.acquire(blocking=False):
+            return
+        g.profile_requested = requested
+        g.profile_started = time.perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        try:
+            profiler.disable()
+            wall = time.perf_counter() - g.profile_started
+            report = _write_profile(app, profiler, wall, response.status_code)
+        except Exception:
+            logger.exception('保存剖析结果失败')
+            return response
+        finally:
+            _profile_lock.release()
+
+        if g.profile_requested:
+            breakdown = report['breakdown']
+            response.headers['Server-Timing'] = ', '.join(
+                [f"total;dur={report['wallMs']}"] +
+                [f'{name};dur={ms}' for name, ms in breakdown.items()])
+            response.headers['X-Profile-Id'] = report['id']
+        return response
+
+    @app.teardown_request
+    def abandon_profile(_error=None):
+        # 未处理的异常会跳过 after_request，这里保证剖析器停止、锁被释放
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+
+
+def _write_profile(app: Flask, profiler: cProfile.Profile, wall: float, status: int) -> Dict[str, Any]:
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+    profile_id = '{}_{}_{}_{}'.format(datetime.now().strftime('%Y%m%dT%H%M%S%f'), request.method, slug,
+                                      getattr(g, 'request_id', None) or os.getpid())
+    base = os.path.join(directory, profile_id)
+
+    stats = pstats.Stats(profiler)
+    stacks = collapse_stacks(stats)
+    report = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'route': route,
+        'status': status,
+        'wallMs': round(wall * 1000, 3),
+        **summarize(stats, stacks),
+        'files': {'prof': base + '.prof', 'collapsed': base + '.collapsed'},
+    }
+    stats.dump_stats(base + '.prof')
+    write_collapsed(base + '.collapsed', stacks)
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        f.write(serialization.dumps_text(report, pretty=True))
+    _prune(directory, app.config.get('PROFILE_KEEP', 100))
+
+    top = report['dataManagerMethods'][0] if report['dataManagerMethods'] else None
+    logger.info('request profiled', extra={'fields': {
+        'profileId': profile_id,
+        'route': route,
+        'wallMs': report['wallMs'],
+        'breakdown': report['breakdown'],
+        'topDataManagerMethod': top,
+    }})
+    return report
+
@@ -0,0 +1,155 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from indexes import SubjectIndex
+
+# 任务未填写预计用时时按30分钟计算（与前端显示一致）
+DEFAULT_TASK_MINUTES = 30
+
+
+def _percent(completed: int, total: int) -> int:
+    return round((completed / total) * 100) if total > 0 else 0
+
+
+def task_minutes(task: Dict[str, Any]) -> int:
+    """任务的预计用时（分钟）"""
+    minutes = task.get('estimatedTime')
+    return minutes if isinstance(minutes, int) and minutes >= 0 else DEFAULT_TASK_MINUTES
+
+
+def _chapter_signature(chapter: Dict[str, Any]) -> Tuple[Tuple[str, int], ...]:
+    """章节中影响汇总的内容：任务ID与预计用时；不变时章节的计数可以沿用"""
+    return tuple((task.get('id'), task_minutes(task)) for task in chapter.get('tasks') or [])
+
+
+class RollupNode:
+    """汇总树上的一个节点（年级或章节）：完成数、任务数与剩余预计用时"""
+
+    __slots__ = ('id', 'name', 'completed', 'total', 'minutes', 'remaining_minutes')
+
+    def __init__(self, node_id: str, name: Optional[str]):
+        self.id = node_id
+        self.name = name
+        self.completed = 0
+        self.total = 0
+        self.minutes = 0
+        self.remaining_minutes = 0
+
+    def add(self, other: 'RollupNode') -> None:
+        self.completed += other.completed
+        self.total += other.total
+        self.minutes += other.minutes
+        self.remaining_minutes += other.remaining_minutes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'progress': _percent(self.completed, self.total),
+            'completed': self.completed,
+            'total': self.total,
+            'estimatedMinutes': self.minutes,
+            'remainingMinutes': self.remaining_minutes
+        }
+
+
+class RollupTree:
+    """某学生在某科目下的汇总树：科目 -> 年级 -> 章节
+
+    任务完成情况变化时只更新该任务所在章节、年级与科目的计数；
+    科目修改后只重新统计内容有变化的章节。
+    """
+
+    def __init__(self, index: SubjectIndex, completed: Iterable[str] = ()):
+        self.index = index
+        self.completed: Set[str] = set(completed) & index.task_ids
+        self.chapters: Dict[str, RollupNode] = {}
+        self.levels: Dict[str, RollupNode] = {}
+        self._build({})
+        self._snapshot: Optional[Dict[str, Any]] = None
+
+    def _build(self, reusable: Dict[str, Tuple[Tuple[Tuple[str, int], ...], RollupNode]]) -> None:
+        """按 self.index 建立节点；reusable 中内容未变的章节沿用原计数"""
+        self.chapters = {}
+        self.levels = {}
+        # 年级ID -> 章节ID列表（保持科目树顺序）
+        self.structure: List[Tuple[str, List[str]]] = []
+        self._signatures: Dict[str, Tuple[Tuple[str, int], ...]] = {}
+        self.rebuilt_chapters: Set[str] = set()
+
+        for level in self.index.subject.get('levels') or []:
+            level_node = RollupNode(level.get('id'), level.get('name'))
+            chapter_ids = []
+            for chapter in level.get('chapters') or []:
+                chapter_id = chapter.get('id')
+                signature = _chapter_signature(chapter)
+                previous = reusable.get(chapter_id)
+                if previous and previous[0] == signature:
+                    node = previous[1]
+                    node.name = chapter.get('name')
+                else:
+                    node = self._count_chapter(chapter)
+                    self.rebuilt_chapters.add(chapter_id)
+                self.chapters[chapter_id] = node
+                self._signatures[chapter_id] = signature
+                chapter_ids.append(chapter_id)
+                level_node.add(node)
+            self.levels[level_node.id] = level_node
+            self.structure.append((level_node.id, chapter_ids))
+
+    def _count_chapter(self, chapter: Dict[str, Any]) -> RollupNode:
+        node = RollupNode(chapter.get('id'), chapter.get('name'))
+        for task in chapter.get('tasks') or []:
+            minutes = task_minutes(task)
+            node.total += 1
+            node.minutes += minutes
+            if task.get('id') in self.completed:
+                node.completed += 1
+            else:
+                node.remaining_minutes += minutes
+        return node
+
+    def rebase(self, index: SubjectIndex) -> None:
+        """切换到科目的新版本，只重新统计任务或用时有变化的章节"""
+        reusable = {
+            chapter_id: (self._signatures[chapter_id], node) for chapter_id, node in self.chapters.items()
+        }
+        self.index = index
+        self.completed &= index.task_ids
+        self._build(reusable)
+        self._snapshot = None
+
+    def sync(self, completed: Iterable[str]) -> Set[str]:
+        """同步到新的已完成集合，只更新变化任务的上级节点，返回计数有变化的章节ID"""
+        completed = set(completed) & self.index.task_ids
+        added = completed - self.completed
+        removed = self.completed - completed
+        if not added and not removed:
+            return set()
+        self.completed = completed
+
+        changed = set()
+        for task_ids, delta in ((added, 1), (removed, -1)):
+            for task_id in task_ids:
+                level_id, chapter_id = self.index.task_location[task_id]
+                minutes = task_minutes(self.index.tasks[task_id])
+                for node in (self.chapters[chapter_id], self.levels[level_id]):
+                    node.completed += delta
+                    node.remaining_minutes -= delta * minutes
+                changed.add(chapter_id)
+        self._snapshot = None
+        return changed
+
+    def to_dict(self) -> Dict[str, Any]:
+        """汇总树的响应结构；内容未变化时返回同一个对象"""
+        if self._snapshot is None:
+            subject = RollupNode(self.index.subject_id, self.index.subject.get('name'))
+            levels = []
+            for level_id, chapter_ids in self.structure:
+                level_node = self.levels[level_id]
+                subject.add(level_node)
+                levels.append({
+                    **level_node.to_dict(),
+                    'chapters': [self.chapters[chapter_id].to_dict() for chapter_id in chapter_ids]
+                })
+            self._snapshot = {**subject.to_dict(), 'levels': levels}
+        return self._snapshot
@@ -0,0 +1,289 @@
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# 各字段的权重：名称命中比描述、步骤内容更重要
+FIELD_WEIGHTS = {'name': 3.0, 'description': 1.0, 'text': 1.0}
+# 查询与节点名称完全相同 / 名称中包含完整查询时的额外加权
+EXACT_BOOST = 2.0
+PHRASE_BOOST = 1.5
+# 命中文本摘要的长度（字符）
+SNIPPET_LENGTH = 60
+# 缓存的查询结果数
+RESULT_CACHE_SIZE = 256
+
+_SEGMENT = re.compile(r'\w+')
+
+# 文档键：(类型, 节点ID)，步骤为 ('step', 任务ID#序号)
+DocKey = Tuple[str, str]
+
+
+def normalize(text: str) -> str:
+    """全角转半角、统一大小写"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def ngrams(text: str) -> List[str]:
+    """把文本切成单字与相邻二字组（按非文字字符分段）
+
+    中文没有空格分词，用字符 n-gram 代替分词器：查询的每个二字组都出现在文档中才算命中，
+    单字查询用单字索引；英文、数字同样按字符处理，可以匹配单词的一部分。
+    """
+    grams = []
+    for segment in _SEGMENT.findall(normalize(text)):
+        grams.extend(segment)
+        grams.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return grams
+
+
+def _compact(text: str) -> str:
+    return ''.join(_SEGMENT.findall(text))
+
+
+def _find_phrase(text: str, phrase: str) -> int:
+    """phrase（已规范化并去掉标点空白）在原文 text 中的起始位置，未出现时返回 -1
+
+    原文逐字规范化、去掉标点空白后再查找，与查询的处理方式一致，再把位置映射回原文。
+    """
+    chars, positions = [], []
+    for i, char in enumerate(text):
+        for c in _compact(normalize(char)):
+            chars.append(c)
+            positions.append(i)
+    found = ''.join(chars).find(phrase)
+    return positions[found] if found >= 0 else -1
+
+
+def query_grams(query: str) -> List[str]:
+    """查询的 n-gram：长度为 1 的片段用单字，其余用二字组（去重，保持顺序）"""
+    grams = []
+    for segment in _SEGMENT.findall(normalize(query)):
+        if len(segment) == 1:
+            grams.append(segment)
+        else:
+            grams.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return list(dict.fromkeys(grams))
+
+
+class _Document:
+    __slots__ = ('key', 'kind', 'location', 'title', 'fields', 'name', 'haystack', 'weights')
+
+    def __init__(self, key: DocKey, kind: str, location: Dict[str, Any], title: str, fields: Dict[str, str]):
+        self.key = key
+        self.kind = kind
+        self.location = location
+        self.title = title
+        self.fields = fields
+        # 用于判断完整短语是否出现：name 为去掉标点空白后的名称，haystack 为各字段拼接的文本
+        self.name = _compact(normalize(fields.get('name', '')))
+        self.haystack = '\x00'.join(_compact(normalize(text)) for text in fields.values())
+        # n-gram -> 该文档中的权重（按字段加权的词频，除以字段长度的平方根做长度归一）
+        self.weights: Dict[str, float] = {}
+        for name, text in fields.items():
+            grams = ngrams(text)
+            if not grams:
+                continue
+            norm = FIELD_WEIGHTS.get(name, 1.0) / math.sqrt(len(grams))
+            for gram in grams:
+                self.weights[gram] = self.weights.get(gram, 0.0) + norm
+
+
+def _subject_documents(subject: Dict[str, Any]) -> Iterator[Tuple[DocKey, str, Dict[str, Any], str, Dict[str, str]]]:
+    """科目树中可搜索的节点：(文档键, 类型, 位置, 标题, 字段)"""
+    subject_id = subject.get('id')
+
+    def fields(node: Dict[str, Any], *names: str) -> Dict[str, str]:
+        return {name: node[name] for name in names if isinstance(node.get(name), str) and node[name]}
+
+    yield ('subject', subject_id), 'subject', {'subjectId': subject_id}, subject.get('name') or '', \
+        fields(subject, 'name', 'description')
+    for level in subject.get('levels') or []:
+        level_id = level.get('id')
+        location = {'subjectId': subject_id, 'levelId': level_id}
+        yield ('level', level_id), 'level', location, level.get('name') or '', fields(level, 'name', 'description')
+        for chapter in level.get('chapters') or []:
+            chapter_id = chapter.get('id')
+            location = {'subjectId': subject_id, 'levelId': level_id, 'chapterId': chapter_id}
+            yield ('chapter', chapter_id), 'chapter', location, chapter.get('name') or '', \
+                fields(chapter, 'name', 'description')
+            for task in chapter.get('tasks') or []:
+                task_id = task.get('id')
+                location = {'subjectId': subject_id, 'levelId': level_id, 'chapterId': chapter_id, 'taskId': task_id}
+                task_name = task.get('name') or ''
+                yield ('task', task_id), 'task', location, task_name, fields(task, 'name', 'description')
+                for step_no, step in enumerate(task.get('steps') or []):
+                    if isinstance(step, str) and step:
+                        yield ('step', f'{task_id}#{step_no}'), 'step', {**location, 'step': step_no}, \
+                            task_name, {'text': step}
+
+
+class SearchIndex:
+    """科目、年级、章节、任务与步骤的倒排索引（字符 n-gram）
+
+    按科目对象身份判断是否需要重建：科目被修改后只重新索引文本有变化的节点，
+    未变化的节点（包括只是被移动的）只更新位置信息。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # n-gram -> {文档序号: 权重}
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._documents: Dict[int, _Document] = {}
+        # 科目ID -> (已索引的科目对象, {文档键: 文档序号})
+        self._subjects: Dict[str, Tuple[Dict[str, Any], Dict[DocKey, int]]] = {}
+        self._next_id = 0
+        # 最近查询的结果（索引有任何变化时清空）
+        self._results: 'OrderedDict[Tuple[Any, ...], Tuple[int, List[Dict[str, Any]]]]' = OrderedDict()
+
+    @property
+    def size(self) -> int:
+        """已索引的文档数"""
+        return len(self._documents)
+
+    def sync(self, subjects: Iterable[Dict[str, Any]]) -> Set[str]:
+        """与当前的科目列表对齐：新增或修改过的科目重新索引，已删除的科目移除；返回有变化的科目ID"""
+        with self._lock:
+            changed = set()
+            seen = set()
+            for subject in subjects:
+                subject_id = subject.get('id')
+                seen.add(subject_id)
+                indexed = self._subjects.get(subject_id)
+                if indexed is None or indexed[0] is not subject:
+                    self.index_subject(subject)
+                    changed.add(subject_id)
+            for subject_id in set(self._subjects) - seen:
+                self.remove_subject(subject_id)
+                changed.add(subject_id)
+            return changed
+
+    def index_subject(self, subject: Dict[str, Any]) -> None:
+        """(重新)索引一个科目：文本未变的节点保留原有倒排记录"""
+        with self._lock:
+            subject_id = subject.get('id')
+            previous = self._subjects[subject_id][1] if subject_id in self._subjects else {}
+            current: Dict[DocKey, int] = {}
+            for key, kind, location, title, fields in _subject_documents(subject):
+                if key in current:
+                    # ID 重复的节点只索引第一个
+                    continue
+                doc_id = previous.pop(key, None)
+                if doc_id is not None:
+                    document = self._documents[doc_id]
+                    if document.fields == fields:
+                        document.location = location
+                        document.title = title
+                        current[key] = doc_id
+                        continue
+                    self._remove_document(doc_id)
+                if fields:
+                    current[key] = self._add_document(_Document(key, kind, location, title, fields))
+            for doc_id in previous.values():
+                self._remove_document(doc_id)
+            self._subjects[subject_id] = (subject, current)
+
+    def remove_subject(self, subject_id: str) -> None:
+        with self._lock:
+            _subject, documents = self._subjects.pop(subject_id, (None, {}))
+            for doc_id in documents.values():
+                self._remove_document(doc_id)
+
+    def _add_document(self, document: _Document) -> int:
+        self._results.clear()
+        doc_id = self._next_id
+        self._next_id += 1
+        self._documents[doc_id] = document
+        for gram, weight in document.weights.items():
+            self._postings.setdefault(gram, {})[doc_id] = weight
+        return doc_id
+
+    def _remove_document(self, doc_id: int) -> None:
+        self._results.clear()
+        document = self._documents.pop(doc_id)
+        for gram in document.weights:
+            postings = self._postings[gram]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[gram]
+
+    def search(self, query: str, limit: int = 20, subject_id: Optional[str] = None,
+               kinds: Optional[Set[str]] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """按相关度返回 (命中总数, 前 limit 条命中)
+
+        文档需包含查询的全部 n-gram；得分为各 n-gram 的 idf × 文档权重之和，
+        节点名称与查询相同或包含完整查询时加权。
+        """
+        grams = query_grams(query)
+        if not grams:
+            return 0, []
+        phrase = _compact(normalize(query))
+        cache_key = (phrase, tuple(grams), limit, subject_id, tuple(sorted(kinds or ())))
+
+        with self._lock:
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+                return cached
+
+            postings = [self._postings.get(gram) for gram in grams]
+            if not all(postings):
+                return 0, []
+            total_docs = len(self._documents)
+            # 从最短的倒排表开始求交集
+            postings.sort(key=len)
+            first, rest = postings[0], postings[1:]
+            first_idf = math.log(1 + total_docs / len(first))
+            rest = [(p, math.log(1 + total_docs / len(p))) for p in rest]
+            documents = self._documents
+            scored = []
+            for doc_id, weight in first.items():
+                score = first_idf * weight
+                for other_postings, idf in rest:
+                    other = other_postings.get(doc_id)
+                    if other is None:
+                        break
+                    score += idf * other
+                else:
+                    document = documents[doc_id]
+                    if kinds and document.kind not in kinds:
+                        continue
+                    if subject_id and document.location['subjectId'] != subject_id:
+                        continue
+                    if document.name == phrase:
+                        score *= EXACT_BOOST
+                    elif phrase in document.haystack:
+                        score *= PHRASE_BOOST
+                    scored.append((score, doc_id))
+
+            top = heapq.nlargest(limit, scored)
+            result = len(scored), [self._hit(documents[doc_id], phrase, score) for score, doc_id in top]
+            self._results[cache_key] = result
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+            return result
+
+    @staticmethod
+    def _hit(document: _Document, phrase: str, score: float) -> Dict[str, Any]:
+        # 摘要取包含查询的字段（优先名称），截取查询附近的文本；都不包含完整查询时取第一个字段的开头
+        field, found = next(iter(document.fields)), -1
+        for name, text in document.fields.items():
+            found = _find_phrase(text, phrase) if phrase else -1
+            if found >= 0:
+                field = name
+                break
+        text = document.fields[field]
+        start = max(0, found - SNIPPET_LENGTH // 3)
+        snippet = text[start:start + SNIPPET_LENGTH]
+        return {
+            'type': document.kind,
+            'id': document.key[1] if document.kind != 'step' else document.location['taskId'],
+            **document.location,
+            'title': document.title,
+            'field': field,
+            'snippet': ('…' if start else '') + snippet + ('…' if start + SNIPPET_LENGTH < len(text) else ''),
+            'score': round(score, 4)
+        }
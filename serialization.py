@@ -0,0 +1,129 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Union
+
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import cache_lookup
+
+# 可选依赖：安装了 orjson 时用它编码/解码，安装了 brotli 时支持 br 压缩
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(obj: Any, pretty: bool = False, sort_keys: bool = False,
+          default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """序列化为 UTF-8 JSON；默认紧凑格式，pretty 时缩进2格便于人工查看"""
+    if orjson is not None:
+        option = 0
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # 非字符串键、超出64位的整数等 orjson 不支持的数据交给标准库处理
+            pass
+
+    if pretty:
+        text = json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=sort_keys, default=default)
+    else:
+        text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys, default=default)
+    return text.encode('utf-8')
+
+
+def dumps_text(obj: Any, pretty: bool = False, sort_keys: bool = False) -> str:
+    """序列化为 JSON 字符串"""
+    return dumps(obj, pretty=pretty, sort_keys=sort_keys).decode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """解析 JSON，格式错误时抛出 ValueError（json.JSONDecodeError）"""
+    if orjson is not None:
+        # orjson.JSONDecodeError 是 json.JSONDecodeError 的子类
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask 的 JSON 实现：沿用默认的键排序与 default 处理，编码改用 dumps（UTF-8 输出，不转义中文）"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(
+            obj,
+            pretty=kwargs.get('indent') is not None,
+            sort_keys=kwargs.get('sort_keys', self.sort_keys),
+            default=kwargs.get('default', self.default)
+        ).decode('utf-8')
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return loads(s)
+
+
+# 响应压缩
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """按 Accept-Encoding 选择压缩算法：优先 br（需安装 brotli），其次 gzip"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    """按指定算法压缩响应体"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level)
+
+
+# 带 ETag 的响应压缩结果缓存: (ETag, 编码) -> 压缩后的字节
+_compressed: 'OrderedDict[tuple[str, str], bytes]' = OrderedDict()
+_compressed_lock = threading.Lock()
+COMPRESSED_CACHE_SIZE = 64
+
+
+def compress_cached(etag: Optional[str], data: bytes, encoding: str, level: int = 6) -> bytes:
+    """压缩响应体；相同 ETag 的内容相同，只压缩一次"""
+    if not etag:
+        return compress(data, encoding, level)
+
+    key = (etag, encoding)
+    with _compressed_lock:
+        hit = key in _compressed
+        if hit:
+            _compressed.move_to_end(key)
+            compressed = _compressed[key]
+    cache_lookup('compressed_response', hit)
+    if hit:
+        return compressed
+
+    compressed = compress(data, encoding, level)
+    with _compressed_lock:
+        _compressed[key] = compressed
+        if len(_compressed) > COMPRESSED_CACHE_SIZE:
+            _compressed.popitem(last=False)
+    return compressed
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """压缩后的响应是不同的表示，ETag 附加编码后缀"""
+    return f'{etag}-{encoding}'
+
+
+def strip_encoding_suffix(etag: str) -> str:
+    """去掉 encoded_etag 附加的编码后缀，得到资源本身的版本"""
+    for encoding in ('br', 'gzip'):
+        if etag.endswith('-' + encoding):
+            return etag[:-len(encoding) - 1]
+    return etag
@@ -4,6 +4,7 @@ let appState = {
     currentStudent: null,
     currentSubject: null,
     currentTask: null,
+    currentTaskProgress: null,
     students: [],
     subjects: [],
     isLoading: false,
@@ -32,9 +33,22 @@ class ApiClient {
         return await response.json();
     }
 
+    // 拼接查询参数（忽略空值），如 { fields: 'id,name', limit: 20 }
+    static withQuery(url, params = {}) {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null && value !== '') {
+                query.append(key, value);
+            }
+        });
+        const queryString = query.toString();
+        return queryString ? `${url}?${queryString}` : url;
+    }
+
     // 学生相关API
-    static async getStudents() {
-        return await this.request('/api/students');
+    // params: grade/subject 过滤、limit/cursor 分页（返回 { items, nextCursor }）、fields 字段投影
+    static async getStudents(params) {
+        return await this.request(this.withQuery('/api/students', params));
     }
 
     static async getStudent(studentId) {
@@ -62,8 +76,9 @@ class ApiClient {
     }
 
     // 科目相关API
-    static async getSubjects() {
-        return await this.request('/api/subjects');
+    // params: student 过滤、limit/cursor 分页、fields 字段投影（可用 levelCount/chapterCount/taskCount 代替 levels）
+    static async getSubjects(params) {
+        return await this.request(this.withQuery('/api/subjects', params));
     }
 
     static async getSubject(subjectId) {
@@ -90,6 +105,43 @@ class ApiClient {
         });
     }
 
+    // 科目结构的定点修改：只提交被修改的章节/任务，不再整体 PUT 科目
+    static async editSubject(subjectId, path, method, data) {
+        return await this.request(`/api/subjects/${subjectId}/${path}`, {
+            method: method,
+            body: data === undefined ? undefined : JSON.stringify(data),
+        });
+    }
+
+    static async addChapter(subjectId, levelId, chapterData) {
+        return await this.editSubject(subjectId, `levels/${levelId}/chapters`, 'POST', chapterData);
+    }
+
+    static async updateChapter(subjectId, chapterId, fields) {
+        return await this.editSubject(subjectId, `chapters/${chapterId}`, 'PATCH', fields);
+    }
+
+    // levelId 为目标年级，position 省略时追加到末尾
+    static async moveChapter(subjectId, chapterId, levelId, position) {
+        return await this.editSubject(subjectId, `chapters/${chapterId}/move`, 'POST', { levelId, position });
+    }
+
+    static async deleteChapter(subjectId, chapterId) {
+        return await this.editSubject(subjectId, `chapters/${chapterId}`, 'DELETE');
+    }
+
+    static async addTask(subjectId, chapterId, taskData) {
+        return await this.editSubject(subjectId, `chapters/${chapterId}/tasks`, 'POST', taskData);
+    }
+
+    static async updateTask(subjectId, taskId, fields) {
+        return await this.editSubject(subjectId, `tasks/${taskId}`, 'PATCH', fields);
+    }
+
+    static async deleteTask(subjectId, taskId) {
+        return await this.editSubject(subjectId, `tasks/${taskId}`, 'DELETE');
+    }
+
     // 进度相关API
     static async getStudentProgress(studentId) {
         return await this.request(`/api/students/${studentId}/progress`);
@@ -102,6 +154,28 @@ class ApiClient {
         });
     }
 
+    // 单任务进度修改：action 为 start/complete/skip/uncomplete/reset，步骤操作需传 step
+    static async updateTaskProgress(studentId, subjectId, taskId, action, step) {
+        return await this.request(`/api/students/${studentId}/subjects/${subjectId}/tasks/${taskId}`, {
+            method: 'PATCH',
+            body: JSON.stringify({ action, step }),
+        });
+    }
+
+    // 学生看板：学生、科目/章节进度、任务状态与最近活动
+    static async getStudentDashboard(studentId) {
+        return await this.request(`/api/students/${studentId}/dashboard`);
+    }
+
+    static async getSubjectRollup(studentId, subjectId) {
+        return await this.request(`/api/students/${studentId}/subjects/${subjectId}/rollup`);
+    }
+
+    // 已解锁/锁定的任务（前置任务是否完成由服务端判断）
+    static async getUnlockedTasks(studentId, subjectId) {
+        return await this.request(`/api/students/${studentId}/subjects/${subjectId}/unlocked`);
+    }
+
     static async getSubjectProgress(studentId, subjectId) {
         return await this.request(`/api/students/${studentId}/subjects/${subjectId}/progress`);
     }
@@ -112,6 +186,14 @@ class ApiClient {
     }
 
     // 批量操作API
+    // operations: [{ op: 'createStudent' | 'updateStudent' | 'deleteStudent' | 'assignSubject' | 'unassignSubject' | 'resetProgress', ... }]
+    static async batch(operations, atomic = false) {
+        return await this.request('/api/batch', {
+            method: 'POST',
+            body: JSON.stringify({ operations, atomic }),
+        });
+    }
+
     static async addSubjectToStudents(subjectId, studentIds) {
         return await this.request('/api/batch/add-subject-to-students', {
             method: 'POST',
@@ -135,6 +217,9 @@ async function initApp() {
         // 渲染学生列表
         renderStudents();
         
+        // 订阅其他页面/教师的修改
+        subscribeEvents();
+        
         console.log('✅ 应用初始化完成');
     } catch (error) {
         console.error('初始化失败:', error);
@@ -144,6 +229,53 @@ async function initApp() {
     }
 }
 
+// 订阅服务端变更事件，按事件增量更新本地数据，无需轮询完整列表
+function subscribeEvents() {
+    if (!window.EventSource) return;
+    const source = new EventSource('/api/events?types=student,subject,progress');
+
+    source.addEventListener('student', e => {
+        const event = JSON.parse(e.data);
+        if (event.action === 'deleted') {
+            appState.students = appState.students.filter(s => s.id !== event.resourceId);
+        } else {
+            const index = appState.students.findIndex(s => s.id === event.resourceId);
+            if (index >= 0) {
+                appState.students[index] = { ...appState.students[index], ...event.delta };
+            } else {
+                appState.students.push({ id: event.resourceId, ...event.delta });
+            }
+        }
+        renderStudents();
+    });
+
+    source.addEventListener('subject', async e => {
+        const event = JSON.parse(e.data);
+        if (event.action === 'deleted') {
+            appState.subjects = appState.subjects.filter(s => s.id !== event.resourceId);
+        } else {
+            // 事件只带摘要，科目内容按ID单独获取；已有科目原位替换，保持列表顺序
+            await refreshSubject(event.resourceId);
+        }
+        renderStudents();
+    });
+
+    source.addEventListener('progress', e => {
+        const event = JSON.parse(e.data);
+        const student = appState.students.find(s => s.id === event.resourceId);
+        if (student && event.delta.overallProgress !== undefined) {
+            student.overallProgress = event.delta.overallProgress;
+            renderStudents();
+        }
+    });
+
+    // 错过的事件已不在服务端缓冲区内，重新加载全部数据
+    source.addEventListener('reset', async () => {
+        await loadDataFromAPI();
+        renderStudents();
+    });
+}
+
 // 从API加载数据
 async function loadDataFromAPI() {
     try {
@@ -232,61 +364,6 @@ function showError(message) {
     document.body.appendChild(errorDiv);
 }
 
-// 计算学生总进度
-function calculateOverallProgress(progressData) {
-    let totalTasks = 0;
-    let completedTasks = 0;
-
-    Object.keys(progressData.subjects || {}).forEach(subjectId => {
-        const subjectData = progressData.subjects[subjectId];
-        const subject = appState.subjects.find(s => s.id === subjectId);
-        
-        if (subject && subject.levels) {
-            subject.levels.forEach(level => {
-                (level.chapters || []).forEach(chapter => {
-                    (chapter.tasks || []).forEach(task => {
-                        totalTasks++;
-                        const taskProgress = subjectData.tasks?.[task.id];
-                        if (taskProgress && taskProgress.status === 'completed') {
-                            completedTasks++;
-                        }
-                    });
-                });
-            });
-        }
-    });
-
-    return totalTasks > 0 ? Math.round((completedTasks / totalTasks) * 100) : 0;
-}
-
-// 计算学科进度
-function calculateSubjectProgress(subjectId, progressData) {
-    const subject = appState.subjects.find(s => s.id === subjectId);
-    if (!subject || !subject.levels) return { progress: 0, completed: 0, total: 0 };
-
-    let totalTasks = 0;
-    let completedTasks = 0;
-
-    subject.levels.forEach(level => {
-        (level.chapters || []).forEach(chapter => {
-            (chapter.tasks || []).forEach(task => {
-                totalTasks++;
-                const subjectData = progressData.subjects?.[subjectId];
-                const taskProgress = subjectData?.tasks?.[task.id];
-                if (taskProgress && taskProgress.status === 'completed') {
-                    completedTasks++;
-                }
-            });
-        });
-    });
-
-    return {
-        progress: totalTasks > 0 ? Math.round((completedTasks / totalTasks) * 100) : 0,
-        completed: completedTasks,
-        total: totalTasks
-    };
-}
-
 // 渲染学生列表
 function renderStudents() {
     const grid = document.getElementById('student-grid');
@@ -419,22 +496,24 @@ async function selectStudent(studentId) {
         if (!student) return;
 
         appState.currentStudent = student;
-        const progressData = await ApiClient.getStudentProgress(studentId);
+        // 进度、科目汇总与最近活动均由服务端一次算好
+        const dashboard = await ApiClient.getStudentDashboard(studentId);
+        appState.currentStudent = dashboard.student;
         
         // 更新学生信息显示
-        document.getElementById('current-student-avatar').textContent = student.avatar || '👦';
-        document.getElementById('current-student-name').textContent = student.name;
+        document.getElementById('current-student-avatar').textContent = dashboard.student.avatar || '👦';
+        document.getElementById('current-student-name').textContent = dashboard.student.name;
         
-        // 计算总体进度
-        const overallProgress = calculateOverallProgress(progressData);
+        // 总体进度
+        const overallProgress = dashboard.overallProgress;
         document.getElementById('overall-progress-text').textContent = `${overallProgress}%`;
         document.getElementById('overall-progress-bar').style.width = `${overallProgress}%`;
 
         // 渲染学科卡片
-        renderSubjects(progressData);
+        renderSubjects(dashboard.subjects);
 
         // 渲染最近活动
-        renderRecentActivities(progressData);
+        renderRecentActivities(dashboard.recentActivity);
 
         hideLoading();
         showPage('student-dashboard');
@@ -445,18 +524,15 @@ async function selectStudent(studentId) {
 }
 
 // 渲染学科卡片
-function renderSubjects(progressData) {
+function renderSubjects(subjectSummaries) {
     const grid = document.getElementById('subjects-grid');
     if (!grid) return;
     
     grid.innerHTML = '';
 
-    // 只渲染学生拥有的学科
-    (appState.currentStudent.subjects || []).forEach(subjectId => {
-        const subject = appState.subjects.find(s => s.id === subjectId);
-        if (!subject) return;
-
-        const subjectProgress = calculateSubjectProgress(subject.id, progressData);
+    // 看板中只包含学生拥有的学科，进度已由服务端计算
+    subjectSummaries.forEach(subject => {
+        const subjectProgress = subject;
         
         const card = document.createElement('div');
         card.className = 'subject-card';
@@ -480,43 +556,14 @@ function renderSubjects(progressData) {
 }
 
 // 渲染最近活动
-function renderRecentActivities(progressData) {
+function renderRecentActivities(activities) {
     const container = document.getElementById('recent-activities-list');
     if (!container) return;
     
     container.innerHTML = '';
 
-    const activities = [];
-
-    // 收集所有任务活动
-    Object.keys(progressData.subjects || {}).forEach(subjectId => {
-        const subjectData = progressData.subjects[subjectId];
-        const subject = appState.subjects.find(s => s.id === subjectId);
-        
-        if (subject && subject.levels) {
-            subject.levels.forEach(level => {
-                (level.chapters || []).forEach(chapter => {
-                    (chapter.tasks || []).forEach(task => {
-                        const taskProgress = subjectData.tasks?.[task.id];
-                        if (taskProgress) {
-                            activities.push({
-                                task: task.name,
-                                subject: subject.name,
-                                status: taskProgress.status,
-                                completedAt: taskProgress.completedAt || taskProgress.startedAt,
-                                currentStep: taskProgress.currentStep || 0
-                            });
-                        }
-                    });
-                });
-            });
-        }
-    });
-
-    // 按时间排序并取前5个
-    activities.sort((a, b) => new Date(b.completedAt || '1970-01-01') - new Date(a.completedAt || '1970-01-01'))
-              .slice(0, 5)
-              .forEach(activity => {
+    // 服务端已按时间倒序取好最近的活动
+    activities.forEach(activity => {
         const item = document.createElement('div');
         item.className = 'activity-item';
         
@@ -529,7 +576,7 @@ function renderRecentActivities(progressData) {
         item.innerHTML = `
             <span class="activity-status">${statusIcon}</span>
             <div>
-                <div>${activity.subject} - ${activity.task}</div>
+                <div>${activity.subjectName} - ${activity.taskName}</div>
                 <small style="color: #666;">${statusText}</small>
             </div>
         `;
@@ -549,21 +596,24 @@ async function selectSubject(subjectId) {
         if (!subject) return;
 
         appState.currentSubject = subject;
-        const progressData = await ApiClient.getStudentProgress(appState.currentStudent.id);
+        const [progressData, rollup, unlocked] = await Promise.all([
+            ApiClient.getStudentProgress(appState.currentStudent.id),
+            ApiClient.getSubjectRollup(appState.currentStudent.id, subjectId),
+            ApiClient.getUnlockedTasks(appState.currentStudent.id, subjectId)
+        ]);
 
         // 🔧 关键修复：确保科目进度数据存在
         if (!progressData.subjects) {
             progressData.subjects = {};
         }
         
+        // 服务端会在首次修改任务进度时补齐该科目的进度数据，这里无需保存
         if (!progressData.subjects[subjectId]) {
             progressData.subjects[subjectId] = {
                 currentLevel: 'grade_1',
                 totalProgress: 0,
                 tasks: {}
             };
-            // 自动保存修复后的数据
-            await ApiClient.saveStudentProgress(appState.currentStudent.id, progressData);
         }
 
         // 更新学科头部
@@ -571,7 +621,7 @@ async function selectSubject(subjectId) {
         document.getElementById('subject-header').style.background = subject.color;
 
         // 渲染任务列表
-        renderTasks(subject, progressData.subjects[subjectId]);
+        renderTasks(subject, progressData.subjects[subjectId], rollup, unlocked);
 
         showPage('subject-tasks');
     } catch (error) {
@@ -580,7 +630,7 @@ async function selectSubject(subjectId) {
 }
 
 // 渲染任务列表 - 修复版本
-function renderTasks(subject, subjectProgressData) {
+function renderTasks(subject, subjectProgressData, rollup, unlocked) {
     const container = document.getElementById('chapters-container');
     if (!container) return;
     
@@ -599,24 +649,28 @@ function renderTasks(subject, subjectProgressData) {
         return;
     }
 
+    // 章节进度由服务端汇总，任务是否锁定也以服务端的解锁状态为准
+    const lockedTasks = new Set((unlocked && unlocked.locked) || []);
+    const chapterRollups = {};
+    ((rollup && rollup.levels) || []).forEach(level => {
+        level.chapters.forEach(chapter => { chapterRollups[chapter.id] = chapter; });
+    });
+
     subject.levels.forEach(level => {
         (level.chapters || []).forEach(chapter => {
             const chapterDiv = document.createElement('div');
             chapterDiv.className = 'chapter';
 
-            // 计算章节进度
-            const chapterTasks = (chapter.tasks || []).length;
-            const chapterCompleted = (chapter.tasks || []).filter(task => {
-                const taskProgress = subjectProgressData.tasks[task.id];
-                return taskProgress && taskProgress.status === 'completed';
-            }).length;
-            const chapterProgress = chapterTasks > 0 ? Math.round((chapterCompleted / chapterTasks) * 100) : 0;
+            const chapterRollup = chapterRollups[chapter.id];
+            const chapterProgress = chapterRollup ? chapterRollup.progress : 0;
+            const remainingText = chapterRollup && chapterRollup.remainingMinutes > 0
+                ? `，剩余约${chapterRollup.remainingMinutes}分钟` : '';
 
             chapterDiv.innerHTML = `
                 <div class="chapter-header">
                     <div class="chapter-title">${chapter.name}</div>
                     <div style="color: #666; font-size: 0.9em;">
-                        ${chapter.description} - 进度: ${chapterProgress}%
+                        ${chapter.description} - 进度: ${chapterProgress}%${remainingText}
                     </div>
                     <div class="progress-bar" style="margin-top: 5px;">
                         <div class="progress-fill" style="width: ${chapterProgress}%"></div>
@@ -629,10 +683,7 @@ function renderTasks(subject, subjectProgressData) {
 
             (chapter.tasks || []).forEach(task => {
                 const taskProgress = subjectProgressData.tasks[task.id];
-                const isLocked = (task.prerequisites || []).some(prereq => {
-                    const prereqProgress = subjectProgressData.tasks[prereq];
-                    return !prereqProgress || prereqProgress.status !== 'completed';
-                });
+                const isLocked = lockedTasks.has(task.id);
 
                 const taskItem = document.createElement('div');
                 taskItem.className = `task-item ${taskProgress?.status || 'pending'}${isLocked ? ' locked' : ''}`;
@@ -689,21 +740,12 @@ async function selectTask(taskId) {
         if (!targetTask) return;
 
         appState.currentTask = targetTask;
-        const progressData = await ApiClient.getStudentProgress(appState.currentStudent.id);
-        const taskProgress = progressData.subjects[appState.currentSubject.id].tasks[taskId] || {
-            status: 'pending',
-            currentStep: 0,
-            stepProgress: []
-        };
-
-        // 如果是新任务，初始化进度
-        if (!progressData.subjects[appState.currentSubject.id].tasks[taskId]) {
-            taskProgress.status = 'in_progress';
-            taskProgress.startedAt = new Date().toISOString();
-            taskProgress.stepProgress = (targetTask.steps || []).map(() => ({ completed: false }));
-            progressData.subjects[appState.currentSubject.id].tasks[taskId] = taskProgress;
-            await ApiClient.saveStudentProgress(appState.currentStudent.id, progressData);
-        }
+        // 新任务由服务端初始化进度，已开始的任务原样返回
+        const result = await ApiClient.updateTaskProgress(
+            appState.currentStudent.id, appState.currentSubject.id, taskId, 'start'
+        );
+        const taskProgress = result.task;
+        appState.currentTaskProgress = taskProgress;
 
         // 更新任务详情页面
         document.getElementById('task-detail-title').textContent = `📋 ${targetTask.name}`;
@@ -782,34 +824,28 @@ function getStepTypeText(index) {
     return `步骤 ${index + 1}`;
 }
 
-// 完成步骤
-async function completeStep(stepIndex) {
-    try {
-        const progressData = await ApiClient.getStudentProgress(appState.currentStudent.id);
-        const taskProgress = progressData.subjects[appState.currentSubject.id].tasks[appState.currentTask.id];
-
-        if (!taskProgress.stepProgress[stepIndex]) {
-            taskProgress.stepProgress[stepIndex] = { completed: false };
-        }
-
-        taskProgress.stepProgress[stepIndex].completed = true;
-        taskProgress.stepProgress[stepIndex].completedAt = new Date().toISOString();
+// 提交步骤操作，并用服务端返回的任务进度刷新页面
+async function updateStep(action, stepIndex) {
+    const previous = appState.currentTaskProgress;
+    const result = await ApiClient.updateTaskProgress(
+        appState.currentStudent.id, appState.currentSubject.id, appState.currentTask.id, action, stepIndex
+    );
+    const taskProgress = result.task;
+    appState.currentTaskProgress = taskProgress;
 
-        // 更新当前步骤
-        if (stepIndex === taskProgress.currentStep) {
-            taskProgress.currentStep = Math.min(stepIndex + 1, (appState.currentTask.steps || []).length);
-        }
+    // 检查是否刚完成所有步骤
+    if (taskProgress.status === 'completed' && (!previous || previous.status !== 'completed')) {
+        showCompletionMessage();
+    }
 
-        // 检查是否完成所有步骤
-        if (taskProgress.stepProgress.every(step => step && step.completed)) {
-            taskProgress.status = 'completed';
-            taskProgress.completedAt = new Date().toISOString();
-            showCompletionMessage();
-        }
+    renderTaskSteps(appState.currentTask, taskProgress);
+    updateTaskProgress(taskProgress);
+}
 
-        await ApiClient.saveStudentProgress(appState.currentStudent.id, progressData);
-        renderTaskSteps(appState.currentTask, taskProgress);
-        updateTaskProgress(taskProgress);
+// 完成步骤
+async function completeStep(stepIndex) {
+    try {
+        await updateStep('complete', stepIndex);
     } catch (error) {
         showMessage(`保存进度失败: ${error.message}`, 'error');
     }
@@ -818,50 +854,16 @@ async function completeStep(stepIndex) {
 // 取消完成步骤
 async function uncompleteStep(stepIndex) {
     try {
-        const progressData = await ApiClient.getStudentProgress(appState.currentStudent.id);
-        const taskProgress = progressData.subjects[appState.currentSubject.id].tasks[appState.currentTask.id];
-
-        if (taskProgress.stepProgress[stepIndex]) {
-            taskProgress.stepProgress[stepIndex].completed = false;
-            delete taskProgress.stepProgress[stepIndex].completedAt;
-        }
-
-        // 更新任务状态
-        taskProgress.status = 'in_progress';
-        taskProgress.currentStep = Math.min(stepIndex, taskProgress.currentStep);
-        delete taskProgress.completedAt;
-
-        await ApiClient.saveStudentProgress(appState.currentStudent.id, progressData);
-        renderTaskSteps(appState.currentTask, taskProgress);
-        updateTaskProgress(taskProgress);
+        await updateStep('uncomplete', stepIndex);
     } catch (error) {
         showMessage(`更新进度失败: ${error.message}`, 'error');
     }
 }
 
-// 跳过步骤
+// 跳过步骤（标记为完成并添加跳过标记）
 async function skipStep(stepIndex) {
     try {
-        const progressData = await ApiClient.getStudentProgress(appState.currentStudent.id);
-        const taskProgress = progressData.subjects[appState.currentSubject.id].tasks[appState.currentTask.id];
-
-        // 标记为完成但添加跳过标记
-        if (!taskProgress.stepProgress[stepIndex]) {
-            taskProgress.stepProgress[stepIndex] = { completed: false };
-        }
-
-        taskProgress.stepProgress[stepIndex].completed = true;
-        taskProgress.stepProgress[stepIndex].skipped = true;
-        taskProgress.stepProgress[stepIndex].completedAt = new Date().toISOString();
-
-        // 更新当前步骤
-        if (stepIndex === taskProgress.currentStep) {
-            taskProgress.currentStep = Math.min(stepIndex + 1, (appState.currentTask.steps || []).length);
-        }
-
-        await ApiClient.saveStudentProgress(appState.currentStudent.id, progressData);
-        renderTaskSteps(appState.currentTask, taskProgress);
-        updateTaskProgress(taskProgress);
+        await updateStep('skip', stepIndex);
     } catch (error) {
         showMessage(`跳过步骤失败: ${error.message}`, 'error');
     }
@@ -883,20 +885,17 @@ async function resetTaskProgress(taskId) {
     try {
         if (!confirm('确定要重置这个任务吗？所有进度将被清除。')) return;
         
-        const progressData = await ApiClient.getStudentProgress(appState.currentStudent.id);
+        await ApiClient.updateTaskProgress(
+            appState.currentStudent.id, appState.currentSubject.id, taskId, 'reset'
+        );
         
-        if (progressData.subjects[appState.currentSubject.id].tasks[taskId]) {
-            delete progressData.subjects[appState.currentSubject.id].tasks[taskId];
-            await ApiClient.saveStudentProgress(appState.currentStudent.id, progressData);
-            
-            if (appState.currentTask && appState.currentTask.id === taskId) {
-                backToSubjectTasks();
-            } else {
-                selectSubject(appState.currentSubject.id);
-            }
-            
-            showMessage('任务已重置', 'success');
+        if (appState.currentTask && appState.currentTask.id === taskId) {
+            backToSubjectTasks();
+        } else {
+            selectSubject(appState.currentSubject.id);
         }
+        
+        showMessage('任务已重置', 'success');
     } catch (error) {
         showMessage(`重置失败: ${error.message}`, 'error');
     }
@@ -1628,36 +1627,21 @@ async function createNewChapter(subjectId) {
             return;
         }
         
-        // 确保科目有levels结构
-        if (!subject.levels) {
+        // 科目还没有年级时先创建默认年级（整体保存一次）
+        if (!subject.levels || subject.levels.length === 0) {
             subject.levels = [{
                 id: 'grade_1',
                 name: '一年级',
-                chapters: []
+                chapters: [chapterData]
             }];
+            await ApiClient.updateSubject(subjectId, subject);
+        } else {
+            // 只提交新章节
+            await ApiClient.addChapter(subjectId, levelId, chapterData);
         }
         
-        // 找到对应级别并添加章节
-        let levelFound = false;
-        subject.levels.forEach(level => {
-            if (level.id === levelId) {
-                if (!level.chapters) level.chapters = [];
-                level.chapters.push(chapterData);
-                levelFound = true;
-            }
-        });
-        
-        if (!levelFound) {
-            showMessage('级别不存在', 'error');
-            return;
-        }
-        
-        // 保存更新后的科目数据
-        await ApiClient.updateSubject(subjectId, subject);
-        
-        // 重新加载科目数据
-        appState.subjects = await ApiClient.getSubjects();
-        const updatedSubject = appState.subjects.find(s => s.id === subjectId);
+        // 只重新加载被修改的科目
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染任务管理界面
         renderTaskManagement(updatedSubject);
@@ -1810,31 +1794,14 @@ async function createNewTask(chapterId) {
             return;
         }
         
-        // 找到对应章节并添加任务
-        let taskAdded = false;
-        subject.levels.forEach(level => {
-            level.chapters.forEach(chapter => {
-                if (chapter.id === chapterId) {
-                    if (!chapter.tasks) chapter.tasks = [];
-                    chapter.tasks.push(taskData);
-                    taskAdded = true;
-                }
-            });
-        });
-        
-        if (!taskAdded) {
-            showMessage('章节不存在', 'error');
-            return;
-        }
-        
-        // 保存更新后的科目数据
-        await ApiClient.updateSubject(subjectId, subject);
+        // 只提交新任务（章节不存在时服务端返回 404）
+        await ApiClient.addTask(subjectId, chapterId, taskData);
         
-        // 重新加载科目数据
-        appState.subjects = await ApiClient.getSubjects();
+        // 只重新加载被修改的科目
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染任务管理界面
-        renderTaskManagement(subject);
+        renderTaskManagement(updatedSubject);
         
         // 关闭模态框
         document.querySelector('.modal[style*="10002"]').remove();
@@ -1846,6 +1813,18 @@ async function createNewTask(chapterId) {
     }
 }
 
+// 重新加载单个科目并替换 appState 中的副本（不重新拉取全部科目）
+async function refreshSubject(subjectId) {
+    const subject = await ApiClient.getSubject(subjectId);
+    const index = appState.subjects.findIndex(s => s.id === subjectId);
+    if (index > -1) {
+        appState.subjects[index] = subject;
+    } else {
+        appState.subjects.push(subject);
+    }
+    return subject;
+}
+
 // 🔧 增强的任务管理界面渲染
 function renderTaskManagement(subject) {
     const container = document.getElementById('task-management');
@@ -1947,20 +1926,10 @@ async function duplicateTask(chapterId, taskId) {
         };
         
         // 添加到同一章节
-        subject.levels.forEach(level => {
-            level.chapters.forEach(chapter => {
-                if (chapter.id === chapterId) {
-                    chapter.tasks.push(duplicatedTask);
-                }
-            });
-        });
-        
-        // 保存更新
-        await ApiClient.updateSubject(subjectId, subject);
+        await ApiClient.addTask(subjectId, chapterId, duplicatedTask);
         
         // 重新加载数据
-        appState.subjects = await ApiClient.getSubjects();
-        const updatedSubject = appState.subjects.find(s => s.id === subjectId);
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染
         renderTaskManagement(updatedSubject);
@@ -2025,8 +1994,7 @@ async function addDefaultContent(subjectId) {
         await ApiClient.updateSubject(subjectId, subject);
         
         // 重新加载数据
-        appState.subjects = await ApiClient.getSubjects();
-        const updatedSubject = appState.subjects.find(s => s.id === subjectId);
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染
         renderTaskManagement(updatedSubject);
@@ -2148,54 +2116,26 @@ async function updateChapter(subjectId, chapterId) {
         const subject = appState.subjects.find(s => s.id === subjectId);
         if (!subject) return;
         
-        // 找到并更新章节
-        let chapterFound = false;
-        let currentLevelId = null;
-        let chapterData = null;
+        // 找到章节当前所在的级别
+        const currentLevel = (subject.levels || []).find(level =>
+            (level.chapters || []).some(c => c.id === chapterId));
         
-        // 先找到当前章节
-        subject.levels.forEach(level => {
-            const chapterIndex = level.chapters.findIndex(c => c.id === chapterId);
-            if (chapterIndex > -1) {
-                chapterData = level.chapters[chapterIndex];
-                currentLevelId = level.id;
-                chapterFound = true;
-                
-                // 如果级别改变了，需要移动章节
-                if (newLevelId !== currentLevelId) {
-                    // 从当前级别移除
-                    level.chapters.splice(chapterIndex, 1);
-                } else {
-                    // 只更新内容
-                    chapterData.name = chapterName;
-                    chapterData.description = chapterDescription;
-                }
-            }
-        });
-        
-        if (!chapterFound) {
+        if (!currentLevel) {
             showMessage('章节不存在', 'error');
             return;
         }
         
-        // 如果级别改变了，添加到新级别
-        if (newLevelId !== currentLevelId) {
-            chapterData.name = chapterName;
-            chapterData.description = chapterDescription;
-            
-            const targetLevel = subject.levels.find(l => l.id === newLevelId);
-            if (targetLevel) {
-                if (!targetLevel.chapters) targetLevel.chapters = [];
-                targetLevel.chapters.push(chapterData);
-            }
+        // 更新内容；级别改变时移动到新级别末尾
+        await ApiClient.updateChapter(subjectId, chapterId, {
+            name: chapterName,
+            description: chapterDescription
+        });
+        if (newLevelId !== currentLevel.id) {
+            await ApiClient.moveChapter(subjectId, chapterId, newLevelId);
         }
         
-        // 保存更新
-        await ApiClient.updateSubject(subjectId, subject);
-        
         // 重新加载数据
-        appState.subjects = await ApiClient.getSubjects();
-        const updatedSubject = appState.subjects.find(s => s.id === subjectId);
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染
         renderTaskManagement(updatedSubject);
@@ -2219,27 +2159,11 @@ async function deleteChapter(chapterId) {
         const subject = appState.subjects.find(s => s.id === subjectId);
         if (!subject) return;
         
-        // 找到并删除章节
-        let chapterFound = false;
-        subject.levels.forEach(level => {
-            const chapterIndex = level.chapters.findIndex(c => c.id === chapterId);
-            if (chapterIndex > -1) {
-                level.chapters.splice(chapterIndex, 1);
-                chapterFound = true;
-            }
-        });
-        
-        if (!chapterFound) {
-            showMessage('章节不存在', 'error');
-            return;
-        }
-        
-        // 保存更新
-        await ApiClient.updateSubject(subjectId, subject);
+        // 删除章节（服务端同时删除章节下的任务）
+        await ApiClient.deleteChapter(subjectId, chapterId);
         
         // 重新加载数据
-        appState.subjects = await ApiClient.getSubjects();
-        const updatedSubject = appState.subjects.find(s => s.id === subjectId);
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染
         renderTaskManagement(updatedSubject);
@@ -2400,37 +2324,18 @@ async function updateTask(subjectId, taskId, chapterId) {
         const subject = appState.subjects.find(s => s.id === subjectId);
         if (!subject) return;
         
-        // 找到并更新任务
-        let taskFound = false;
-        subject.levels.forEach(level => {
-            level.chapters.forEach(chapter => {
-                const taskIndex = chapter.tasks.findIndex(t => t.id === taskId);
-                if (taskIndex > -1) {
-                    chapter.tasks[taskIndex] = {
-                        ...chapter.tasks[taskIndex],
-                        name: taskName,
-                        type: taskType,
-                        difficulty: difficulty,
-                        estimatedTime: estimatedTime,
-                        steps: steps,
-                        prerequisites: prerequisites
-                    };
-                    taskFound = true;
-                }
-            });
+        // 只提交被修改的任务字段
+        await ApiClient.updateTask(subjectId, taskId, {
+            name: taskName,
+            type: taskType,
+            difficulty: difficulty,
+            estimatedTime: estimatedTime,
+            steps: steps,
+            prerequisites: prerequisites
         });
         
-        if (!taskFound) {
-            showMessage('任务不存在', 'error');
-            return;
-        }
-        
-        // 保存更新
-        await ApiClient.updateSubject(subjectId, subject);
-        
         // 重新加载数据
-        appState.subjects = await ApiClient.getSubjects();
-        const updatedSubject = appState.subjects.find(s => s.id === subjectId);
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染
         renderTaskManagement(updatedSubject);
@@ -2456,31 +2361,11 @@ async function deleteTask(chapterId, taskId) {
         // 确认删除
         if (!confirm('确定要删除这个任务吗？')) return;
         
-        // 找到并删除任务
-        let taskFound = false;
-        subject.levels.forEach(level => {
-            level.chapters.forEach(chapter => {
-                if (chapter.id === chapterId) {
-                    const taskIndex = chapter.tasks.findIndex(t => t.id === taskId);
-                    if (taskIndex > -1) {
-                        chapter.tasks.splice(taskIndex, 1);
-                        taskFound = true;
-                    }
-                }
-            });
-        });
-        
-        if (!taskFound) {
-            showMessage('任务不存在', 'error');
-            return;
-        }
-        
-        // 保存更新
-        await ApiClient.updateSubject(subjectId, subject);
+        // 删除任务（服务端同时从其他任务的前置任务中移除）
+        await ApiClient.deleteTask(subjectId, taskId);
         
         // 重新加载数据
-        appState.subjects = await ApiClient.getSubjects();
-        const updatedSubject = appState.subjects.find(s => s.id === subjectId);
+        const updatedSubject = await refreshSubject(subjectId);
         
         // 重新渲染
         renderTaskManagement(updatedSubject);
@@ -0,0 +1,1413 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
+from urllib.parse import quote, unquote
+import serialization
+from config import Config
+from persistence import FileLock, atomic_write_json
+from journal import ProgressJournal
+from metrics import cache_lookup, observe_storage
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    """存储读写失败"""
+
+
+class Storage(ABC):
+    """存储接口：DataManager 只通过这些方法读写学生、科目与进度
+
+    返回的对象可能是存储层缓存的同一份数据，调用方不应直接修改。
+    写操作失败时抛出 StorageError；transaction() 内的写操作在退出时一起提交，异常时全部丢弃。
+    """
+
+    @abstractmethod
+    def transaction(self):
+        """事务上下文（可嵌套，只有最外层提交）"""
+
+    # 学生
+    @abstractmethod
+    def list_students(self) -> List[Dict[str, Any]]:
+        """全部学生（保持添加顺序）"""
+
+    @abstractmethod
+    def get_student(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """按 id 读取学生，不存在时返回 None"""
+
+    @abstractmethod
+    def put_student(self, student: Dict[str, Any]) -> None:
+        """新增或整体替换学生（按 id）"""
+
+    @abstractmethod
+    def delete_student(self, student_id: str) -> bool:
+        """删除学生，返回是否存在"""
+
+    # 科目
+    @abstractmethod
+    def list_subjects(self) -> List[Dict[str, Any]]:
+        """全部科目（保持添加顺序）"""
+
+    @abstractmethod
+    def get_subject(self, subject_id: str) -> Optional[Dict[str, Any]]:
+        """按 id 读取科目，不存在时返回 None"""
+
+    @abstractmethod
+    def put_subject(self, subject: Dict[str, Any]) -> None:
+        """新增或整体替换科目（按 id，含 levels/chapters/tasks）"""
+
+    @abstractmethod
+    def delete_subject(self, subject_id: str) -> bool:
+        """删除科目，返回是否存在"""
+
+    # 进度
+    @abstractmethod
+    def get_progress(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """读取学生进度，没有记录时返回 None"""
+
+    @abstractmethod
+    def put_progress(self, student_id: str, progress: Dict[str, Any]) -> None:
+        """整体替换学生进度"""
+
+    def put_task_progress(self, student_id: str, subject_id: str, task_id: str,
+                          task: Optional[Dict[str, Any]], total_progress: int) -> None:
+        """只替换单个任务的进度（task 为 None 时删除该任务进度），同时写入科目的 totalProgress"""
+        with self.transaction():
+            progress = self.get_progress(student_id)
+            self.put_progress(student_id, apply_task_progress(progress, student_id, subject_id, task_id,
+                                                              task, total_progress))
+
+    @abstractmethod
+    def iter_progress(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """遍历所有学生的进度 (学生ID, 进度)"""
+
+    @abstractmethod
+    def consume_changes(self) -> Tuple[Optional[Set[str]], Optional[Set[str]], Set[str]]:
+        """返回自上次调用以来其他进程造成的变化：(有变化的学生ID, 有变化的科目ID, 进度有变化的学生ID)
+
+        学生或科目为 None 时表示无法确定具体哪些有变化，调用方应按全部变化处理。
+        """
+
+    def close(self) -> None:
+        pass
+
+
+def apply_task_progress(progress: Optional[Dict[str, Any]], student_id: str, subject_id: str, task_id: str,
+                        task: Optional[Dict[str, Any]], total_progress: int) -> Dict[str, Any]:
+    """返回替换了单个任务进度的新进度对象（不修改传入对象）"""
+    progress = progress or {'studentId': student_id, 'subjects': {}}
+    subject_progress = dict((progress.get('subjects') or {}).get(subject_id) or {})
+    tasks = dict(subject_progress.get('tasks') or {})
+    if task is None:
+        tasks.pop(task_id, None)
+    else:
+        tasks[task_id] = task
+    subject_progress['tasks'] = tasks
+    subject_progress['totalProgress'] = total_progress
+    return {**progress, 'subjects': {**(progress.get('subjects') or {}), subject_id: subject_progress}}
+
+
+class JsonStorage(Storage):
+    """JSON 文件存储：学生、科目各一个文件；进度按学生分片，变更先追加到进度日志"""
+
+    def __init__(self, config: Config):
+        self.config = config
+        # 文件缓存: 路径 -> {'stamp': (mtime, size), 'data': 解析结果, 'index': id索引}
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        # 保护内存缓存的进程内锁；文件读改写使用按文件划分的 FileLock
+        self._lock = threading.RLock()
+        self._file_locks: Dict[str, FileLock] = {}
+        # 当前线程的事务状态（修改过的学生/科目副本与待写入的进度）
+        self._tx = threading.local()
+        # 学生、科目文件从磁盘重新加载时内容有变化的ID（文件路径 -> ID集合），由 consume_changes 取走
+        self._changed_ids: Dict[str, Set[str]] = {}
+        # 被其他进程修改过进度的学生；以及上次检查时的进度目录标记
+        self._stale_progress: Set[str] = set()
+        self._progress_dir_stamp = None
+        # 进度日志：日志中各学生的最新进度（覆盖分片中的快照）与后台 fsync/压缩线程
+        self._journal = ProgressJournal(config.PROGRESS_JOURNAL_FILE, config.JOURNAL_FSYNC_INTERVAL)
+        self._journal_state: Dict[str, Dict[str, Any]] = {}
+        self._journal_worker: Optional[threading.Thread] = None
+        self._ensure_data_dir()
+        self._ensure_files()
+
+    def _ensure_data_dir(self):
+        """确保数据目录存在"""
+        if not os.path.exists(self.config.DATA_DIR):
+            os.makedirs(self.config.DATA_DIR)
+
+    def _ensure_files(self):
+        """确保数据文件存在"""
+        # 如果文件不存在，创建默认数据（加锁后再检查，避免多个进程重复创建）
+        os.makedirs(self.config.PROGRESS_DIR, exist_ok=True)
+        with self._file_lock(self.config.STUDENTS_FILE):
+            if not os.path.exists(self.config.STUDENTS_FILE):
+                self._create_default_students()
+        with self._file_lock(self.config.SUBJECTS_FILE):
+            if not os.path.exists(self.config.SUBJECTS_FILE):
+                self._create_default_subjects()
+        with self._file_lock(self.config.PROGRESS_FILE):
+            if os.path.exists(self.config.PROGRESS_FILE):
+                self._migrate_progress_file()
+
+    def _create_default_students(self):
+        """创建默认学生数据"""
+        default_students = [
+            {
+                "id": "student_001",
+                "name": "张小明",
+                "avatar": "👦",
+                "subjects": ["math", "chinese", "english"],
+                "createdAt": "2024-01-15",
+                "lastUpdate": "2024-01-20",
+                "grade": "一年级",
+                "notes": "学习积极主动，数学基础较好"
+            },
+            {
+                "id": "student_002",
+                "name": "李小红",
+                "avatar": "👧",
+                "subjects": ["math", "chinese", "science"],
+                "createdAt": "2024-01-10",
+                "lastUpdate": "2024-01-18",
+                "grade": "一年级",
+                "notes": "语文表达能力强，喜欢科学实验"
+            },
+            {
+                "id": "student_003",
+                "name": "王大强",
+                "avatar": "👨",
+                "subjects": ["math", "english", "science"],
+                "createdAt": "2024-01-12",
+                "lastUpdate": "2024-01-19",
+                "grade": "一年级",
+                "notes": "动手能力强，逻辑思维清晰"
+            }
+        ]
+        self._write_json(self.config.STUDENTS_FILE, default_students)
+
+    def _create_default_subjects(self):
+        """创建默认科目数据"""
+        default_subjects = [
+            {
+                "id": "math",
+                "name": "数学",
+                "icon": "🧮",
+                "color": "#4285f4",
+                "description": "基础数学概念和运算能力培养",
+                "levels": [
+                    {
+                        "id": "grade_1",
+                        "name": "一年级数学",
+                        "chapters": [
+                            {
+                                "id": "numbers_basic",
+                                "name": "数字认知",
+                                "description": "学习0-100的数字概念",
+                                "tasks": [
+                                    {
+                                        "id": "task_001",
+                                        "name": "认识1-10",
+                                        "type": "concept",
+                                        "steps": [
+                                            "符号灌输：数字1,2,3...的写法和读音",
+                                            "现实意义：用物品数数，理解数量概念",
+                                            "题目训练：数字连线、填空练习",
+                                            "测试：口算测验和应用题"
+                                        ],
+                                        "estimatedTime": 30,
+                                        "difficulty": 1,
+                                        "prerequisites": []
+                                    },
+                                    {
+                                        "id": "task_002",
+                                        "name": "数字比较大小",
+                                        "type": "skill",
+                                        "steps": [
+                                            "符号灌输：大于号>、小于号<、等于号=",
+                                            "现实意义：比较糖果数量、身高体重",
+                                            "题目训练：填空比较、选择题练习",
+                                            "测试：综合比较判断题"
+                                        ],
+                                        "estimatedTime": 25,
+                                        "difficulty": 2,
+                                        "prerequisites": ["task_001"]
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                "id": "chinese",
+                "name": "语文",
+                "icon": "📚",
+                "color": "#34a853",
+                "description": "汉语拼音、汉字认识和阅读理解",
+                "levels": [
+                    {
+                        "id": "grade_1",
+                        "name": "一年级语文",
+                        "chapters": [
+                            {
+                                "id": "pinyin_basic",
+                                "name": "拼音基础",
+                                "description": "学习声母韵母和拼读",
+                                "tasks": [
+                                    {
+                                        "id": "task_001",
+                                        "name": "认识声母",
+                                        "type": "concept",
+                                        "steps": [
+                                            "符号灌输：23个声母的读音和写法",
+                                            "现实意义：结合生活中的词汇记忆",
+                                            "题目训练：声母认读和书写练习",
+                                            "测试：声母默写和发音测试"
+                                        ],
+                                        "estimatedTime": 40,
+                                        "difficulty": 2,
+                                        "prerequisites": []
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                "id": "english",
+                "name": "英语",
+                "icon": "🇺🇸",
+                "color": "#ea4335",
+                "description": "英语字母、单词和简单句型学习",
+                "levels": [
+                    {
+                        "id": "grade_1",
+                        "name": "一年级英语",
+                        "chapters": [
+                            {
+                                "id": "alphabet_basic",
+                                "name": "字母学习",
+                                "description": "认识26个英文字母",
+                                "tasks": [
+                                    {
+                                        "id": "task_001",
+                                        "name": "认识字母A-M",
+                                        "type": "concept",
+                                        "steps": [
+                                            "符号灌输：字母A-M的大小写形式和发音",
+                                            "现实意义：字母在生活中的应用（标识、品牌等）",
+                                            "题目训练：字母描红和发音练习",
+                                            "测试：字母认读和书写测试"
+                                        ],
+                                        "estimatedTime": 35,
+                                        "difficulty": 2,
+                                        "prerequisites": []
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            },
+            {
+                "id": "science",
+                "name": "科学",
+                "icon": "🔬",
+                "color": "#fbbc04",
+                "description": "自然现象观察和科学思维培养",
+                "levels": [
+                    {
+                        "id": "grade_1",
+                        "name": "一年级科学",
+                        "chapters": [
+                            {
+                                "id": "nature_observation",
+                                "name": "自然观察",
+                                "description": "观察身边的自然现象",
+                                "tasks": [
+                                    {
+                                        "id": "task_001",
+                                        "name": "观察植物",
+                                        "type": "concept",
+                                        "steps": [
+                                            "符号灌输：植物的基本部位（根、茎、叶、花、果）",
+                                            "现实意义：观察校园和家周围的植物",
+                                            "题目训练：植物部位标识和分类练习",
+                                            "测试：植物观察记录和部位识别"
+                                        ],
+                                        "estimatedTime": 45,
+                                        "difficulty": 2,
+                                        "prerequisites": []
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
+        self._write_json(self.config.SUBJECTS_FILE, default_subjects)
+
+    def _migrate_progress_file(self):
+        """一次性迁移：把旧版单文件 progress.json 拆分为按学生ID存放的分片"""
+        legacy = self._read_json(self.config.PROGRESS_FILE)
+        for student_id, progress in (legacy if isinstance(legacy, dict) else {}).items():
+            path = self._progress_path(student_id)
+            with self._file_lock(path):
+                if not os.path.exists(path):
+                    self._write_json(path, progress)
+
+        os.replace(self.config.PROGRESS_FILE, self.config.PROGRESS_FILE + '.migrated')
+        logger.info("已将 %s 迁移到 %s", self.config.PROGRESS_FILE, self.config.PROGRESS_DIR)
+
+    def _io_target(self, filepath: str) -> str:
+        """指标中的文件类别"""
+        if filepath == self.config.STUDENTS_FILE:
+            return 'students'
+        if filepath == self.config.SUBJECTS_FILE:
+            return 'subjects'
+        return 'progress' if self._is_progress_shard(filepath) else 'other'
+
+    def _read_json(self, filepath: str) -> Any:
+        """读取JSON文件"""
+        started = time.perf_counter()
+        try:
+            with open(filepath, 'rb') as f:
+                content = f.read()
+            return serialization.loads(content)
+        except (FileNotFoundError, json.JSONDecodeError):
+            content = b''
+            return None
+        finally:
+            observe_storage('read', self._io_target(filepath), len(content), time.perf_counter() - started)
+
+    def _write_json(self, filepath: str, data: Any) -> None:
+        """原子写入JSON文件（同时更新缓存）；读改写时调用方应持有该文件的 FileLock"""
+        is_shard = self._is_progress_shard(filepath)
+        dir_stamp = self._file_stamp(self.config.PROGRESS_DIR) if is_shard else None
+        started = time.perf_counter()
+        try:
+            written = atomic_write_json(filepath, data, pretty=self.config.JSON_PRETTY)
+        except Exception as e:
+            with self._lock:
+                self._cache.pop(filepath, None)
+            raise StorageError(f"写入文件失败: {e}") from e
+        observe_storage('write', self._io_target(filepath), written, time.perf_counter() - started)
+
+        with self._lock:
+            self._set_cache(filepath, data, self._file_stamp(filepath))
+
+            # 自身写入引起的目录变化无需再扫描；写入前已有未察觉的外部变化时保留旧标记
+            if is_shard and self._progress_dir_stamp == dir_stamp:
+                self._progress_dir_stamp = self._file_stamp(self.config.PROGRESS_DIR)
+
+    # 缓存相关方法
+    def _file_stamp(self, filepath: str) -> Optional[Tuple[int, int]]:
+        """获取文件的 (mtime, size) 标记，用于判断缓存是否失效"""
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _set_cache(self, filepath: str, data: Any, stamp: Optional[Tuple[int, int]]) -> Dict[str, Any]:
+        """写入缓存条目，列表数据按id建立索引"""
+        index = None
+        if isinstance(data, list):
+            index = {item['id']: item for item in data if isinstance(item, dict) and 'id' in item}
+        entry = {'stamp': stamp, 'data': data, 'index': index}
+        self._cache[filepath] = entry
+        return entry
+
+    def _load_cached(self, filepath: str, default: Any) -> Dict[str, Any]:
+        """读取缓存条目，仅当文件 mtime/size 变化时重新解析（可感知进程外的修改）"""
+        with self._lock:
+            stamp = self._file_stamp(filepath)
+            entry = self._cache.get(filepath)
+            hit = entry is not None and entry['stamp'] == stamp
+            cache_lookup('file', hit)
+            if not hit:
+                data = self._read_json(filepath)
+                if data is None and entry is not None and stamp is not None:
+                    # 文件存在但无法解析（如被其他程序写坏）时保留上一次成功加载的数据
+                    logger.warning("读取文件失败，继续使用缓存数据: %s", filepath)
+                    return entry
+                entry = self._set_cache(filepath, data if data is not None else default, stamp)
+            return entry
+
+    def _file_lock(self, filepath: str) -> FileLock:
+        """获取某个数据文件的锁（线程间与进程间互斥），每个文件一把"""
+        with self._lock:
+            lock = self._file_locks.get(filepath)
+            if lock is None:
+                lock = self._file_locks[filepath] = FileLock(filepath)
+            return lock
+
+    def _load_list(self, filepath: str) -> Dict[str, Any]:
+        """读取列表型数据文件（学生、科目）的缓存条目；从磁盘重新加载时记录内容有变化的ID"""
+        with self._lock:
+            previous = self._cache.get(filepath)
+            entry = self._load_cached(filepath, [])
+            if entry['index'] is None:
+                # 文件内容不是列表时按空数据处理
+                entry = self._set_cache(filepath, [], entry['stamp'])
+            if entry is not previous:
+                old, new = (previous or {}).get('index') or {}, entry['index']
+                self._changed_ids.setdefault(filepath, set()).update(
+                    item_id for item_id in old.keys() | new.keys() if old.get(item_id) != new.get(item_id))
+            return entry
+
+    # 进度分片
+    def _progress_path(self, student_id: str) -> str:
+        """学生进度分片的文件路径（ID经过转义，避免路径穿越）"""
+        return os.path.join(self.config.PROGRESS_DIR, f"{quote(student_id, safe='')}.json")
+
+    def _progress_student_id(self, filepath: str) -> str:
+        """由分片文件路径还原学生ID"""
+        return unquote(os.path.basename(filepath)[:-len('.json')])
+
+    def _is_progress_shard(self, filepath: str) -> bool:
+        """判断路径是否为进度分片文件"""
+        return os.path.dirname(filepath) == self.config.PROGRESS_DIR and filepath.endswith('.json')
+
+    def _load_progress(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """读取学生的当前进度：日志中有记录时取日志状态，否则取分片快照，不存在时返回 None"""
+        with self._lock:
+            self._sync_journal()
+            if student_id in self._journal_state:
+                return self._journal_state[student_id]
+            return self._load_shard(student_id)
+
+    def _load_shard(self, student_id: str) -> Optional[Dict[str, Any]]:
+        """读取学生的进度分片快照（不含日志中的修改）"""
+        filepath = self._progress_path(student_id)
+        with self._lock:
+            previous = self._cache.get(filepath)
+            # 分片重新加载只影响该学生，不触发计数整体重建
+            entry = self._load_cached(filepath, None)
+            if entry['data'] is not None and not isinstance(entry['data'], dict):
+                entry = self._set_cache(filepath, None, entry['stamp'])
+            if previous is not None and entry is not previous:
+                self._stale_progress.add(student_id)
+            return entry['data']
+
+    def _scan_progress_dir(self) -> None:
+        """进度目录有变化时，找出被进程外修改的分片并标记对应学生"""
+        stamp = self._file_stamp(self.config.PROGRESS_DIR)
+        if stamp == self._progress_dir_stamp:
+            return
+
+        self._progress_dir_stamp = stamp
+        for filepath, entry in list(self._cache.items()):
+            if self._is_progress_shard(filepath) and entry['stamp'] != self._file_stamp(filepath):
+                self._stale_progress.add(self._progress_student_id(filepath))
+
+    # 进度日志
+    def _sync_journal(self) -> None:
+        """读取其他进程追加的日志记录并应用到内存；日志被轮换时丢弃日志状态、改读分片"""
+        with self._lock:
+            rotated, records = self._journal.read_new()
+            if rotated:
+                self._stale_progress.update(self._journal_state)
+                self._journal_state.clear()
+            for record in records:
+                self._apply_journal_record(record)
+                self._stale_progress.add(record['studentId'])
+
+    def _apply_journal_record(self, record: Dict[str, Any]) -> None:
+        """把一条日志记录应用到内存中的进度状态"""
+        student_id = record['studentId']
+        if record.get('op') == 'progress':
+            self._journal_state[student_id] = record['progress']
+        elif record.get('op') == 'task':
+            # 单任务记录叠加在该学生的当前状态（日志状态或分片快照）之上
+            base = self._journal_state[student_id] if student_id in self._journal_state \
+                else self._load_shard(student_id)
+            self._journal_state[student_id] = apply_task_progress(
+                base, student_id, record['subjectId'], record['taskId'], record['task'], record['totalProgress']
+            )
+
+    def _append_journal(self, records: List[Dict[str, Any]]) -> None:
+        """追加进度日志并更新内存状态，代替整份进度文件的重写"""
+        try:
+            with self._journal.lock:
+                with self._lock:
+                    self._sync_journal()
+                    self._journal.append(*records)
+                    for record in records:
+                        self._apply_journal_record(record)
+        except OSError as e:
+            raise StorageError(f"写入进度日志失败: {e}") from e
+
+        self._start_journal_worker()
+
+    def compact_progress_journal(self) -> int:
+        """把日志中的最新进度折叠写入各学生分片并轮换日志，返回写入的学生数"""
+        with self._journal.lock:
+            with self._lock:
+                self._sync_journal()
+                if not self._journal_state and self._journal.size() == 0:
+                    return 0
+                snapshot = dict(self._journal_state)
+
+            # 任一分片写入失败时抛出异常并保留日志，下次再压缩
+            for student_id, progress in snapshot.items():
+                filepath = self._progress_path(student_id)
+                with self._file_lock(filepath):
+                    self._write_json(filepath, progress)
+
+            with self._lock:
+                self._journal.rotate(self.config.PROGRESS_JOURNAL_ARCHIVE_DIR)
+                self._journal_state.clear()
+            return len(snapshot)
+
+    def _start_journal_worker(self) -> None:
+        """按需启动后台线程，负责批量 fsync 与定期压缩日志"""
+        with self._lock:
+            if self._journal_worker is not None and self._journal_worker.is_alive():
+                return
+            self._journal_worker = threading.Thread(target=self._journal_loop, name='progress-journal', daemon=True)
+            self._journal_worker.start()
+
+    def _journal_loop(self) -> None:
+        """后台循环：定期 fsync，按时间或日志大小触发压缩"""
+        interval = self.config.JOURNAL_FSYNC_INTERVAL or 1.0
+        last_compact = time.monotonic()
+        while True:
+            time.sleep(interval)
+            self._journal.fsync()
+            if (time.monotonic() - last_compact >= self.config.JOURNAL_COMPACT_INTERVAL
+                    or self._journal.size() >= self.config.JOURNAL_COMPACT_BYTES):
+                try:
+                    self.compact_progress_journal()
+                except Exception:
+                    logger.exception("压缩进度日志失败")
+                last_compact = time.monotonic()
+
+    # 事务
+    def _tx_state(self) -> Optional[Dict[str, Any]]:
+        return getattr(self._tx, 'state', None)
+
+    @contextmanager
+    def transaction(self):
+        """事务：首次读写学生/科目或进度时才获取对应文件的锁，持有到事务结束；
+        退出时每个文件最多写一次，异常时丢弃全部修改。只读写进度的事务只持有进度日志的锁。
+        """
+        if self._tx_state() is not None:
+            yield
+            return
+
+        state = self._tx.state = {'students': None, 'subjects': None, 'progress': {}, 'records': [], 'locks': []}
+        try:
+            try:
+                yield
+            finally:
+                self._tx.state = None
+            self._commit(state)
+        finally:
+            for lock in reversed(state['locks']):
+                lock.release()
+
+    def _tx_lock(self, state: Dict[str, Any], lock: FileLock) -> None:
+        """事务内首次访问某文件时获取其锁
+
+        按固定顺序（学生 → 科目 → 进度日志）加锁；已持有顺序靠后的锁时最多等待 LOCK_ORDER_TIMEOUT 秒，
+        超时放弃整个事务，避免与按顺序加锁的其他事务互相等待。
+        """
+        if lock in state['locks']:
+            return
+        order = [self._file_lock(self.config.STUDENTS_FILE), self._file_lock(self.config.SUBJECTS_FILE),
+                 self._journal.lock]
+        if any(order.index(held) > order.index(lock) for held in state['locks']):
+            if not lock.acquire(timeout=self.config.LOCK_ORDER_TIMEOUT):
+                raise StorageError(f"等待文件锁超时: {lock.lock_path}")
+        else:
+            lock.acquire()
+        state['locks'].append(lock)
+
+    def _commit(self, state: Dict[str, Any]) -> None:
+        """把事务中的修改写入文件"""
+        if state['students'] is not None:
+            self._write_json(self.config.STUDENTS_FILE, list(state['students'].values()))
+        if state['subjects'] is not None:
+            self._write_json(self.config.SUBJECTS_FILE, list(state['subjects'].values()))
+        if state['records']:
+            self._append_journal(state['records'])
+
+    def _tx_records(self, name: str, filepath: str) -> Dict[str, Dict[str, Any]]:
+        """事务内可修改的学生/科目副本（id -> 对象，保持原有顺序），首次修改时复制"""
+        state = self._tx_state()
+        if state[name] is None:
+            self._tx_lock(state, self._file_lock(filepath))
+            state[name] = dict(self._load_list(filepath)['index'])
+        return state[name]
+
+    def _tx_entry(self, name: str, filepath: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """事务内读取学生/科目：首次读取即加锁，读改写期间其他线程/进程无法修改该文件；
+        已修改过则返回事务内副本，否则返回 None（由调用方读取缓存）"""
+        state = self._tx_state()
+        if state is None:
+            return None
+        self._tx_lock(state, self._file_lock(filepath))
+        return state[name]
+
+    def _list(self, name: str, filepath: str) -> List[Dict[str, Any]]:
+        records = self._tx_entry(name, filepath)
+        if records is not None:
+            return list(records.values())
+        return list(self._load_list(filepath)['data'])
+
+    def _get(self, name: str, filepath: str, item_id: str) -> Optional[Dict[str, Any]]:
+        records = self._tx_entry(name, filepath)
+        if records is not None:
+            return records.get(item_id)
+        return self._load_list(filepath)['index'].get(item_id)
+
+    # 学生
+    def list_students(self) -> List[Dict[str, Any]]:
+        return self._list('students', self.config.STUDENTS_FILE)
+
+    def get_student(self, student_id: str) -> Optional[Dict[str, Any]]:
+        return self._get('students', self.config.STUDENTS_FILE, student_id)
+
+    def put_student(self, student: Dict[str, Any]) -> None:
+        with self.transaction():
+            self._tx_records('students', self.config.STUDENTS_FILE)[student['id']] = student
+
+    def delete_student(self, student_id: str) -> bool:
+        with self.transaction():
+            return self._tx_records('students', self.config.STUDENTS_FILE).pop(student_id, None) is not None
+
+    # 科目
+    def list_subjects(self) -> List[Dict[str, Any]]:
+        return self._list('subjects', self.config.SUBJECTS_FILE)
+
+    def get_subject(self, subject_id: str) -> Optional[Dict[str, Any]]:
+        return self._get('subjects', self.config.SUBJECTS_FILE, subject_id)
+
+    def put_subject(self, subject: Dict[str, Any]) -> None:
+        with self.transaction():
+            self._tx_records('subjects', self.config.SUBJECTS_FILE)[subject['id']] = subject
+
+    def delete_subject(self, subject_id: str) -> bool:
+        with self.transaction():
+            return self._tx_records('subjects', self.config.SUBJECTS_FILE).pop(subject_id, None) is not None
+
+    # 进度
+    def get_progress(self, student_id: str) -> Optional[Dict[str, Any]]:
+        state = self._tx_state()
+        if state is not None:
+            if student_id in state['progress']:
+                return state['progress'][student_id]
+            # 事务内读取的进度在提交前不会被其他进程修改
+            self._tx_lock(state, self._journal.lock)
+        return self._load_progress(student_id)
+
+    def put_progress(self, student_id: str, progress: Dict[str, Any]) -> None:
+        self._put_progress_record(student_id, progress,
+                                  {'op': 'progress', 'studentId': student_id, 'progress': progress})
+
+    def put_task_progress(self, student_id: str, subject_id: str, task_id: str,
+                          task: Optional[Dict[str, Any]], total_progress: int) -> None:
+        # 日志中只记录这一个任务，而不是学生的整份进度
+        record = {'op': 'task', 'studentId': student_id, 'subjectId': subject_id, 'taskId': task_id,
+                  'task': task, 'totalProgress': total_progress}
+        if self._tx_state() is None:
+            self._append_journal([record])
+            return
+        progress = apply_task_progress(self.get_progress(student_id), student_id, subject_id, task_id,
+                                       task, total_progress)
+        self._put_progress_record(student_id, progress, record)
+
+    def _put_progress_record(self, student_id: str, progress: Dict[str, Any], record: Dict[str, Any]) -> None:
+        """事务内暂存进度与日志记录，提交时一起追加；事务外直接追加日志"""
+        state = self._tx_state()
+        if state is not None:
+            self._tx_lock(state, self._journal.lock)
+            state['progress'][student_id] = progress
+            state['records'].append(record)
+        else:
+            self._append_journal([record])
+
+    def iter_progress(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            self._sync_journal()
+            student_ids = set(self._journal_state)
+        for name in os.listdir(self.config.PROGRESS_DIR):
+            path = os.path.join(self.config.PROGRESS_DIR, name)
+            if self._is_progress_shard(path):
+                student_ids.add(self._progress_student_id(path))
+
+        for student_id in sorted(student_ids):
+            progress = self.get_progress(student_id)
+            if progress is not None:
+                yield student_id, progress
+
+    def consume_changes(self) -> Tuple[Optional[Set[str]], Optional[Set[str]], Set[str]]:
+        with self._lock:
+            self._load_list(self.config.STUDENTS_FILE)
+            self._load_list(self.config.SUBJECTS_FILE)
+            self._scan_progress_dir()
+            self._sync_journal()
+
+            students = self._changed_ids.pop(self.config.STUDENTS_FILE, set())
+            subjects = self._changed_ids.pop(self.config.SUBJECTS_FILE, set())
+            stale, self._stale_progress = self._stale_progress, set()
+            return students, subjects, stale
+
+
+class SqliteStorage(Storage):
+    """SQLite 存储：学生、科目层级（年级/章节/任务）与逐任务进度分表存放并建立索引，使用 WAL 模式
+
+    学生与科目在内存中缓存；其他进程的修改通过 change_log 表感知。
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS students (
+            id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            name TEXT,
+            grade TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_students_position ON students(position);
+        CREATE INDEX IF NOT EXISTS idx_students_grade ON students(grade);
+        CREATE TABLE IF NOT EXISTS student_subjects (
+            student_id TEXT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+            subject_id TEXT NOT NULL,
+            PRIMARY KEY (student_id, subject_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_student_subjects_subject ON student_subjects(subject_id);
+        CREATE TABLE IF NOT EXISTS subjects (
+            id TEXT PRIMARY KEY,
+            position INTEGER NOT NULL,
+            name TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS levels (
+            pk INTEGER PRIMARY KEY,
+            subject_id TEXT NOT NULL REFERENCES subjects(id) ON DELETE CASCADE,
+            id TEXT,
+            position INTEGER NOT NULL,
+            name TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_levels_subject ON levels(subject_id, position);
+        CREATE TABLE IF NOT EXISTS chapters (
+            pk INTEGER PRIMARY KEY,
+            level_pk INTEGER NOT NULL REFERENCES levels(pk) ON DELETE CASCADE,
+            subject_id TEXT NOT NULL,
+            id TEXT,
+            position INTEGER NOT NULL,
+            name TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_chapters_level ON chapters(level_pk, position);
+        CREATE INDEX IF NOT EXISTS idx_chapters_subject ON chapters(subject_id, id);
+        CREATE TABLE IF NOT EXISTS tasks (
+            pk INTEGER PRIMARY KEY,
+            chapter_pk INTEGER NOT NULL REFERENCES chapters(pk) ON DELETE CASCADE,
+            subject_id TEXT NOT NULL,
+            id TEXT,
+            position INTEGER NOT NULL,
+            name TEXT,
+            difficulty INTEGER,
+            estimated_time INTEGER,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_chapter ON tasks(chapter_pk, position);
+        CREATE INDEX IF NOT EXISTS idx_tasks_subject ON tasks(subject_id, id);
+        CREATE TABLE IF NOT EXISTS student_progress (
+            student_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS subject_progress (
+            student_id TEXT NOT NULL,
+            subject_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            current_level TEXT,
+            total_progress INTEGER,
+            data TEXT NOT NULL,
+            PRIMARY KEY (student_id, subject_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_subject_progress_subject ON subject_progress(subject_id);
+        CREATE TABLE IF NOT EXISTS task_progress (
+            student_id TEXT NOT NULL,
+            subject_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            status TEXT,
+            started_at TEXT,
+            completed_at TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (student_id, subject_id, task_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_task_progress_task ON task_progress(subject_id, task_id, status);
+        CREATE INDEX IF NOT EXISTS idx_task_progress_completed ON task_progress(completed_at);
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            writer TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            entity_id TEXT NOT NULL
+        );
+    '''
+
+    # change_log 保留的最近记录数
+    CHANGE_LOG_KEEP = 10000
+
+    def __init__(self, config: Config, path: Optional[str] = None, auto_import: bool = True):
+        self.config = config
+        self.path = path or config.SQLITE_PATH
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        # 区分本实例写入的 change_log 记录
+        self._writer_id = uuid.uuid4().hex
+        self._students: Optional[Dict[str, Dict[str, Any]]] = None
+        self._subjects: Optional[Dict[str, Dict[str, Any]]] = None
+        # 其他连接修改过的学生、科目ID；None 表示无法确定（全部视为已修改）
+        self._changed_students: Optional[Set[str]] = None
+        self._changed_subjects: Optional[Set[str]] = None
+        self._stale_progress: Set[str] = set()
+
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        self._last_seq = conn.execute('SELECT IFNULL(MAX(seq), 0) FROM change_log').fetchone()[0]
+        if auto_import:
+            self._ensure_initialized()
+
+    def _conn(self) -> sqlite3.Connection:
+        """当前线程的数据库连接（每个线程一个）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.data_version = None
+            self._local.tx = None
+        return conn
+
+    def _ensure_initialized(self) -> None:
+        """新数据库首次使用时导入现有 data/*.json（文件不存在时为默认数据）"""
+        with self.transaction():
+            if self._conn().execute("SELECT value FROM meta WHERE key = 'initialized'").fetchone():
+                return
+            counts = copy_storage(JsonStorage(self.config), self)
+            self._conn().execute("INSERT INTO meta (key, value) VALUES ('initialized', ?)",
+                                 (time.strftime('%Y-%m-%dT%H:%M:%S'),))
+        logger.info("已从 JSON 数据初始化 SQLite 数据库 %s: %s", self.path, counts)
+
+    def _refresh(self) -> None:
+        """其他连接提交过修改时读取 change_log，使对应缓存失效"""
+        conn = self._conn()
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._local.data_version:
+            return
+        self._local.data_version = version
+
+        with self._lock:
+            min_seq = conn.execute('SELECT MIN(seq) FROM change_log').fetchone()[0]
+            if min_seq is not None and self._last_seq and min_seq > self._last_seq + 1:
+                # 落后太多，所需的变更记录已被清理，整体失效
+                self._students = self._subjects = None
+                self._changed_students = self._changed_subjects = None
+
+            rows = conn.execute('SELECT seq, writer, kind, entity_id FROM change_log WHERE seq > ? ORDER BY seq',
+                                (self._last_seq,)).fetchall()
+            for seq, writer, kind, entity_id in rows:
+                self._last_seq = seq
+                if writer == self._writer_id:
+                    continue
+                if kind == 'progress':
+                    self._stale_progress.add(entity_id)
+                elif kind == 'student':
+                    self._students = None
+                    if self._changed_students is not None:
+                        self._changed_students.add(entity_id)
+                elif kind == 'subject':
+                    self._subjects = None
+                    if self._changed_subjects is not None:
+                        self._changed_subjects.add(entity_id)
+
+    # 事务
+    def _tx_state(self) -> Optional[Dict[str, Any]]:
+        self._conn()
+        return self._local.tx
+
+    @contextmanager
+    def transaction(self):
+        """BEGIN IMMEDIATE 事务；提交后才更新内存缓存，异常时回滚"""
+        if self._tx_state() is not None:
+            yield
+            return
+
+        conn = self._conn()
+        started = time.perf_counter()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            raise StorageError(f"开始事务失败: {e}") from e
+        self._refresh()
+        state = self._local.tx = {'students': None, 'subjects': None, 'changes': []}
+        try:
+            yield
+            if state['changes']:
+                conn.executemany('INSERT INTO change_log (writer, kind, entity_id) VALUES (?, ?, ?)',
+                                 [(self._writer_id, kind, entity_id) for kind, entity_id in state['changes']])
+                seq = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                if seq % 1000 == 0:
+                    conn.execute('DELETE FROM change_log WHERE seq <= ?', (seq - self.CHANGE_LOG_KEEP,))
+            conn.execute('COMMIT')
+            observe_storage('transaction', 'sqlite', 0, time.perf_counter() - started)
+        except BaseException as e:
+            conn.execute('ROLLBACK')
+            if isinstance(e, sqlite3.Error):
+                raise StorageError(f"数据库写入失败: {e}") from e
+            raise
+        finally:
+            self._local.tx = None
+
+        with self._lock:
+            if state['students'] is not None:
+                self._students = state['students']
+            if state['subjects'] is not None:
+                self._subjects = state['subjects']
+
+    def _tx_records(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """事务内可修改的学生/科目缓存副本"""
+        state = self._tx_state()
+        if state[name] is None:
+            state[name] = dict(self._load_students() if name == 'students' else self._load_subjects())
+        return state[name]
+
+    def _records(self, name: str) -> Dict[str, Dict[str, Any]]:
+        state = self._tx_state()
+        if state is not None and state[name] is not None:
+            return state[name]
+        return self._load_students() if name == 'students' else self._load_subjects()
+
+    # 学生
+    def _load_students(self) -> Dict[str, Dict[str, Any]]:
+        self._refresh()
+        with self._lock:
+            if self._students is None:
+                rows = self._conn().execute('SELECT id, data FROM students ORDER BY position').fetchall()
+                self._students = {student_id: serialization.loads(data) for student_id, data in rows}
+            return self._students
+
+    def list_students(self) -> List[Dict[str, Any]]:
+        return list(self._records('students').values())
+
+    def get_student(self, student_id: str) -> Optional[Dict[str, Any]]:
+        return self._records('students').get(student_id)
+
+    def put_student(self, student: Dict[str, Any]) -> None:
+        with self.transaction():
+            conn = self._conn()
+            records = self._tx_records('students')
+            data = serialization.dumps_text(student)
+            if student['id'] in records:
+                conn.execute('UPDATE students SET name = ?, grade = ?, data = ? WHERE id = ?',
+                             (student.get('name'), student.get('grade'), data, student['id']))
+            else:
+                conn.execute('INSERT INTO students (id, position, name, grade, data) '
+                             'VALUES (?, (SELECT IFNULL(MAX(position), 0) + 1 FROM students), ?, ?, ?)',
+                             (student['id'], student.get('name'), student.get('grade'), data))
+            conn.execute('DELETE FROM student_subjects WHERE student_id = ?', (student['id'],))
+            conn.executemany('INSERT OR IGNORE INTO student_subjects (student_id, subject_id) VALUES (?, ?)',
+                             [(student['id'], subject_id) for subject_id in student.get('subjects', [])])
+            records[student['id']] = student
+            self._tx_state()['changes'].append(('student', student['id']))
+
+    def delete_student(self, student_id: str) -> bool:
+        with self.transaction():
+            records = self._tx_records('students')
+            if records.pop(student_id, None) is None:
+                return False
+            self._conn().execute('DELETE FROM students WHERE id = ?', (student_id,))
+            self._tx_state()['changes'].append(('student', student_id))
+            return True
+
+    # 科目
+    def _load_subjects(self) -> Dict[str, Dict[str, Any]]:
+        self._refresh()
+        with self._lock:
+            if self._subjects is None:
+                self._subjects = self._read_subjects()
+            return self._subjects
+
+    def _read_subjects(self) -> Dict[str, Dict[str, Any]]:
+        """从分表中组装完整的科目树"""
+        conn = self._conn()
+        subjects = {}
+        for subject_id, data in conn.execute('SELECT id, data FROM subjects ORDER BY position'):
+            subjects[subject_id] = {**serialization.loads(data), 'levels': []}
+
+        levels = {}
+        for pk, subject_id, data in conn.execute('SELECT pk, subject_id, data FROM levels ORDER BY subject_id, position'):
+            levels[pk] = {**serialization.loads(data), 'chapters': []}
+            subjects[subject_id]['levels'].append(levels[pk])
+
+        chapters = {}
+        for pk, level_pk, data in conn.execute('SELECT pk, level_pk, data FROM chapters ORDER BY level_pk, position'):
+            chapters[pk] = {**serialization.loads(data), 'tasks': []}
+            levels[level_pk]['chapters'].append(chapters[pk])
+
+        for chapter_pk, data in conn.execute('SELECT chapter_pk, data FROM tasks ORDER BY chapter_pk, position'):
+            chapters[chapter_pk]['tasks'].append(serialization.loads(data))
+
+        return subjects
+
+    def list_subjects(self) -> List[Dict[str, Any]]:
+        return list(self._records('subjects').values())
+
+    def get_subject(self, subject_id: str) -> Optional[Dict[str, Any]]:
+        return self._records('subjects').get(subject_id)
+
+    def put_subject(self, subject: Dict[str, Any]) -> None:
+        """写入科目；已有科目只更新变化的年级/章节/任务行（按ID比对，未变化的对象直接跳过）"""
+        with self.transaction():
+            conn = self._conn()
+            records = self._tx_records('subjects')
+            subject_id = subject['id']
+            old = records.get(subject_id)
+            data = serialization.dumps_text(_without(subject, 'levels'))
+            if old is not None:
+                if _without(old, 'levels') != _without(subject, 'levels'):
+                    conn.execute('UPDATE subjects SET name = ?, data = ? WHERE id = ?',
+                                 (subject.get('name'), data, subject_id))
+                if not self._update_subject_tree(conn, subject_id, old, subject):
+                    conn.execute('DELETE FROM levels WHERE subject_id = ?', (subject_id,))
+                    self._insert_levels(conn, subject_id, subject.get('levels') or [])
+            else:
+                conn.execute('INSERT INTO subjects (id, position, name, data) '
+                             'VALUES (?, (SELECT IFNULL(MAX(position), 0) + 1 FROM subjects), ?, ?)',
+                             (subject_id, subject.get('name'), data))
+                self._insert_levels(conn, subject_id, subject.get('levels') or [])
+
+            records[subject_id] = subject
+            self._tx_state()['changes'].append(('subject', subject_id))
+
+    @staticmethod
+    def _insert_level(conn: sqlite3.Connection, subject_id: str, position: int, level: Dict[str, Any]) -> int:
+        return conn.execute(
+            'INSERT INTO levels (subject_id, id, position, name, data) VALUES (?, ?, ?, ?, ?)',
+            (subject_id, level.get('id'), position, level.get('name'),
+             serialization.dumps_text(_without(level, 'chapters')))
+        ).lastrowid
+
+    @staticmethod
+    def _insert_chapter(conn: sqlite3.Connection, subject_id: str, level_pk: int, position: int,
+                        chapter: Dict[str, Any]) -> int:
+        return conn.execute(
+            'INSERT INTO chapters (level_pk, subject_id, id, position, name, data) VALUES (?, ?, ?, ?, ?, ?)',
+            (level_pk, subject_id, chapter.get('id'), position, chapter.get('name'),
+             serialization.dumps_text(_without(chapter, 'tasks')))
+        ).lastrowid
+
+    @staticmethod
+    def _task_row(task: Dict[str, Any]) -> Tuple[Any, ...]:
+        return (task.get('name'), task.get('difficulty'), task.get('estimatedTime'), serialization.dumps_text(task))
+
+    def _insert_tasks(self, conn: sqlite3.Connection, subject_id: str, chapter_pk: int,
+                      tasks: List[Dict[str, Any]]) -> None:
+        conn.executemany(
+            'INSERT INTO tasks (chapter_pk, subject_id, id, position, name, difficulty, estimated_time, data) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(chapter_pk, subject_id, task.get('id'), task_pos) + self._task_row(task)
+             for task_pos, task in enumerate(tasks)]
+        )
+
+    def _insert_levels(self, conn: sqlite3.Connection, subject_id: str, levels: List[Dict[str, Any]]) -> None:
+        for level_pos, level in enumerate(levels):
+            level_pk = self._insert_level(conn, subject_id, level_pos, level)
+            for chapter_pos, chapter in enumerate(level.get('chapters') or []):
+                chapter_pk = self._insert_chapter(conn, subject_id, level_pk, chapter_pos, chapter)
+                self._insert_tasks(conn, subject_id, chapter_pk, chapter.get('tasks') or [])
+
+    def _update_subject_tree(self, conn: sqlite3.Connection, subject_id: str,
+                             old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+        """按年级/章节/任务ID比对新旧科目树，只写入新增、删除、修改或移动过的行
+
+        未变化的节点（同一对象或内容相等）不产生写入，修改一个任务只更新一行。
+        ID 缺失或重复时无法逐行对应，返回 False，由调用方整体重写。
+        """
+        old_levels = _nodes_by_id(old.get('levels'))
+        new_levels = _nodes_by_id(new.get('levels'))
+        old_chapters = _nodes_by_id(c for level in old.get('levels') or [] for c in level.get('chapters') or [])
+        new_chapters = _nodes_by_id(c for level in new.get('levels') or [] for c in level.get('chapters') or [])
+        if old_levels is None or new_levels is None or old_chapters is None or new_chapters is None:
+            return False
+        old_positions = {level.get('id'): position for position, level in enumerate(old.get('levels') or [])}
+        level_pks = dict(conn.execute('SELECT id, pk FROM levels WHERE subject_id = ?', (subject_id,)).fetchall())
+        chapter_rows = {chapter_id: (pk, level_pk, position) for pk, chapter_id, level_pk, position in conn.execute(
+            'SELECT pk, id, level_pk, position FROM chapters WHERE subject_id = ?', (subject_id,))}
+        if set(level_pks) != set(old_levels) or set(chapter_rows) != set(old_chapters):
+            return False
+
+        # 内容有变化的章节：其中的任务需要逐个比对（任务可能在这些章节之间移动）
+        changed = [(chapter_id, chapter) for chapter_id, chapter in new_chapters.items()
+                   if chapter_id not in old_chapters or not _same_children(old_chapters[chapter_id], chapter, 'tasks')]
+        old_task_ids = [task.get('id') for chapter_id, _ in changed if chapter_id in old_chapters
+                        for task in old_chapters[chapter_id].get('tasks') or []]
+        new_task_ids = [task.get('id') for _, chapter in changed for task in chapter.get('tasks') or []]
+        if None in old_task_ids or None in new_task_ids or len(set(new_task_ids)) != len(new_task_ids):
+            return False
+        task_rows = {}
+        for chapter_id, _ in changed:
+            if chapter_id in chapter_rows:
+                for pk, task_id, chapter_pk, position, data in conn.execute(
+                        'SELECT pk, id, chapter_pk, position, data FROM tasks WHERE chapter_pk = ?',
+                        (chapter_rows[chapter_id][0],)):
+                    task_rows[task_id] = (pk, chapter_pk, position, data)
+
+        for level_pos, level in enumerate(new.get('levels') or []):
+            level_id = level.get('id')
+            if level_id not in level_pks:
+                level_pk = level_pks[level_id] = self._insert_level(conn, subject_id, level_pos, level)
+            else:
+                level_pk = level_pks[level_id]
+                if old_positions[level_id] != level_pos or \
+                        _without(old_levels[level_id], 'chapters') != _without(level, 'chapters'):
+                    conn.execute('UPDATE levels SET position = ?, name = ?, data = ? WHERE pk = ?',
+                                 (level_pos, level.get('name'),
+                                  serialization.dumps_text(_without(level, 'chapters')), level_pk))
+            for chapter_pos, chapter in enumerate(level.get('chapters') or []):
+                chapter_id = chapter.get('id')
+                if chapter_id not in chapter_rows:
+                    chapter_pk = self._insert_chapter(conn, subject_id, level_pk, chapter_pos, chapter)
+                    chapter_rows[chapter_id] = (chapter_pk, level_pk, chapter_pos)
+                    continue
+                chapter_pk, old_level_pk, old_pos = chapter_rows[chapter_id]
+                if (old_level_pk, old_pos) != (level_pk, chapter_pos) or \
+                        _without(old_chapters[chapter_id], 'tasks') != _without(chapter, 'tasks'):
+                    conn.execute('UPDATE chapters SET level_pk = ?, position = ?, name = ?, data = ? WHERE pk = ?',
+                                 (level_pk, chapter_pos, chapter.get('name'),
+                                  serialization.dumps_text(_without(chapter, 'tasks')), chapter_pk))
+
+        for chapter_id, chapter in changed:
+            chapter_pk = chapter_rows[chapter_id][0]
+            for task_pos, task in enumerate(chapter.get('tasks') or []):
+                row = task_rows.get(task.get('id'))
+                if row is None:
+                    conn.execute(
+                        'INSERT INTO tasks (chapter_pk, subject_id, id, position, name, difficulty, estimated_time, data) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (chapter_pk, subject_id, task.get('id'), task_pos) + self._task_row(task))
+                    continue
+                values = self._task_row(task)
+                if (row[1], row[2], row[3]) != (chapter_pk, task_pos, values[-1]):
+                    conn.execute('UPDATE tasks SET chapter_pk = ?, position = ?, name = ?, difficulty = ?, '
+                                 'estimated_time = ?, data = ? WHERE pk = ?',
+                                 (chapter_pk, task_pos) + values + (row[0],))
+        removed_tasks = set(task_rows) - set(new_task_ids)
+        conn.executemany('DELETE FROM tasks WHERE pk = ?', [(task_rows[task_id][0],) for task_id in removed_tasks])
+
+        # 章节先移动再删除年级，避免移出的章节被级联删除
+        conn.executemany('DELETE FROM chapters WHERE pk = ?',
+                         [(chapter_rows[chapter_id][0],) for chapter_id in set(old_chapters) - set(new_chapters)])
+        conn.executemany('DELETE FROM levels WHERE pk = ?',
+                         [(level_pks[level_id],) for level_id in set(old_levels) - set(new_levels)])
+        return True
+
+    def delete_subject(self, subject_id: str) -> bool:
+        with self.transaction():
+            records = self._tx_records('subjects')
+            if records.pop(subject_id, None) is None:
+                return False
+            self._conn().execute('DELETE FROM subjects WHERE id = ?', (subject_id,))
+            self._tx_state()['changes'].append(('subject', subject_id))
+            return True
+
+    # 进度
+    def get_progress(self, student_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute('SELECT data FROM student_progress WHERE student_id = ?', (student_id,)).fetchone()
+        if row is None:
+            return None
+
+        progress = {**serialization.loads(row[0]), 'subjects': {}}
+        for subject_id, data in conn.execute(
+                'SELECT subject_id, data FROM subject_progress WHERE student_id = ? ORDER BY position', (student_id,)):
+            progress['subjects'][subject_id] = {**serialization.loads(data), 'tasks': {}}
+        for subject_id, task_id, data in conn.execute(
+                'SELECT subject_id, task_id, data FROM task_progress WHERE student_id = ? ORDER BY position',
+                (student_id,)):
+            subject_progress = progress['subjects'].setdefault(subject_id, {'tasks': {}})
+            subject_progress['tasks'][task_id] = serialization.loads(data)
+        return progress
+
+    def put_progress(self, student_id: str, progress: Dict[str, Any]) -> None:
+        with self.transaction():
+            conn = self._conn()
+            for table in ('student_progress', 'subject_progress', 'task_progress'):
+                conn.execute(f'DELETE FROM {table} WHERE student_id = ?', (student_id,))
+
+            conn.execute('INSERT INTO student_progress (student_id, data) VALUES (?, ?)',
+                         (student_id, serialization.dumps_text({k: v for k, v in progress.items() if k != 'subjects'})))
+            task_rows = []
+            for subject_pos, (subject_id, subject_data) in enumerate((progress.get('subjects') or {}).items()):
+                subject_data = subject_data or {}
+                conn.execute(
+                    'INSERT INTO subject_progress (student_id, subject_id, position, current_level, total_progress, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (student_id, subject_id, subject_pos, subject_data.get('currentLevel'),
+                     subject_data.get('totalProgress'),
+                     serialization.dumps_text({k: v for k, v in subject_data.items() if k != 'tasks'}))
+                )
+                for task_pos, (task_id, task) in enumerate((subject_data.get('tasks') or {}).items()):
+                    task = task or {}
+                    task_rows.append((student_id, subject_id, task_id, task_pos, task.get('status'),
+                                      task.get('startedAt'), task.get('completedAt'),
+                                      serialization.dumps_text(task)))
+            conn.executemany(
+                'INSERT INTO task_progress (student_id, subject_id, task_id, position, status, started_at, '
+                'completed_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', task_rows
+            )
+            self._tx_state()['changes'].append(('progress', student_id))
+
+    def put_task_progress(self, student_id: str, subject_id: str, task_id: str,
+                          task: Optional[Dict[str, Any]], total_progress: int) -> None:
+        with self.transaction():
+            conn = self._conn()
+            conn.execute('INSERT OR IGNORE INTO student_progress (student_id, data) VALUES (?, ?)',
+                         (student_id, serialization.dumps_text({'studentId': student_id})))
+
+            row = conn.execute('SELECT data FROM subject_progress WHERE student_id = ? AND subject_id = ?',
+                               (student_id, subject_id)).fetchone()
+            subject_data = {**(serialization.loads(row[0]) if row else {}), 'totalProgress': total_progress}
+            if row:
+                conn.execute('UPDATE subject_progress SET total_progress = ?, data = ? '
+                             'WHERE student_id = ? AND subject_id = ?',
+                             (total_progress, serialization.dumps_text(subject_data), student_id, subject_id))
+            else:
+                conn.execute(
+                    'INSERT INTO subject_progress (student_id, subject_id, position, current_level, total_progress, data) '
+                    'SELECT ?, ?, IFNULL(MAX(position) + 1, 0), NULL, ?, ? FROM subject_progress WHERE student_id = ?',
+                    (student_id, subject_id, total_progress, serialization.dumps_text(subject_data), student_id)
+                )
+
+            if task is None:
+                conn.execute('DELETE FROM task_progress WHERE student_id = ? AND subject_id = ? AND task_id = ?',
+                             (student_id, subject_id, task_id))
+            else:
+                values = (task.get('status'), task.get('startedAt'), task.get('completedAt'),
+                          serialization.dumps_text(task), student_id, subject_id, task_id)
+                updated = conn.execute(
+                    'UPDATE task_progress SET status = ?, started_at = ?, completed_at = ?, data = ? '
+                    'WHERE student_id = ? AND subject_id = ? AND task_id = ?', values
+                ).rowcount
+                if not updated:
+                    # 新任务排在该科目已有任务之后，保持与 JSON 进度相同的顺序
+                    conn.execute(
+                        'INSERT INTO task_progress (status, started_at, completed_at, data, student_id, subject_id, '
+                        'task_id, position) SELECT ?, ?, ?, ?, ?, ?, ?, IFNULL(MAX(position) + 1, 0) '
+                        'FROM task_progress WHERE student_id = ? AND subject_id = ?',
+                        values + (student_id, subject_id)
+                    )
+            self._tx_state()['changes'].append(('progress', student_id))
+
+    def iter_progress(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        student_ids = [row[0] for row in self._conn().execute(
+            'SELECT student_id FROM student_progress ORDER BY student_id')]
+        for student_id in student_ids:
+            progress = self.get_progress(student_id)
+            if progress is not None:
+                yield student_id, progress
+
+    def consume_changes(self) -> Tuple[Optional[Set[str]], Optional[Set[str]], Set[str]]:
+        self._refresh()
+        with self._lock:
+            students, self._changed_students = self._changed_students, set()
+            subjects, self._changed_subjects = self._changed_subjects, set()
+            stale, self._stale_progress = self._stale_progress, set()
+            return students, subjects, stale
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _without(node: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """去掉子节点列表后的节点字段"""
+    return {k: v for k, v in node.items() if k != key}
+
+
+def _nodes_by_id(nodes: Optional[Iterable[Dict[str, Any]]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """ID -> 节点；有节点缺少ID或ID重复时返回 None"""
+    result = {}
+    for node in nodes or []:
+        node_id = node.get('id')
+        if node_id is None or node_id in result:
+            return None
+        result[node_id] = node
+    return result
+
+
+def _same_children(old: Dict[str, Any], new: Dict[str, Any], key: str) -> bool:
+    """子节点列表是否未变：同一列表对象，或逐项为同一对象/内容相等"""
+    old_children, new_children = old.get(key) or [], new.get(key) or []
+    if old_children is new_children:
+        return True
+    return len(old_children) == len(new_children) and all(
+        a is b or a == b for a, b in zip(old_children, new_children))
+
+
+def copy_storage(source: Storage, target: Storage) -> Dict[str, int]:
+    """把 source 中的全部数据在一个事务内写入 target，返回各类数据的条数"""
+    counts = {'subjects': 0, 'students': 0, 'progress': 0}
+    with target.transaction():
+        for subject in source.list_subjects():
+            target.put_subject(subject)
+            counts['subjects'] += 1
+        for student in source.list_students():
+            target.put_student(student)
+            counts['students'] += 1
+        for student_id, progress in source.iter_progress():
+            target.put_progress(student_id, progress)
+            counts['progress'] += 1
+    return counts
+
+
+def create_storage(config: Config) -> Storage:
+    """按 Config.STORAGE_BACKEND 创建存储实现"""
+    if config.STORAGE_BACKEND == 'sqlite':
+        return SqliteStorage(config)
+    if config.STORAGE_BACKEND == 'json':
+        return JsonStorage(config)
+    raise ValueError(f"未知的存储后端: {config.STORAGE_BACKEND}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='把 data/*.json 中的数据导入 SQLite 数据库')
+    parser.add_argument('command', choices=['import-json'])
+    parser.add_argument('--sqlite', default=Config.SQLITE_PATH, help='SQLite 数据库路径')
+    args = parser.parse_args()
+
+    config = Config()
+    # 重复执行时以 JSON 数据覆盖数据库中的同ID记录
+    target = SqliteStorage(config, args.sqlite, auto_import=False)
+    with target.transaction():
+        counts = copy_storage(JsonStorage(config), target)
+        target._conn().execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('initialized', ?)",
+                               (time.strftime('%Y-%m-%dT%H:%M:%S'),))
+    print(f"导入完成: {counts}")
@@ -0,0 +1,103 @@
+import copy
+import os
+import tempfile
+from datetime import datetime
+
+# 导入 models 时会按 Config 创建全局 DataManager：先指向临时目录，避免改动仓库里的 data/
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='education-test-'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+import pytest
+
+import api as api_module
+from app import create_app
+from config import Config
+from models import DataManager
+from storage import create_storage
+
+SUBJECT = {
+    'id': 'math',
+    'name': '数学',
+    'icon': '🔢',
+    'color': '#4CAF50',
+    'description': '测试科目',
+    'levels': [{
+        'id': 'math_level_1',
+        'name': '一年级',
+        'description': '',
+        'chapters': [{
+            'id': 'math_chapter_1',
+            'name': '第1章',
+            'description': '',
+            'tasks': [
+                {'id': 'math_task_1', 'name': '加法', 'description': '', 'steps': ['读题', '计算'],
+                 'estimatedTime': 20, 'difficulty': 1, 'prerequisites': []},
+                {'id': 'math_task_2', 'name': '减法', 'description': '', 'steps': ['读题'],
+                 'estimatedTime': 30, 'difficulty': 2, 'prerequisites': ['math_task_1']},
+            ]
+        }]
+    }]
+}
+
+STUDENT = {'id': 'student_001', 'name': '小明', 'grade': '一年级', 'subjects': ['math']}
+
+
+class StrictDatetime(datetime):
+    """模拟 Python 3.11 之前的 fromisoformat：不接受结尾的 Z"""
+
+    @classmethod
+    def fromisoformat(cls, value):
+        if value.endswith(('Z', 'z')):
+            raise ValueError(f'Invalid isoformat string: {value!r}')
+        return super().fromisoformat(value)
+
+
+def make_config(data_dir: str, backend: str = 'json') -> type:
+    """指向 data_dir 的配置（各路径都需要重新计算）"""
+    class TestConfig(Config):
+        DATA_DIR = data_dir
+        STORAGE_BACKEND = backend
+        SQLITE_PATH = os.path.join(data_dir, 'education.db')
+        STUDENTS_FILE = os.path.join(data_dir, 'students.json')
+        SUBJECTS_FILE = os.path.join(data_dir, 'subjects.json')
+        PROGRESS_DIR = os.path.join(data_dir, 'progress')
+        PROGRESS_FILE = os.path.join(data_dir, 'progress.json')
+        PROGRESS_JOURNAL_FILE = os.path.join(data_dir, 'progress_journal.ndjson')
+        PROGRESS_JOURNAL_ARCHIVE_DIR = os.path.join(data_dir, 'journal_archive')
+        JOURNAL_FSYNC_INTERVAL = 0
+        # 测试中只手动压缩日志
+        JOURNAL_COMPACT_INTERVAL = 3600
+    return TestConfig
+
+
+@pytest.fixture
+def config(tmp_path):
+    """空数据目录（不生成默认学生与科目）"""
+    data_dir = str(tmp_path)
+    for name in ('students.json', 'subjects.json'):
+        with open(os.path.join(data_dir, name), 'w', encoding='utf-8') as f:
+            f.write('[]')
+    return make_config(data_dir)
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def storage(request, config):
+    config.STORAGE_BACKEND = request.param
+    backend = create_storage(config)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def manager(config):
+    """含一个科目、一个学生的 DataManager（JSON 存储）"""
+    data_manager = DataManager(create_storage(config))
+    assert data_manager.add_subject(copy.deepcopy(SUBJECT))
+    assert data_manager.add_student(copy.deepcopy(STUDENT))
+    return data_manager
+
+
+@pytest.fixture
+def client(manager, monkeypatch):
+    monkeypatch.setattr(api_module, 'data_manager', manager)
+    return create_app().test_client()
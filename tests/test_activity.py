@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import activity
+from activity import parse_time, progress_events
+from conftest import StrictDatetime
+
+
+@pytest.fixture(params=['native', 'pre-3.11'])
+def fromisoformat(request, monkeypatch):
+    if request.param == 'pre-3.11':
+        monkeypatch.setattr(activity, 'datetime', StrictDatetime)
+
+
+def test_parse_time_accepts_z_suffix(fromisoformat):
+    expected = datetime(2026, 3, 1, 8, 30, 15, 250000, tzinfo=timezone.utc).timestamp()
+    assert parse_time('2026-03-01T08:30:15.250Z') == expected
+    assert parse_time('2026-03-01T08:30:15.250z') == expected
+    assert parse_time('2026-03-01T08:30:15.250+00:00') == expected
+    assert parse_time('2026-03-01T16:30:15.250+08:00') == expected
+    # 没有时区的按 UTC
+    assert parse_time('2026-03-01T08:30:15.250') == expected
+    for value in (None, '', 'Z', 'yesterday', 42):
+        assert parse_time(value) is None
+
+
+def test_progress_events_from_stored_timestamps(fromisoformat):
+    progress = {'subjects': {'math': {'tasks': {'t1': {
+        'status': 'completed',
+        'startedAt': '2026-03-01T08:00:00.000Z',
+        'completedAt': '2026-03-01T08:45:00.000Z',
+        'stepProgress': [{'completed': True, 'completedAt': '2026-03-01T08:20:00.000Z'},
+                         {'completed': True, 'skipped': True, 'completedAt': '2026-03-01T08:45:00.000Z'}]
+    }}}}}
+    events = progress_events('s1', progress)
+    assert [(event[4], event[5]) for event in events] == [
+        ('taskStarted', -1), ('stepCompleted', 0), ('stepCompleted', 1), ('taskCompleted', -1)]
+    assert events[-1][0] - events[0][0] == 45 * 60
+
+
+def test_activity_endpoints_after_task_progress(client, monkeypatch):
+    # 服务端写入的时间也以 Z 结尾
+    monkeypatch.setattr(activity, 'datetime', StrictDatetime)
+    url = '/api/students/student_001/subjects/math/tasks/math_task_1'
+    client.patch(url, json={'action': 'complete', 'step': 0})
+    client.patch(url, json={'action': 'complete', 'step': 1})
+
+    items = client.get('/api/activity/recent?type=taskStarted,stepCompleted,taskCompleted').get_json()['items']
+    assert [item['type'] for item in items][:1] == ['taskCompleted']
+    assert {item['type'] for item in items} == {'taskStarted', 'stepCompleted', 'taskCompleted'}
+    assert all(item['time'].endswith('Z') for item in items)
+
+    summary = client.get('/api/activity/summary?tz=Z').get_json()
+    assert summary['totals'] == {'taskCompletions': 1, 'stepCompletions': 2, 'minutes': 20}
+
+    dashboard = client.get('/api/students/student_001/dashboard').get_json()
+    assert [item['taskId'] for item in dashboard['recentActivity']] == ['math_task_1']
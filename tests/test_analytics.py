@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+import activity
+import analytics
+from analytics import COMPLETED, IN_PROGRESS, CohortColumns, cohort_report, subject_entries
+from conftest import StrictDatetime
+from indexes import SubjectIndex
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    if request.param == 'numpy':
+        if analytics.np is None:
+            pytest.skip('numpy 未安装')
+    else:
+        monkeypatch.setattr(analytics, 'np', None)
+    # 同时模拟 Python 3.11 之前不接受 Z 的 fromisoformat
+    monkeypatch.setattr(activity, 'datetime', StrictDatetime)
+    return request.param
+
+
+def _task(status, started, completed=None):
+    task = {'status': status, 'currentStep': 0, 'startedAt': started, 'stepProgress': []}
+    if completed:
+        task['completedAt'] = completed
+    return task
+
+
+def test_subject_entries_minutes_from_stored_timestamps(engine):
+    entries = subject_entries({'tasks': {
+        'a': _task('completed', '2026-03-01T08:00:00.000Z', '2026-03-01T08:45:30.000Z'),
+        'b': _task('in_progress', '2026-03-01T09:00:00.000Z'),
+        'c': _task('completed', '2026-03-01T10:00:00.000Z', '2026-03-01T09:00:00.000Z'),  # 完成早于开始
+        'd': None,
+    }})
+    assert entries == (('a', COMPLETED, 45.5), ('b', IN_PROGRESS, None), ('c', COMPLETED, None))
+
+
+def test_subject_analytics_durations(engine, client, manager):
+    assert manager.add_student({'id': 'student_002', 'name': '小红', 'subjects': ['math']})
+    manager.save_student_progress('student_001', {'studentId': 'student_001', 'subjects': {'math': {'tasks': {
+        'math_task_1': _task('completed', '2026-03-01T08:00:00.000Z', '2026-03-01T08:30:00.000Z'),
+        'math_task_2': _task('in_progress', '2026-03-01T09:00:00.000Z'),
+    }}}})
+    manager.save_student_progress('student_002', {'studentId': 'student_002', 'subjects': {'math': {'tasks': {
+        'math_task_1': _task('completed', '2026-03-02T08:00:00.000Z', '2026-03-02T09:30:00.000Z'),
+    }}}})
+
+    report = client.get('/api/analytics/subjects/math').get_json()
+    assert report['engine'] == engine
+    assert report['students'] == 2
+    assert report['progress']['mean'] == 50.0
+    assert report['completionMinutes'] == {
+        'count': 2, 'mean': 60.0,
+        'percentiles': {'p10': 36.0, 'p25': 45.0, 'p50': 60.0, 'p75': 75.0, 'p90': 84.0}
+    }
+    assert report['chapters'][0]['meanMinutes'] == 60.0
+    assert report['bottlenecks'] == [{
+        'taskId': 'math_task_2', 'taskName': '减法', 'levelId': 'math_level_1', 'chapterId': 'math_chapter_1',
+        'inProgress': 1, 'completed': 0, 'notStarted': 1, 'stallRate': 1.0, 'estimatedTime': 30,
+        'medianMinutes': None, 'meanMinutes': None
+    }]
+
+    # 用时统计只来自有完整时间的已完成任务
+    manager.save_student_progress('student_001', {'studentId': 'student_001', 'subjects': {'math': {'tasks': {
+        'math_task_1': _task('completed', '2026-03-01T08:00:00.000Z', '2026-03-01T08:10:00.000Z'),
+        'math_task_2': _task('completed', '2026-03-01T09:00:00.000Z', '2026-03-01T09:20:00.000Z'),
+    }}}})
+    report = client.get('/api/analytics/subjects/math').get_json()
+    assert report['completionMinutes']['count'] == 3
+    assert report['completionMinutes']['percentiles']['p50'] == 20.0
+    assert report['bottlenecks'] == []
+
+
+def _random_subject(rng):
+    levels = []
+    for level in range(2):
+        chapters = [{'id': f'c{level}{chapter}', 'name': f'第{chapter + 1}章', 'tasks': [
+            {'id': f't{level}{chapter}{task}', 'name': f'任务{task}', 'estimatedTime': 10}
+            for task in range(rng.randint(1, 5))
+        ]} for chapter in range(3)]
+        levels.append({'id': f'l{level}', 'chapters': chapters})
+    # 没有任务的章节
+    levels[-1]['chapters'].append({'id': 'empty', 'name': '空章节', 'tasks': []})
+    return SubjectIndex({'id': 'algebra', 'name': '代数', 'levels': levels})
+
+
+def _random_rows(rng, index, students):
+    rows = {}
+    for n in range(students):
+        entries = []
+        for task_id in index.tasks:
+            r = rng.random()
+            if r < 0.4:
+                continue
+            if r < 0.55:
+                entries.append((task_id, IN_PROGRESS, None))
+            else:
+                # 部分已完成任务缺少时间；用时取 0.25 的倍数，两种实现的求和都是精确的
+                entries.append((task_id, COMPLETED, None if rng.random() < 0.2 else rng.randint(0, 400) / 4))
+        # 已从科目结构中删除的任务被忽略
+        entries.append(('removed_task', COMPLETED, 5.0))
+        rows[f's{n}'] = tuple(entries)
+    rows['idle'] = ()
+    return rows
+
+
+@pytest.mark.skipif(analytics.np is None, reason='numpy 未安装')
+@pytest.mark.parametrize('students', [0, 1, 7, 300])
+def test_numpy_and_python_engines_agree(students, monkeypatch):
+    rng = random.Random(students)
+    index = _random_subject(rng)
+    rows = _random_rows(rng, index, students)
+
+    vectorized = cohort_report(index, CohortColumns(index, rows))
+    monkeypatch.setattr(analytics, 'np', None)
+    pure = cohort_report(index, CohortColumns(index, rows))
+
+    assert (vectorized.pop('engine'), pure.pop('engine')) == ('numpy', 'python')
+    assert vectorized == pure
+    assert pure['students'] == students + 1
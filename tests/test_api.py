@@ -0,0 +1,108 @@
+import models
+
+TASK_URL = '/api/students/student_001/subjects/math/tasks/{}'
+
+
+def patch_task(client, task_id, action, step=None):
+    body = {'action': action}
+    if step is not None:
+        body['step'] = step
+    return client.patch(TASK_URL.format(task_id), json=body)
+
+
+def test_task_status_transitions(client):
+    response = patch_task(client, 'math_task_1', 'start')
+    assert response.status_code == 200
+    task = response.get_json()['task']
+    assert task['status'] == 'in_progress'
+    assert task['currentStep'] == 0
+    assert task['startedAt'].endswith('Z')
+    assert len(task['stepProgress']) == 2
+
+    # 重复开始不改变进度
+    assert patch_task(client, 'math_task_1', 'start').get_json()['task'] == task
+
+    task = patch_task(client, 'math_task_1', 'complete', 0).get_json()['task']
+    assert task['status'] == 'in_progress'
+    assert task['currentStep'] == 1
+    assert task['stepProgress'][0]['completed'] and 'completedAt' in task['stepProgress'][0]
+
+    # 最后一步完成（含跳过）即任务完成，后继任务解锁
+    result = patch_task(client, 'math_task_1', 'skip', 1).get_json()
+    assert result['task']['status'] == 'completed'
+    assert result['task']['stepProgress'][1]['skipped'] is True
+    assert 'completedAt' in result['task']
+    assert result['unlockedTasks'] == ['math_task_2']
+    assert result['subjectProgress'] == {'progress': 50, 'completed': 1, 'total': 2}
+
+    # 取消完成一步回到进行中，后继任务重新锁定
+    result = patch_task(client, 'math_task_1', 'uncomplete', 0).get_json()
+    assert result['task']['status'] == 'in_progress'
+    assert result['task']['currentStep'] == 0
+    assert 'completedAt' not in result['task']
+    assert result['lockedTasks'] == ['math_task_2']
+
+    result = patch_task(client, 'math_task_1', 'reset').get_json()
+    assert result['task'] is None
+    progress = client.get('/api/students/student_001/progress').get_json()
+    assert 'math_task_1' not in progress['subjects']['math']['tasks']
+
+
+def test_task_patch_validation(client):
+    assert patch_task(client, 'math_task_2', 'start').status_code == 400  # 前置任务未完成
+    assert patch_task(client, 'math_task_1', 'fly').status_code == 400
+    assert patch_task(client, 'math_task_1', 'complete').status_code == 400
+    assert patch_task(client, 'math_task_1', 'complete', 5).status_code == 400
+    assert patch_task(client, 'missing', 'start').status_code == 404
+    assert client.patch(TASK_URL.format('math_task_1'), json={}).status_code == 400
+    # 校验失败不写入进度
+    progress = client.get('/api/students/student_001/progress').get_json()
+    assert progress['subjects']['math']['tasks'] == {}
+
+
+def test_student_if_match(client):
+    etag = client.get('/api/students/student_001').headers['ETag']
+
+    response = client.put('/api/students/student_001', json={'name': '小红'}, headers={'If-Match': '"stale"'})
+    assert response.status_code == 412
+    assert client.get('/api/students/student_001').get_json()['name'] == '小明'
+
+    response = client.put('/api/students/student_001', json={'name': '小红'}, headers={'If-Match': etag})
+    assert response.status_code == 200
+    new_etag = response.headers['ETag']
+    assert new_etag != etag
+    assert client.get('/api/students/student_001').headers['ETag'] == new_etag
+
+    # 旧版本不能再用于修改
+    response = client.put('/api/students/student_001', json={'name': '小刚'}, headers={'If-Match': etag})
+    assert response.status_code == 412
+
+
+def test_subject_if_match(client):
+    etag = client.get('/api/subjects/math').headers['ETag']
+
+    response = client.put('/api/subjects/math', json={'description': '新描述'}, headers={'If-Match': '"stale"'})
+    assert response.status_code == 412
+
+    response = client.put('/api/subjects/math', json={'description': '新描述'}, headers={'If-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    # 不带 If-Match 时直接修改
+    assert client.put('/api/subjects/math', json={'description': '再改'}).status_code == 200
+    # 单节点修改同样检查 If-Match
+    response = client.patch('/api/subjects/math/tasks/math_task_1', json={'name': '进位加法'},
+                            headers={'If-Match': etag})
+    assert response.status_code == 412
+
+
+def test_content_hash_cache_evicts_least_recently_used(manager, monkeypatch):
+    monkeypatch.setattr(models, 'CONTENT_HASH_CACHE_SIZE', 2)
+    manager._content_hashes.clear()
+    a, b, c = {'id': 'a'}, {'id': 'b'}, {'id': 'c'}
+    digest = manager._content_hash(a)
+    manager._content_hash(b)
+    assert manager._content_hash(a) == digest  # a 最近使用过
+    manager._content_hash(c)
+    assert [entry[0] for entry in manager._content_hashes.values()] == [a, c]
+    # 内容不同的新对象即使复用了 id 也不会命中旧哈希
+    assert manager._content_hash({'id': 'a', 'name': '甲'}) != digest
@@ -0,0 +1,77 @@
+import copy
+
+import pytest
+
+import api as api_module
+from app import create_app
+from conftest import STUDENT, SUBJECT
+from models import DataManager
+from storage import create_storage
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend_config(request, config):
+    config.STORAGE_BACKEND = request.param
+    return config
+
+
+COMPLETED = {'status': 'completed', 'currentStep': 0, 'completedAt': '2026-03-01T08:00:00.000Z'}
+
+
+def test_external_changes_refresh_only_affected_students(backend_config, monkeypatch):
+    manager = DataManager(create_storage(backend_config))
+    manager.add_subject(copy.deepcopy(SUBJECT))
+    manager.add_student(copy.deepcopy(STUDENT))
+    manager.add_student({'id': 'student_002', 'name': '小红', 'subjects': []})
+    assert manager.calculate_average_progress() == 0
+
+    consumed = []
+    consume_changes = manager.storage.consume_changes
+    monkeypatch.setattr(manager.storage, 'consume_changes', lambda: consumed.append(1) or consume_changes())
+    refreshed = []
+    refresh = manager._refresh_student_counters
+    monkeypatch.setattr(manager, '_refresh_student_counters', lambda sid: refreshed.append(sid) or refresh(sid))
+
+    # 另一个进程完成了一个任务：同步前计数查询不检查存储
+    other = create_storage(backend_config)
+    other.put_task_progress('student_001', 'math', 'math_task_1', COMPLETED, 50)
+    for _ in range(3):
+        assert manager.calculate_overall_progress('student_001') == 0
+    assert consumed == []
+
+    manager.sync_external_changes()
+    assert consumed == [1]
+    assert refreshed == ['student_001']
+    assert manager.calculate_subject_progress('student_001', 'math') == {'progress': 50, 'completed': 1, 'total': 2}
+
+    # 修改科目只重算拥有该科目的学生
+    refreshed.clear()
+    subject = copy.deepcopy(SUBJECT)
+    subject['levels'][0]['chapters'][0]['tasks'].pop()
+    other.put_subject(subject)
+    manager.sync_external_changes()
+    assert refreshed == ['student_001']
+    assert manager.calculate_subject_progress('student_001', 'math') == {'progress': 100, 'completed': 1, 'total': 1}
+
+    # 删除学生后移除其计数
+    refreshed.clear()
+    other.delete_student('student_001')
+    manager.sync_external_changes()
+    assert refreshed == []
+    assert manager.calculate_overall_progress('student_001') == 0
+    assert manager.calculate_average_progress() == 0
+    other.close()
+
+
+def test_requests_apply_external_changes(backend_config, monkeypatch):
+    manager = DataManager(create_storage(backend_config))
+    manager.add_subject(copy.deepcopy(SUBJECT))
+    manager.add_student(copy.deepcopy(STUDENT))
+    monkeypatch.setattr(api_module, 'data_manager', manager)
+    client = create_app().test_client()
+    assert client.get('/api/students/student_001/subjects/math/progress').get_json()['completed'] == 0
+
+    other = create_storage(backend_config)
+    other.put_task_progress('student_001', 'math', 'math_task_1', COMPLETED, 50)
+    assert client.get('/api/students/student_001/subjects/math/progress').get_json()['completed'] == 1
+    other.close()
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import make_config
+from models import DataManager
+from prerequisites import PrerequisiteGraph
+from storage import create_storage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_generate_data_smoke(tmp_path, backend):
+    data_dir = str(tmp_path / 'data')
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'tools', 'generate_data.py'), '--data-dir', data_dir,
+         '--backend', backend, '--students', '12', '--subjects', '2', '--levels', '2', '--chapters', '2',
+         '--tasks', '3', '--seed', '7'],
+        capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert '学生 12 个' in result.stdout
+
+    manager = DataManager(create_storage(make_config(data_dir, backend)))
+    students, subjects = manager.get_all_students(), manager.get_all_subjects()
+    assert len(students) == 12
+    assert len(subjects) == 2
+
+    completed_any = False
+    for subject in subjects:
+        tasks = {task['id']: task for level in subject['levels'] for chapter in level['chapters']
+                 for task in chapter['tasks']}
+        assert len(tasks) == 12
+        # 生成的前置关系无环且只引用已有任务
+        PrerequisiteGraph(tasks).validate()
+        for student in students:
+            if subject['id'] not in student['subjects']:
+                continue
+            progress = manager.get_student_progress(student['id'])['subjects'][subject['id']]['tasks']
+            for task_id, task in progress.items():
+                if task['status'] == 'completed':
+                    completed_any = True
+                    assert all(progress.get(p, {}).get('status') == 'completed'
+                               for p in tasks[task_id]['prerequisites'])
+    assert completed_any
+
+    # 数据目录非空时拒绝覆盖
+    again = subprocess.run([sys.executable, os.path.join(ROOT, 'tools', 'generate_data.py'), '--data-dir', data_dir],
+                           capture_output=True, text=True, timeout=60)
+    assert again.returncode != 0
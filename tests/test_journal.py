@@ -0,0 +1,52 @@
+import os
+
+from storage import JsonStorage
+
+
+def _task(status):
+    return {'status': status, 'currentStep': 0, 'startedAt': '2026-01-01T00:00:00.000Z'}
+
+
+def test_journal_replays_in_new_instance(config):
+    writer = JsonStorage(config)
+    writer.put_progress('s1', {'studentId': 's1', 'subjects': {'math': {'tasks': {}, 'totalProgress': 0}}})
+    writer.put_task_progress('s1', 'math', 't1', _task('in_progress'), 10)
+    writer.put_task_progress('s1', 'math', 't2', _task('completed'), 50)
+    writer.put_task_progress('s1', 'math', 't1', None, 50)
+
+    # 还没有压缩：分片不存在，进度只在日志中
+    assert not os.path.exists(os.path.join(config.PROGRESS_DIR, 's1.json'))
+    progress = JsonStorage(config).get_progress('s1')
+    assert progress['subjects']['math']['tasks'] == {'t2': _task('completed')}
+    assert progress['subjects']['math']['totalProgress'] == 50
+
+
+def test_compaction_writes_shards_and_rotates_journal(config):
+    storage = JsonStorage(config)
+    storage.put_progress('s1', {'studentId': 's1', 'subjects': {'math': {'tasks': {}, 'totalProgress': 0}}})
+    storage.put_task_progress('s1', 'math', 't1', _task('completed'), 100)
+    storage.put_progress('s2', {'studentId': 's2', 'subjects': {}})
+
+    assert storage.compact_progress_journal() == 2
+    assert not os.path.exists(config.PROGRESS_JOURNAL_FILE)
+    assert len(os.listdir(config.PROGRESS_JOURNAL_ARCHIVE_DIR)) == 1
+    assert os.path.exists(os.path.join(config.PROGRESS_DIR, 's1.json'))
+    # 日志为空时不再重复压缩
+    assert storage.compact_progress_journal() == 0
+
+    # 压缩后的修改叠加在分片之上，新实例回放后结果一致
+    storage.put_task_progress('s1', 'math', 't2', _task('in_progress'), 50)
+    reader = JsonStorage(config)
+    tasks = reader.get_progress('s1')['subjects']['math']['tasks']
+    assert tasks == {'t1': _task('completed'), 't2': _task('in_progress')}
+    assert reader.get_progress('s2') == {'studentId': 's2', 'subjects': {}}
+
+
+def test_other_instance_sees_rotation(config):
+    """另一个实例压缩（轮换日志）后，本实例改读分片，进度不丢失"""
+    first, second = JsonStorage(config), JsonStorage(config)
+    first.put_task_progress('s1', 'math', 't1', _task('completed'), 100)
+    assert second.get_progress('s1')['subjects']['math']['tasks']['t1']['status'] == 'completed'
+
+    first.compact_progress_journal()
+    assert second.get_progress('s1')['subjects']['math']['tasks']['t1']['status'] == 'completed'
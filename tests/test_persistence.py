@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+
+import pytest
+
+from persistence import FileLock, atomic_write_json
+from storage import JsonStorage, StorageError
+
+
+def test_atomic_write_replaces_file(tmp_path):
+    path = str(tmp_path / 'data.json')
+    atomic_write_json(path, [{'id': 1}])
+    atomic_write_json(path, [{'id': 2, 'name': '乙'}])
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == [{'id': 2, 'name': '乙'}]
+    assert os.listdir(tmp_path) == ['data.json']
+
+
+def test_failed_write_keeps_old_file(tmp_path):
+    path = str(tmp_path / 'data.json')
+    atomic_write_json(path, [1])
+    with pytest.raises(TypeError):
+        atomic_write_json(path, [object()])
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == [1]
+    # 临时文件已清理
+    assert os.listdir(tmp_path) == ['data.json']
+
+
+def test_file_lock_excludes_other_holders(tmp_path):
+    """不同 FileLock 实例（相当于不同进程）之间互斥；同一实例可重入"""
+    path = str(tmp_path / 'data.json')
+    first, second = FileLock(path), FileLock(path)
+    acquired = threading.Event()
+
+    def hold_second():
+        with second:
+            acquired.set()
+
+    with first:
+        with first:
+            worker = threading.Thread(target=hold_second)
+            worker.start()
+            assert not acquired.wait(0.2)
+    assert acquired.wait(5)
+    worker.join()
+
+
+def test_concurrent_writers_do_not_lose_updates(config):
+    """多个存储实例并发读改写同一个文件，每次修改都保留"""
+    def add_students(index):
+        storage = JsonStorage(config)
+        for n in range(10):
+            storage.put_student({'id': f's{index}_{n}', 'name': str(n)})
+
+    workers = [threading.Thread(target=add_students, args=(i,)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(JsonStorage(config).list_students()) == 40
+
+
+def _locked_elsewhere(path):
+    """另一个持有者（相当于其他进程）能否立即获得该文件的锁"""
+    lock = FileLock(path)
+    if lock.acquire(timeout=0.05):
+        lock.release()
+        return False
+    return True
+
+
+def test_transaction_locks_only_touched_files(config):
+    storage = JsonStorage(config)
+    storage.put_student({'id': 's1', 'name': '甲'})
+    with storage.transaction():
+        storage.put_task_progress('s1', 'math', 't1', {'status': 'in_progress'}, 0)
+        # 只读写进度：只持有进度日志的锁
+        assert _locked_elsewhere(config.PROGRESS_JOURNAL_FILE)
+        assert not _locked_elsewhere(config.STUDENTS_FILE)
+        assert not _locked_elsewhere(config.SUBJECTS_FILE)
+    with storage.transaction():
+        # 读取学生即锁定学生文件，直到事务结束
+        assert storage.get_student('s1')['name'] == '甲'
+        assert _locked_elsewhere(config.STUDENTS_FILE)
+        assert not _locked_elsewhere(config.SUBJECTS_FILE)
+        storage.put_student({'id': 's1', 'name': '乙'})
+    assert not _locked_elsewhere(config.STUDENTS_FILE)
+    assert not _locked_elsewhere(config.PROGRESS_JOURNAL_FILE)
+    assert storage.get_student('s1')['name'] == '乙'
+
+
+def test_task_progress_update_locks_only_journal(manager, config, monkeypatch):
+    locked = []
+    tx_lock = manager.storage._tx_lock
+    monkeypatch.setattr(manager.storage, '_tx_lock', lambda state, lock: locked.append(lock.lock_path)
+                        or tx_lock(state, lock))
+    assert manager.update_task_progress('student_001', 'math', 'math_task_1', 'start')
+    assert set(locked) == {FileLock(config.PROGRESS_JOURNAL_FILE).lock_path}
+
+
+def test_concurrent_read_modify_write_transactions(config):
+    """多个存储实例在事务内并发读改写同一个学生，不丢失修改也不报错"""
+    JsonStorage(config).put_student({'id': 's1', 'count': 0})
+
+    def increment():
+        storage = JsonStorage(config)
+        for _ in range(10):
+            with storage.transaction():
+                student = storage.get_student('s1')
+                storage.put_student({**student, 'count': student['count'] + 1})
+
+    workers = [threading.Thread(target=increment) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert JsonStorage(config).get_student('s1')['count'] == 40
+
+
+def test_out_of_order_lock_times_out_and_rolls_back(config):
+    config.LOCK_ORDER_TIMEOUT = 0.2
+    storage = JsonStorage(config)
+    holder = FileLock(config.STUDENTS_FILE)
+    with holder:
+        with pytest.raises(StorageError, match='超时'):
+            with storage.transaction():
+                storage.put_progress('s1', {'studentId': 's1', 'subjects': {}})
+                # 已持有进度日志锁，再等待学生文件的锁不会无限阻塞
+                storage.put_student({'id': 's1', 'name': '甲'})
+    assert storage.get_progress('s1') is None
+    assert not _locked_elsewhere(config.PROGRESS_JOURNAL_FILE)
@@ -0,0 +1,73 @@
+import copy
+
+import pytest
+
+from conftest import SUBJECT
+from prerequisites import PrerequisiteError, PrerequisiteGraph, UnlockState
+
+
+def graph(prerequisites):
+    return PrerequisiteGraph({task_id: {'prerequisites': prereqs} for task_id, prereqs in prerequisites.items()})
+
+
+def test_valid_graph_order():
+    g = graph({'a': [], 'b': ['a'], 'c': ['a', 'b'], 'd': []})
+    g.validate()
+    assert g.order == ['a', 'd', 'b', 'c']
+    assert g.cycle is None
+
+
+def test_unknown_prerequisite():
+    g = graph({'a': [], 'b': ['a', 'ghost']})
+    with pytest.raises(PrerequisiteError, match='unknown prerequisite ghost'):
+        g.validate()
+
+
+@pytest.mark.parametrize('prerequisites', [
+    {'a': ['a']},
+    {'a': ['b'], 'b': ['a']},
+    {'a': [], 'b': ['a', 'd'], 'c': ['b'], 'd': ['c']},
+])
+def test_cycle_detected(prerequisites):
+    g = graph(prerequisites)
+    assert g.cycle and g.cycle[0] == g.cycle[-1]
+    with pytest.raises(PrerequisiteError, match='cycle'):
+        g.validate()
+
+
+def test_unlock_state_tracks_completion():
+    state = UnlockState(graph({'a': [], 'b': ['a'], 'c': ['a', 'b']}))
+    assert state.available() == ['a']
+    assert state.sync({'a'}) == ({'b'}, set())
+    assert state.sync({'a', 'b'}) == ({'c'}, set())
+    assert state.sync({'b'}) == (set(), {'b', 'c'})
+
+
+def _subject_with(prerequisites):
+    subject = copy.deepcopy(SUBJECT)
+    for task in subject['levels'][0]['chapters'][0]['tasks']:
+        task['prerequisites'] = prerequisites.get(task['id'], [])
+    return subject
+
+
+def test_api_rejects_invalid_prerequisites(client):
+    cycle = _subject_with({'math_task_1': ['math_task_2'], 'math_task_2': ['math_task_1']})
+    response = client.put('/api/subjects/math', json={'levels': cycle['levels']})
+    assert response.status_code == 400
+    assert 'cycle' in response.get_json()['error']
+
+    unknown = _subject_with({'math_task_2': ['nope']})
+    response = client.put('/api/subjects/math', json={'levels': unknown['levels']})
+    assert response.status_code == 400
+    assert 'unknown prerequisite' in response.get_json()['error']
+
+    response = client.post('/api/subjects', json={**unknown, 'id': 'math2'})
+    assert response.status_code == 400
+    assert client.get('/api/subjects/math2').status_code == 404
+
+    response = client.patch('/api/subjects/math/tasks/math_task_1', json={'prerequisites': ['math_task_2']})
+    assert response.status_code == 400
+
+    # 无效修改都没有写入
+    task = client.get('/api/subjects/math').get_json()['levels'][0]['chapters'][0]['tasks'][0]
+    assert task['prerequisites'] == []
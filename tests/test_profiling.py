@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+import api as api_module
+from app import create_app
+
+
+@pytest.fixture
+def profiled_app(manager, monkeypatch, tmp_path):
+    monkeypatch.setattr(api_module, 'data_manager', manager)
+    app = create_app()
+    app.config.update(SECRET_KEY='secret', PROFILE_SAMPLE_RATE=0, PROFILE_DIR=str(tmp_path / 'profiles'))
+    return app
+
+
+def test_profiling_disabled_without_token(profiled_app):
+    profiled_app.config['PROFILE_TOKEN'] = None
+    client = profiled_app.test_client()
+    for token in ('secret', ''):
+        response = client.get('/api/students', headers={'X-Profile': token})
+        assert response.status_code == 200
+        assert 'X-Profile-Id' not in response.headers
+    assert not os.path.exists(profiled_app.config['PROFILE_DIR'])
+
+
+def test_profiling_with_token(profiled_app):
+    profiled_app.config['PROFILE_TOKEN'] = 'profile-token'
+    client = profiled_app.test_client()
+    assert 'X-Profile-Id' not in client.get('/api/students', headers={'X-Profile': 'secret'}).headers
+
+    response = client.get('/api/students', headers={'X-Profile': 'profile-token'})
+    profile_id = response.headers['X-Profile-Id']
+    assert response.headers['Server-Timing'].startswith('total;dur=')
+    assert os.path.exists(os.path.join(profiled_app.config['PROFILE_DIR'], profile_id + '.json'))
@@ -0,0 +1,30 @@
+from search import SNIPPET_LENGTH, SearchIndex
+
+PADDING = '复习' * SNIPPET_LENGTH
+
+
+def _index(description):
+    index = SearchIndex()
+    index.sync([{'id': 'math', 'name': '数学', 'levels': [{'id': 'l1', 'name': '初三', 'chapters': [{
+        'id': 'c1', 'name': '方程', 'tasks': [{'id': 't1', 'name': '练习', 'description': description, 'steps': []}]
+    }]}]}])
+    return index
+
+
+def test_snippet_for_multi_word_query():
+    index = _index(PADDING + ' Linear Algebra, basics of linear  algebra')
+    total, hits = index.search('linear algebra', kinds={'task'})
+    assert total == 1
+    assert hits[0]['field'] == 'description'
+    assert hits[0]['snippet'].startswith('…')
+    assert 'Linear Algebra' in hits[0]['snippet']
+
+    # 全角字符与标点按相同方式规范化
+    assert 'Linear Algebra' in index.search('ＬＩＮＥＡＲ-algebra', kinds={'task'})[1][0]['snippet']
+
+
+def test_snippet_for_cjk_query_across_punctuation():
+    index = _index(PADDING + '解一元二次方程（配方法）')
+    hit = index.search('二次方程 配方', kinds={'task'})[1][0]
+    assert '二次方程（配方法）' in hit['snippet']
+    assert hit['snippet'].startswith('…')
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from storage import JsonStorage, SqliteStorage, Storage
+
+
+class _Abort(Exception):
+    pass
+
+
+def test_transaction_commits(storage):
+    with storage.transaction():
+        storage.put_student({'id': 's1', 'name': '甲'})
+        storage.put_subject({'id': 'sub1', 'name': '科目', 'levels': []})
+    assert storage.get_student('s1')['name'] == '甲'
+    assert [subject['id'] for subject in storage.list_subjects()] == ['sub1']
+
+
+def test_transaction_rollback_discards_all_changes(storage):
+    storage.put_student({'id': 's1', 'name': '甲'})
+    storage.put_progress('s1', {'studentId': 's1', 'subjects': {'math': {'tasks': {}, 'totalProgress': 0}}})
+
+    with pytest.raises(_Abort):
+        with storage.transaction():
+            storage.put_student({'id': 's1', 'name': '乙'})
+            storage.put_student({'id': 's2', 'name': '丙'})
+            storage.delete_subject('missing')
+            storage.put_progress('s1', {'studentId': 's1', 'subjects': {}})
+            # 事务内能读到自己的修改
+            assert storage.get_student('s1')['name'] == '乙'
+            raise _Abort()
+
+    assert storage.get_student('s1')['name'] == '甲'
+    assert storage.get_student('s2') is None
+    assert 'math' in storage.get_progress('s1')['subjects']
+
+
+def test_nested_transaction_rolls_back_with_outer(storage):
+    with pytest.raises(_Abort):
+        with storage.transaction():
+            with storage.transaction():
+                storage.put_student({'id': 's1', 'name': '甲'})
+            raise _Abort()
+    assert storage.get_student('s1') is None
+
+
+def test_rollback_leaves_json_files_untouched(config):
+    storage = JsonStorage(config)
+    storage.put_student({'id': 's1', 'name': '甲'})
+    with open(config.STUDENTS_FILE, 'rb') as f:
+        before = f.read()
+
+    with pytest.raises(_Abort):
+        with storage.transaction():
+            storage.put_student({'id': 's2', 'name': '乙'})
+            storage.put_task_progress('s1', 'math', 't1', {'status': 'in_progress'}, 0)
+            raise _Abort()
+
+    with open(config.STUDENTS_FILE, 'rb') as f:
+        assert f.read() == before
+    assert not os.path.exists(config.PROGRESS_JOURNAL_FILE)
+
+
+def test_storage_interface_is_abstract():
+    with pytest.raises(TypeError):
+        Storage()
+
+    class Partial(Storage):
+        def transaction(self):
+            pass
+
+    # 缺少任一接口方法的实现都不能实例化
+    with pytest.raises(TypeError, match='list_students'):
+        Partial()
+    assert not JsonStorage.__abstractmethods__
+    assert not SqliteStorage.__abstractmethods__
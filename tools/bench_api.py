@@ -0,0 +1,340 @@
+"""API 基准测试：用 Flask 测试客户端并发访问 api.py 中的每个路由
+
+每个路由单独一轮：--workers 个线程共发出 --requests 个请求，统计
+  - 延迟 p50/p95/p99/平均值（毫秒）与吞吐量（请求/秒）
+  - 每个请求的请求体/响应体字节数，以及进程读写的字节数（/proc/self/io，仅 Linux）
+  - 状态码分布
+
+数据集先复制到临时目录再测试，原目录不会被修改。结果可写入 JSON，并与之前的结果对比：
+
+用法: python tools/generate_data.py --data-dir /tmp/bench-data --students 1000
+      python tools/bench_api.py --data-dir /tmp/bench-data --workers 8 --requests 400 --output run1.json
+      python tools/bench_api.py --data-dir /tmp/bench-data --output run2.json --compare run1.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 不适合按请求计时的路由
+SKIPPED_ENDPOINTS = {
+    'api.stream_events': '长连接事件流',
+}
+
+
+def percentile(samples, p):
+    """最近秩法求百分位数"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def process_io():
+    """进程累计读写字节数 (rchar, wchar)，不支持时返回 None"""
+    try:
+        with open('/proc/self/io') as f:
+            values = dict(line.split(': ') for line in f.read().splitlines())
+        return int(values['rchar']), int(values['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class Context:
+    """生成请求所需的样本数据（ID、可开始的任务等），并记录基准测试中新建的资源以便删除"""
+
+    def __init__(self, data_manager, seed):
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self.students = data_manager.get_all_students()
+        self.subject_ids = [subject['id'] for subject in data_manager.get_all_subjects()]
+        self.progress = {student['id']: data_manager.get_student_progress(student['id']) for student in self.students}
+        self.pairs = [(student['id'], subject_id) for student in self.students
+                      for subject_id in student.get('subjects', [])]
+        # (学生ID, 科目ID, 可开始的任务ID列表)
+        self.available = []
+        for student in self.students:
+            for subject_id in student.get('subjects', []):
+                tasks = data_manager.get_available_tasks(student['id'], subject_id) or {}
+                if tasks.get('available'):
+                    self.available.append((student['id'], subject_id, tasks['available']))
+        self.created_students = []
+        self.created_subjects = []
+
+    def next_number(self):
+        return next(self._counter)
+
+    def student(self):
+        with self._lock:
+            return self.rng.choice(self.students)
+
+    def student_subject(self):
+        with self._lock:
+            return self.rng.choice(self.pairs)
+
+    def subject_id(self):
+        with self._lock:
+            return self.rng.choice(self.subject_ids)
+
+    def task(self):
+        with self._lock:
+            student_id, subject_id, tasks = self.rng.choice(self.available)
+            return student_id, subject_id, self.rng.choice(tasks), self.rng.choice(['start', 'complete', 'uncomplete'])
+
+    def sample_students(self, count):
+        with self._lock:
+            return [s['id'] for s in self.rng.sample(self.students, min(count, len(self.students)))]
+
+    def pop(self, items):
+        with self._lock:
+            return items.pop() if items else None
+
+
+def _student_body(ctx, n):
+    return {'name': f'基准学生{n}', 'grade': '初一', 'subjects': ctx.subject_ids[:1]}
+
+
+def _subject_body(n):
+    return {
+        'id': f'bench_subject_{n}', 'name': f'基准科目{n}',
+        'levels': [{'id': f'bench_level_{n}', 'name': '阶段一', 'chapters': [
+            {'id': f'bench_chapter_{n}', 'name': '第1章', 'description': '', 'tasks': [
+                {'id': f'bench_task_{n}_{i}', 'name': f'任务{i}', 'estimatedTime': 30,
+                 'prerequisites': [f'bench_task_{n}_{i - 1}'] if i else [], 'steps': ['学习', '练习', '测试']}
+                for i in range(5)
+            ]}
+        ]}]
+    }
+
+
+def _task_request(ctx):
+    student_id, subject_id, task_id, action = ctx.task()
+    body = {'action': action} if action == 'start' else {'action': action, 'step': 0}
+    return f'/api/students/{student_id}/subjects/{subject_id}/tasks/{task_id}', body
+
+
+def _progress_request(ctx):
+    student_id = ctx.student()['id']
+    return f'/api/students/{student_id}/progress', ctx.progress[student_id]
+
+
+def _created(ctx, items, prefix):
+    created = ctx.pop(items)
+    return f'{prefix}/{created}' if created else f'{prefix}/missing', None
+
+
+# 端点 -> [(场景名, 方法, 生成 (URL, 请求体) 的函数)]；读取场景在前，删除场景最后
+SCENARIOS = {
+    'api.get_students': [
+        ('GET /students', 'GET', lambda ctx: ('/api/students', None)),
+        ('GET /students?limit=50&fields=id,name,overallProgress', 'GET',
+         lambda ctx: ('/api/students?limit=50&fields=id,name,overallProgress', None)),
+    ],
+    'api.get_student': [('GET /students/<id>', 'GET', lambda ctx: (f"/api/students/{ctx.student()['id']}", None))],
+    'api.get_subjects': [
+        ('GET /subjects', 'GET', lambda ctx: ('/api/subjects', None)),
+        ('GET /subjects?fields=id,name,taskCount', 'GET', lambda ctx: ('/api/subjects?fields=id,name,taskCount', None)),
+    ],
+    'api.get_subject': [('GET /subjects/<id>', 'GET', lambda ctx: (f'/api/subjects/{ctx.subject_id()}', None))],
+    'api.get_student_progress': [
+        ('GET /students/<id>/progress', 'GET', lambda ctx: (f"/api/students/{ctx.student()['id']}/progress", None))],
+    'api.get_subject_progress': [
+        ('GET /students/<id>/subjects/<sid>/progress', 'GET',
+         lambda ctx: ('/api/students/{}/subjects/{}/progress'.format(*ctx.student_subject()), None))],
+    'api.get_subject_rollup': [
+        ('GET /students/<id>/subjects/<sid>/rollup', 'GET',
+         lambda ctx: ('/api/students/{}/subjects/{}/rollup'.format(*ctx.student_subject()), None))],
+    'api.get_unlocked_tasks': [
+        ('GET /students/<id>/subjects/<sid>/unlocked', 'GET',
+         lambda ctx: ('/api/students/{}/subjects/{}/unlocked'.format(*ctx.student_subject()), None))],
+    'api.get_student_dashboard': [
+        ('GET /students/<id>/dashboard', 'GET', lambda ctx: (f"/api/students/{ctx.student()['id']}/dashboard", None))],
+    'api.get_subject_analytics': [
+        ('GET /analytics/subjects/<id>', 'GET', lambda ctx: (f'/api/analytics/subjects/{ctx.subject_id()}', None))],
+    'api.get_overall_stats': [('GET /stats/overall', 'GET', lambda ctx: ('/api/stats/overall', None))],
+    'api.get_metrics': [('GET /metrics', 'GET', lambda ctx: ('/api/metrics', None))],
+    'api.add_student': [('POST /students', 'POST', lambda ctx: ('/api/students', _student_body(ctx, ctx.next_number())))],
+    'api.update_student': [
+        ('PUT /students/<id>', 'PUT',
+         lambda ctx: (f"/api/students/{ctx.student()['id']}", {'notes': f'基准测试 {ctx.next_number()}'}))],
+    'api.save_student_progress': [
+        ('POST /students/<id>/progress', 'POST', _progress_request)],
+    'api.update_task_progress': [
+        ('PATCH /students/<id>/subjects/<sid>/tasks/<tid>', 'PATCH', _task_request)],
+    'api.add_subject': [('POST /subjects', 'POST', lambda ctx: ('/api/subjects', _subject_body(ctx.next_number())))],
+    'api.update_subject': [
+        ('PUT /subjects/<id>', 'PUT',
+         lambda ctx: (f'/api/subjects/{ctx.subject_id()}', {'description': f'基准测试 {ctx.next_number()}'}))],
+    'api.apply_batch': [
+        ('POST /batch', 'POST', lambda ctx: ('/api/batch', {'operations': [
+            {'op': 'updateStudent', 'id': student_id, 'data': {'notes': '批量基准测试'}}
+            for student_id in ctx.sample_students(5)
+        ]}))],
+    'api.add_subject_to_students': [
+        ('POST /batch/add-subject-to-students', 'POST',
+         lambda ctx: ('/api/batch/add-subject-to-students',
+                      {'subjectId': ctx.subject_id(), 'studentIds': ctx.sample_students(10)}))],
+    'api.delete_subject': [
+        ('DELETE /subjects/<id>', 'DELETE', lambda ctx: _created(ctx, ctx.created_subjects, '/api/subjects'))],
+    'api.delete_student': [
+        ('DELETE /students/<id>', 'DELETE', lambda ctx: _created(ctx, ctx.created_students, '/api/students'))],
+}
+
+
+def run_scenario(app, ctx, method, build, requests, workers, accept_encoding):
+    """并发执行一个场景，返回统计结果"""
+    local = threading.local()
+    headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+
+    def one(_):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        url, body = build(ctx)
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else None
+        start = time.perf_counter()
+        response = client.open(url, method=method, data=data, headers=headers,
+                               content_type='application/json' if data is not None else None)
+        payload = response.get_data()
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code in (200, 201) and method == 'POST' and url == '/api/students':
+            ctx.created_students.append(json.loads(payload)['id'])
+        elif response.status_code == 201 and url == '/api/subjects':
+            ctx.created_subjects.append(body['id'])
+        return elapsed, len(data or b''), len(payload), response.status_code
+
+    io_before = process_io()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        samples = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    io_after = process_io()
+
+    latencies = [sample[0] for sample in samples]
+    status = {}
+    for sample in samples:
+        status[str(sample[3])] = status.get(str(sample[3]), 0) + 1
+    return {
+        'method': method,
+        'requests': requests,
+        'status': status,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'throughput_rps': round(requests / wall, 1),
+        'request_bytes': round(sum(sample[1] for sample in samples) / requests),
+        'response_bytes': round(sum(sample[2] for sample in samples) / requests),
+        'io_read_bytes': round((io_after[0] - io_before[0]) / requests) if io_before and io_after else None,
+        'io_write_bytes': round((io_after[1] - io_before[1]) / requests) if io_before and io_after else None,
+    }
+
+
+def compare(current, previous_path):
+    """与之前的结果对比 p50/p95 与吞吐量的相对变化"""
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)['routes']
+    print(f'\n与 {previous_path} 对比（相对变化：延迟为正表示变慢，吞吐量为负表示变慢）')
+    print(f"  {'场景':<52}{'p50':>10}{'p95':>10}{'吞吐量':>10}")
+    for name, result in current.items():
+        old = previous.get(name)
+        if not old:
+            continue
+
+        def change(new, base):
+            return f'{(new - base) / base:+.0%}' if base else 'n/a'
+        print(f"  {name:<52}{change(result['p50_ms'], old['p50_ms']):>10}{change(result['p95_ms'], old['p95_ms']):>10}"
+              f"{change(result['throughput_rps'], old['throughput_rps']):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API 并发基准测试（Flask 测试客户端）')
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'data'), help='数据集目录（会先复制到临时目录）')
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    parser.add_argument('--accept-encoding', default='gzip', help="请求头 Accept-Encoding，'' 表示不压缩")
+    parser.add_argument('--only', help='只运行名称包含该字符串的场景')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的结果文件对比')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench-api-')
+    data_dir = os.path.join(work_dir, 'data')
+    shutil.copytree(args.data_dir, data_dir)
+    # 配置在导入时读取环境变量
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['STORAGE_BACKEND'] = args.backend
+    os.environ.pop('SQLITE_PATH', None)
+    # 访问日志会影响计时，默认只输出警告以上的日志
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import serialization
+    from app import create_app
+    from models import data_manager
+
+    try:
+        app = create_app()
+        ctx = Context(data_manager, args.seed)
+        covered = set(SCENARIOS) | set(SKIPPED_ENDPOINTS)
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint.startswith('api.') and rule.endpoint not in covered:
+                print(f'警告: 路由 {rule.rule}（{rule.endpoint}）没有基准测试场景')
+
+        print(f'数据集: {len(ctx.students)} 个学生, {len(ctx.subject_ids)} 个科目  '
+              f'后端: {args.backend}  并发: {args.workers}  每个场景 {args.requests} 个请求')
+        print(f"  {'场景':<52}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'响应字节':>10}{'写入字节':>10}")
+        results = {}
+        for endpoint, scenarios in SCENARIOS.items():
+            for name, method, build in scenarios:
+                if args.only and args.only not in name:
+                    continue
+                result = run_scenario(app, ctx, method, build, args.requests, args.workers, args.accept_encoding)
+                results[name] = {'endpoint': endpoint, **result}
+                print(f"  {name:<52}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                      f"{result['throughput_rps']:>9.0f}{result['response_bytes']:>10}"
+                      f"{result['io_write_bytes'] if result['io_write_bytes'] is not None else '-':>10}")
+        for endpoint, reason in SKIPPED_ENDPOINTS.items():
+            print(f'  跳过 {endpoint}: {reason}')
+
+        output = {
+            'meta': {
+                'time': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'encoder': 'orjson' if serialization.orjson is not None else 'json',
+                'backend': args.backend,
+                'data_dir': os.path.abspath(args.data_dir),
+                'students': len(ctx.students),
+                'subjects': len(ctx.subject_ids),
+                'workers': args.workers,
+                'requests': args.requests,
+                'accept_encoding': args.accept_encoding,
+            },
+            'routes': results,
+        }
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(output, f, ensure_ascii=False, indent=2)
+        if args.compare:
+            compare(results, args.compare)
+    finally:
+        data_manager.storage.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""序列化与响应压缩的基准测试
+
+用 data/subjects.json 对比：
+  - 文件大小：原缩进格式 / 紧凑格式 / gzip / br
+  - 编码与解析耗时：标准库 json（indent=2）与 serialization 模块（紧凑，安装 orjson 时使用 orjson）
+  - GET /api/subjects：Flask 默认 JSON 输出（不压缩）与 FastJSONProvider + 压缩 的耗时与字节数
+
+用法: python tools/bench_serialization.py [--iterations 200] [--output result.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import serialization  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def timed(func, iterations):
+    """运行 iterations 次，返回每次耗时的中位数（毫秒）"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_files(subjects, raw, iterations):
+    pretty = json.dumps(subjects, ensure_ascii=False, indent=2).encode('utf-8')
+    compact = serialization.dumps(subjects)
+    sizes = {
+        'file_bytes': len(raw),
+        'indent2_bytes': len(pretty),
+        'compact_bytes': len(compact),
+        'compact_gzip_bytes': len(gzip.compress(compact, compresslevel=Config.COMPRESS_LEVEL)),
+    }
+    if serialization.brotli is not None:
+        sizes['compact_br_bytes'] = len(serialization.compress(compact, 'br', Config.COMPRESS_LEVEL))
+
+    timings = {
+        'stdlib_dump_indent2_ms': timed(lambda: json.dumps(subjects, ensure_ascii=False, indent=2).encode('utf-8'),
+                                        iterations),
+        'dump_compact_ms': timed(lambda: serialization.dumps(subjects), iterations),
+        'stdlib_load_ms': timed(lambda: json.loads(raw), iterations),
+        'load_ms': timed(lambda: serialization.loads(raw), iterations),
+    }
+    return sizes, timings
+
+
+def bench_response(iterations):
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+
+    results = {}
+    for name, fast, accept_encoding in (
+            ('default_json', False, None),
+            ('fast_json', True, None),
+            ('fast_json_gzip', True, 'gzip'),
+            ('fast_json_br', True, 'br')):
+        if accept_encoding == 'br' and serialization.brotli is None:
+            continue
+        app = create_app()
+        if not fast:
+            app.json = DefaultJSONProvider(app)
+            app.config['COMPRESS_MIN_SIZE'] = 0
+        client = app.test_client()
+        headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+        response = client.get('/api/subjects', headers=headers)
+        results[name] = {
+            'bytes': len(response.data),
+            'content_encoding': response.headers.get('Content-Encoding'),
+            'median_ms': timed(lambda: client.get('/api/subjects', headers=headers), iterations),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='序列化与响应压缩基准测试（data/subjects.json）')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    with open(Config.SUBJECTS_FILE, 'rb') as f:
+        raw = f.read()
+    subjects = json.loads(raw)
+
+    sizes, timings = bench_files(subjects, raw, args.iterations)
+    result = {
+        'encoder': 'orjson' if serialization.orjson is not None else 'json',
+        'brotli': serialization.brotli is not None,
+        'iterations': args.iterations,
+        'sizes': sizes,
+        'timings': timings,
+        'response': bench_response(args.iterations),
+    }
+
+    print(f"编码器: {result['encoder']}  brotli: {result['brotli']}  迭代次数: {args.iterations}")
+    print('\n文件大小（字节）')
+    for key, value in sizes.items():
+        print(f'  {key:<24}{value:>10}  ({value / sizes["indent2_bytes"]:.0%})')
+    print('\n编码/解析耗时中位数（毫秒）')
+    for key, value in timings.items():
+        print(f'  {key:<24}{value:>10.3f}')
+    print('\nGET /api/subjects')
+    for key, value in result['response'].items():
+        print(f'  {key:<24}{value["bytes"]:>10} 字节 {value["median_ms"]:>10.3f} ms  {value["content_encoding"] or ""}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""生成大规模的模拟数据集（与 data/ 相同的结构），用于基准测试与压力测试
+
+  - 科目：可配置年级/章节/任务/步骤数，任务按概率依赖同章节前一任务或上一章节最后一个任务，形成前置链
+  - 学生：随机姓名、年级与 1~N 个科目
+  - 进度：按拓扑序推进，前置任务完成后以 --completion 的概率完成，另有部分任务进行中
+
+数据通过存储层写入（一个事务），JSON 与 SQLite 后端都可使用：
+
+用法: python tools/generate_data.py --data-dir /tmp/bench-data --students 1000 --subjects 8
+然后: DATA_DIR=/tmp/bench-data python app.py   或   python tools/bench_api.py --data-dir /tmp/bench-data
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from indexes import SubjectIndex  # noqa: E402
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾'
+GIVEN_NAMES = '子涵浩然一诺欣怡梓轩雨桐宇航思远佳怡俊杰诗雨博文嘉懿明哲若曦晨阳'
+GRADES = ['一年级', '二年级', '三年级', '四年级', '五年级', '六年级', '初一', '初二', '初三', '高一', '高二', '高三']
+AVATARS = ['👦', '👧', '🧒', '🐶', '🐱', '🦊', '🐼', '🤯']
+SUBJECT_NAMES = [('数学', '🧮'), ('语文', '📖'), ('英语', '🔤'), ('物理', '⚛️'), ('化学', '🧪'),
+                 ('生物', '🧬'), ('历史', '🏛️'), ('地理', '🌏'), ('编程', '💻'), ('美术', '🎨')]
+COLORS = ['#4285f4', '#ea4335', '#fbbc05', '#34a853', '#9c27b0', '#ff7043', '#00897b', '#5c6bc0']
+STEP_KINDS = ['基本概念', '符号定义', '现实意义', '训练', '测试', '复习', '拓展']
+TASK_TYPES = ['concept', 'skill', 'practice', 'project']
+# 进度时间分布在最近的天数内
+PROGRESS_DAYS = 90
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def generate_subject(rng: random.Random, number: int, args) -> dict:
+    """生成一个科目：levels -> chapters -> tasks -> steps，前置任务只引用之前的任务（保证无环）"""
+    name, icon = SUBJECT_NAMES[number % len(SUBJECT_NAMES)]
+    subject_id = f'subject_{number + 1:03d}'
+    levels = []
+    previous_task = None
+    for level_no in range(args.levels):
+        chapters = []
+        for chapter_no in range(args.chapters):
+            tasks = []
+            for task_no in range(args.tasks):
+                task_id = f'{subject_id}_task_{level_no + 1:02d}_{chapter_no + 1:02d}_{task_no + 1:02d}'
+                prerequisites = []
+                if previous_task and rng.random() < args.prereq_rate:
+                    prerequisites.append(previous_task)
+                # 偶尔再依赖一个更早的任务，形成分叉的依赖图
+                if tasks and rng.random() < args.prereq_rate / 4:
+                    prerequisites.append(rng.choice(tasks)['id'])
+                tasks.append({
+                    'id': task_id,
+                    'name': f'{name}任务 {level_no + 1}-{chapter_no + 1}-{task_no + 1}',
+                    'type': rng.choice(TASK_TYPES),
+                    'difficulty': rng.randint(1, 5),
+                    'estimatedTime': rng.choice([15, 20, 30, 45, 60, 90]),
+                    'prerequisites': list(dict.fromkeys(prerequisites)),
+                    'steps': [
+                        f'{STEP_KINDS[step_no % len(STEP_KINDS)]}：第{step_no + 1}步的学习内容说明。'
+                        for step_no in range(rng.randint(max(1, args.steps - 2), args.steps + 2))
+                    ]
+                })
+                previous_task = task_id
+            chapters.append({
+                'id': f'{subject_id}_chapter_{level_no + 1:02d}_{chapter_no + 1:02d}',
+                'name': f'第{chapter_no + 1}章',
+                'description': f'{name}第{level_no + 1}阶段第{chapter_no + 1}章的学习内容。',
+                'tasks': tasks
+            })
+        levels.append({'id': f'{subject_id}_level_{level_no + 1:02d}', 'name': f'{name}第{level_no + 1}阶段',
+                       'chapters': chapters})
+    return {
+        'id': subject_id,
+        'name': name if number < len(SUBJECT_NAMES) else f'{name}{number // len(SUBJECT_NAMES) + 1}',
+        'icon': icon,
+        'color': COLORS[number % len(COLORS)],
+        'description': f'模拟数据：{args.levels}个阶段，每阶段{args.chapters}章，每章{args.tasks}个任务',
+        'levels': levels
+    }
+
+
+def generate_student(rng: random.Random, number: int, subject_ids: list, args, now: datetime) -> dict:
+    created = now - timedelta(days=rng.randint(30, 365))
+    return {
+        'id': f'student_{number + 1:06d}',
+        'name': rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAMES) for _ in range(rng.randint(1, 2))),
+        'avatar': rng.choice(AVATARS),
+        'subjects': rng.sample(subject_ids, rng.randint(1, min(args.subjects_per_student, len(subject_ids)))),
+        'grade': rng.choice(GRADES),
+        'notes': '',
+        'createdAt': created.strftime('%Y-%m-%d'),
+        'lastUpdate': now.strftime('%Y-%m-%d')
+    }
+
+
+def generate_task_progress(rng: random.Random, task: dict, completed: bool, now: datetime) -> dict:
+    """与 DataManager 按步骤修改进度时产生的结构一致"""
+    steps_count = len(task['steps'])
+    started = now - timedelta(days=rng.uniform(1, PROGRESS_DAYS), minutes=rng.randint(0, 600))
+    done = steps_count if completed else rng.randint(0, steps_count - 1)
+    step_progress = []
+    moment = started
+    for step_no in range(steps_count):
+        if step_no < done:
+            moment += timedelta(minutes=rng.randint(2, 30))
+            step = {'completed': True, 'completedAt': _timestamp(moment)}
+            if rng.random() < 0.05:
+                step['skipped'] = True
+            step_progress.append(step)
+        else:
+            step_progress.append({'completed': False})
+    progress = {
+        'status': 'completed' if completed else 'in_progress',
+        'currentStep': done,
+        'startedAt': _timestamp(started),
+        'stepProgress': step_progress
+    }
+    if completed:
+        progress['completedAt'] = _timestamp(moment)
+    return progress
+
+
+def generate_progress(rng: random.Random, student: dict, subjects: dict, args, now: datetime) -> dict:
+    subjects_progress = {}
+    for subject_id in student['subjects']:
+        index = SubjectIndex(subjects[subject_id])
+        tasks_progress = {}
+        completed = set()
+        for task_id in index.graph.order:
+            if not index.graph.is_unlocked(task_id, completed):
+                continue
+            roll = rng.random()
+            if roll < args.completion:
+                tasks_progress[task_id] = generate_task_progress(rng, index.tasks[task_id], True, now)
+                completed.add(task_id)
+            elif roll < args.completion + args.in_progress:
+                tasks_progress[task_id] = generate_task_progress(rng, index.tasks[task_id], False, now)
+        subjects_progress[subject_id] = {
+            'currentLevel': 'grade_1',
+            'totalProgress': index.progress(completed)['progress'],
+            'tasks': tasks_progress
+        }
+    return {'studentId': student['id'], 'subjects': subjects_progress}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成模拟的学生/科目/进度数据集')
+    parser.add_argument('--data-dir', required=True, help='输出的数据目录（作为 DATA_DIR 使用）')
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--subjects-per-student', type=int, default=3, help='每个学生最多的科目数')
+    parser.add_argument('--levels', type=int, default=3, help='每个科目的年级/阶段数')
+    parser.add_argument('--chapters', type=int, default=4, help='每个阶段的章节数')
+    parser.add_argument('--tasks', type=int, default=6, help='每个章节的任务数')
+    parser.add_argument('--steps', type=int, default=5, help='每个任务的平均步骤数')
+    parser.add_argument('--prereq-rate', type=float, default=0.6, help='任务依赖前一个任务的概率')
+    parser.add_argument('--completion', type=float, default=0.5, help='已解锁任务被完成的概率')
+    parser.add_argument('--in-progress', type=float, default=0.1, help='已解锁任务处于进行中的概率')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='数据目录非空时仍然写入（覆盖同ID记录）')
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir)
+    if os.path.isdir(data_dir) and os.listdir(data_dir) and not args.force:
+        parser.error(f'{data_dir} 不为空，使用 --force 覆盖')
+    os.makedirs(data_dir, exist_ok=True)
+    # 预先写入空列表，避免存储层创建默认示例数据
+    for name in ('students.json', 'subjects.json'):
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('[]')
+
+    # 配置在导入时读取环境变量
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['STORAGE_BACKEND'] = args.backend
+    os.environ.pop('SQLITE_PATH', None)
+    from config import Config
+    from storage import create_storage
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    subjects = {}
+    for number in range(args.subjects):
+        subject = generate_subject(rng, number, args)
+        subjects[subject['id']] = subject
+    students = [generate_student(rng, number, list(subjects), args, now) for number in range(args.students)]
+
+    storage = create_storage(Config())
+    task_count = 0
+    with storage.transaction():
+        for subject in subjects.values():
+            storage.put_subject(subject)
+        for student in students:
+            storage.put_student(student)
+            progress = generate_progress(rng, student, subjects, args, now)
+            task_count += sum(len(data['tasks']) for data in progress['subjects'].values())
+            storage.put_progress(student['id'], progress)
+    storage.close()
+
+    per_subject = args.levels * args.chapters * args.tasks
+    print(f'已生成 {data_dir}（{args.backend}）')
+    print(f'  科目 {len(subjects)} 个，每个 {per_subject} 个任务')
+    print(f'  学生 {len(students)} 个，任务进度记录 {task_count} 条')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+import gzip
+import logging
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import serialization
+from indexes import SubjectIndex
+from prerequisites import PrerequisiteError
+from storage import Storage, StorageError
+
+logger = logging.getLogger(__name__)
+
+# 导出文件格式：第一行为 header，其后每行一条 {"type", "id", "data"} 记录
+FORMAT_NAME = 'education-manner'
+FORMAT_VERSION = 1
+# 记录类型，按导出顺序排列：学生引用科目，进度引用学生与科目，被引用的先出现
+RECORD_TYPES = ('subject', 'student', 'progress')
+
+
+class ImportFormatError(ValueError):
+    """导入流本身无效（如版本不受支持），导入中止"""
+
+
+class ImportRecordError(ValueError):
+    """单条记录无效，跳过该记录并写入报告"""
+
+
+# 导出
+def export_records(storage: Storage, types: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """逐条产生导出记录（header 在前，其后按 RECORD_TYPES 的顺序）
+
+    进度按学生逐个读取；导出不持有事务，期间发生的修改可能部分可见。
+    """
+    types = [t for t in RECORD_TYPES if types is None or t in set(types)]
+    yield {
+        'type': 'header',
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'exportedAt': datetime.now(timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
+        'types': types
+    }
+    if 'subject' in types:
+        for subject in storage.list_subjects():
+            yield {'type': 'subject', 'id': subject.get('id'), 'data': subject}
+    if 'student' in types:
+        for student in storage.list_students():
+            yield {'type': 'student', 'id': student.get('id'), 'data': student}
+    if 'progress' in types:
+        for student_id, progress in storage.iter_progress():
+            yield {'type': 'progress', 'id': student_id, 'data': progress}
+
+
+def encode_lines(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """每条记录编码为一行 JSON（NDJSON）"""
+    for record in records:
+        yield serialization.dumps(record) + b'\n'
+
+
+# 导入
+def read_lines(stream: BinaryIO, max_line_bytes: int) -> Iterator[Tuple[int, Optional[bytes]]]:
+    """逐行读取 (行号, 内容)；超过 max_line_bytes 的行不放入内存，内容为 None"""
+    line_no = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        line_no += 1
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # 丢弃该行的剩余部分
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            yield line_no, None
+            continue
+        yield line_no, line
+
+
+def open_stream(stream: BinaryIO, encoding: Optional[str] = None) -> BinaryIO:
+    """按 Content-Encoding（或 .gz 文件）解压输入流"""
+    if encoding == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if encoding not in (None, '', 'identity'):
+        raise ImportFormatError(f'Unsupported content encoding: {encoding}')
+    return stream
+
+
+class Importer:
+    """按批导入 NDJSON 记录
+
+    输入按行读取，每批最多 batch_size 条记录、batch_bytes 字节，在一个事务内提交，
+    内存占用与输入大小无关。每条记录写入前校验：
+      - 科目：id、name 必填，前置任务必须引用本科目中的任务且无循环
+      - 学生：id、name 必填，subjects 中的科目必须已存在（库中或本次导入中更早的记录）
+      - 进度：学生必须已存在，subjects 中的科目与任务必须存在
+    无效记录跳过并写入报告（最多 max_errors 条明细），不影响同一批的其他记录；
+    存储失败时当前批次回滚，导入中止。skip_existing 时跳过ID已存在的记录，否则整体替换。
+    dry_run 只校验不写入。每批提交后调用 on_batch(报告, 本批变化)。
+    """
+
+    def __init__(self, storage: Storage, batch_size: int = 500, batch_bytes: int = 8 * 1024 * 1024,
+                 max_line_bytes: int = 16 * 1024 * 1024, max_errors: int = 100, dry_run: bool = False,
+                 skip_existing: bool = False,
+                 on_batch: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None):
+        self.storage = storage
+        self.batch_size = max(1, batch_size)
+        self.batch_bytes = batch_bytes
+        self.max_line_bytes = max_line_bytes
+        self.max_errors = max_errors
+        self.dry_run = dry_run
+        self.skip_existing = skip_existing
+        self.on_batch = on_batch
+        # 本次导入涉及的科目索引（校验进度中的任务ID）；科目数量有限，全部保留
+        self._indexes: Dict[str, Optional[SubjectIndex]] = {}
+        # 试运行时不写入存储，记录流中已出现的学生ID供后续引用校验
+        self._pending_students: Set[str] = set()
+        self.report: Dict[str, Any] = {
+            'dryRun': dry_run,
+            'lines': 0,
+            'batches': 0,
+            'imported': {record_type: 0 for record_type in RECORD_TYPES},
+            'skipped': 0,
+            'failed': 0,
+            'errors': [],
+            'aborted': False
+        }
+
+    def run(self, stream: BinaryIO) -> Dict[str, Any]:
+        """读取整个输入流并导入，返回报告"""
+        started = time.perf_counter()
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        chunk_bytes = 0
+        try:
+            for line_no, line in read_lines(stream, self.max_line_bytes):
+                self.report['lines'] = line_no
+                record = self._parse(line_no, line)
+                if record is None:
+                    continue
+                chunk.append((line_no, record))
+                chunk_bytes += len(line)
+                if len(chunk) >= self.batch_size or chunk_bytes >= self.batch_bytes:
+                    self._flush(chunk)
+                    chunk, chunk_bytes = [], 0
+            if chunk:
+                self._flush(chunk)
+        except ImportFormatError as e:
+            logger.error("导入中止（第 %d 行）: %s", self.report['lines'], e)
+            self.report['aborted'] = True
+            self.report['error'] = str(e)
+        except StorageError as e:
+            # 当前批次已回滚，之前提交的批次保留
+            logger.error("导入中止（第 %d 行）: %s", self.report['lines'], e)
+            self.report['aborted'] = True
+            self.report['error'] = f'Storage error: {e}'
+        except (OSError, EOFError) as e:
+            # 压缩数据损坏或被截断
+            logger.error("导入中止（第 %d 行）: 读取输入失败: %s", self.report['lines'], e)
+            self.report['aborted'] = True
+            self.report['error'] = 'Invalid compressed input'
+        self.report['elapsedMs'] = round((time.perf_counter() - started) * 1000, 1)
+        return self.report
+
+    def _parse(self, line_no: int, line: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        """解析一行；空行、header 与无效行返回 None"""
+        if line is None:
+            self._fail(line_no, None, f'Line exceeds {self.max_line_bytes} bytes')
+            return None
+        if not line.strip():
+            return None
+        try:
+            record = serialization.loads(line)
+        except ValueError:
+            self._fail(line_no, None, 'Invalid JSON')
+            return None
+        if not isinstance(record, dict):
+            self._fail(line_no, None, 'Record must be an object')
+            return None
+
+        record_type = record.get('type')
+        if record_type == 'header':
+            if record.get('format') != FORMAT_NAME or not isinstance(record.get('version'), int):
+                raise ImportFormatError('Unknown export format')
+            if record['version'] > FORMAT_VERSION:
+                raise ImportFormatError(f"Unsupported export version: {record['version']}")
+            return None
+        if record_type not in RECORD_TYPES:
+            self._fail(line_no, record, f'Unknown record type: {record_type}')
+            return None
+        if not isinstance(record.get('data'), dict):
+            self._fail(line_no, record, 'Record data must be an object')
+            return None
+        return record
+
+    def _flush(self, chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """在一个事务内写入一批记录；提交后才计入报告"""
+        imported = {record_type: 0 for record_type in RECORD_TYPES}
+        changes: Dict[str, Any] = {'subjects': {}, 'students': set(), 'progress': set()}
+        skipped = 0
+        # 试运行不写入，也不需要事务
+        with nullcontext() if self.dry_run else self.storage.transaction():
+            for line_no, record in chunk:
+                try:
+                    if self._apply(record, changes):
+                        imported[record['type']] += 1
+                    else:
+                        skipped += 1
+                except ImportRecordError as e:
+                    self._fail(line_no, record, str(e))
+
+        report = self.report
+        report['batches'] += 1
+        report['skipped'] += skipped
+        for record_type, count in imported.items():
+            report['imported'][record_type] += count
+        logger.info("导入第 %d 批: 已处理 %d 行，导入 %s，跳过 %d 条，失败 %d 条", report['batches'],
+                    report['lines'], report['imported'], report['skipped'], report['failed'])
+        if self.on_batch:
+            self.on_batch(report, changes)
+
+    def _fail(self, line_no: int, record: Optional[Dict[str, Any]], error: str) -> None:
+        self.report['failed'] += 1
+        if len(self.report['errors']) < self.max_errors:
+            self.report['errors'].append({
+                'line': line_no,
+                'type': record.get('type') if record else None,
+                'id': _record_id(record) if record else None,
+                'error': error
+            })
+
+    def _apply(self, record: Dict[str, Any], changes: Dict[str, Any]) -> bool:
+        """校验并写入一条记录（在批次事务内）；因已存在而跳过时返回 False，无效时抛出 ImportRecordError
+
+        写入的记录登记在 changes 中（试运行时不登记），供提交后刷新缓存。
+        """
+        record_type = record['type']
+        record_id = _record_id(record)
+        if not isinstance(record_id, str) or not record_id:
+            raise ImportRecordError('Record ID is required')
+        data = record['data']
+
+        if record_type == 'subject':
+            if data.get('id', record_id) != record_id:
+                raise ImportRecordError('Record ID does not match data')
+            if self.skip_existing and self.storage.get_subject(record_id):
+                return False
+            subject = {**data, 'id': record_id}
+            index = self._validate_subject(subject)
+            self._indexes[record_id] = index
+            if not self.dry_run:
+                self.storage.put_subject(subject)
+                changes['subjects'][record_id] = index
+            return True
+
+        if record_type == 'student':
+            if data.get('id', record_id) != record_id:
+                raise ImportRecordError('Record ID does not match data')
+            if self.skip_existing and self._student_exists(record_id):
+                return False
+            student = {**data, 'id': record_id}
+            self._validate_student(student)
+            if self.dry_run:
+                self._pending_students.add(record_id)
+            else:
+                self.storage.put_student(student)
+                changes['students'].add(record_id)
+            return True
+
+        if not self._student_exists(record_id):
+            raise ImportRecordError(f'Unknown student: {record_id}')
+        if self.skip_existing and self.storage.get_progress(record_id) is not None:
+            return False
+        self._validate_progress(data)
+        if not self.dry_run:
+            self.storage.put_progress(record_id, {**data, 'studentId': record_id})
+            changes['progress'].add(record_id)
+        return True
+
+    def _validate_subject(self, subject: Dict[str, Any]) -> SubjectIndex:
+        if not isinstance(subject.get('name'), str) or not subject['name']:
+            raise ImportRecordError('Subject name is required')
+        if not isinstance(subject.get('levels', []), list):
+            raise ImportRecordError('Subject levels must be a list')
+        try:
+            index = SubjectIndex(subject)
+            index.graph.validate()
+        except PrerequisiteError as e:
+            raise ImportRecordError(str(e)) from e
+        except (AttributeError, TypeError) as e:
+            raise ImportRecordError('Invalid subject structure') from e
+        return index
+
+    def _validate_student(self, student: Dict[str, Any]) -> None:
+        if not isinstance(student.get('name'), str) or not student['name']:
+            raise ImportRecordError('Student name is required')
+        subjects = student.get('subjects', [])
+        if not isinstance(subjects, list) or not all(isinstance(s, str) for s in subjects):
+            raise ImportRecordError('Student subjects must be a list of IDs')
+        for subject_id in subjects:
+            if self._subject_index(subject_id) is None:
+                raise ImportRecordError(f'Unknown subject: {subject_id}')
+
+    def _validate_progress(self, progress: Dict[str, Any]) -> None:
+        subjects = progress.get('subjects', {})
+        if not isinstance(subjects, dict):
+            raise ImportRecordError('Progress subjects must be an object')
+        for subject_id, subject_progress in subjects.items():
+            index = self._subject_index(subject_id)
+            if index is None:
+                raise ImportRecordError(f'Unknown subject: {subject_id}')
+            subject_progress = subject_progress or {}
+            tasks = subject_progress.get('tasks') or {} if isinstance(subject_progress, dict) else None
+            if not isinstance(tasks, dict):
+                raise ImportRecordError(f'Invalid progress for subject {subject_id}')
+            unknown = next((task_id for task_id in tasks if task_id not in index.task_ids), None)
+            if unknown is not None:
+                raise ImportRecordError(f'Unknown task: {subject_id}/{unknown}')
+
+    def _subject_index(self, subject_id: str) -> Optional[SubjectIndex]:
+        """科目索引：本次导入过的科目，或存储中已有的科目（不存在时为 None）"""
+        if subject_id not in self._indexes:
+            subject = self.storage.get_subject(subject_id)
+            self._indexes[subject_id] = SubjectIndex(subject) if subject else None
+        return self._indexes[subject_id]
+
+    def _student_exists(self, student_id: str) -> bool:
+        return student_id in self._pending_students or self.storage.get_student(student_id) is not None
+
+
+def _record_id(record: Dict[str, Any]) -> Any:
+    data = record.get('data') if isinstance(record.get('data'), dict) else {}
+    return record.get('id') or data.get('id') or data.get('studentId')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from config import Config
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(
+        description='以 NDJSON 导出/导入学生、科目与进度（数据目录与后端由 DATA_DIR、STORAGE_BACKEND 指定）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='导出到文件（默认标准输出）')
+    export_parser.add_argument('-o', '--output', help='输出文件，以 .gz 结尾时压缩')
+    export_parser.add_argument('--types', default=','.join(RECORD_TYPES),
+                               help='导出的记录类型，逗号分隔（subject,student,progress）')
+    import_parser = subparsers.add_parser('import', help='从文件（- 为标准输入）导入')
+    import_parser.add_argument('input', help='NDJSON 文件，以 .gz 结尾时解压')
+    import_parser.add_argument('--batch-size', type=int, default=Config.IMPORT_BATCH_SIZE, help='每批提交的记录数')
+    import_parser.add_argument('--dry-run', action='store_true', help='只校验，不写入')
+    import_parser.add_argument('--skip-existing', action='store_true', help='跳过ID已存在的记录（默认整体替换）')
+    args = parser.parse_args()
+
+    config = Config()
+    storage = create_storage(config)
+    if args.command == 'export':
+        types = [t.strip() for t in args.types.split(',') if t.strip()]
+        if not set(types) <= set(RECORD_TYPES):
+            parser.error(f"--types 只能包含 {', '.join(RECORD_TYPES)}")
+        if args.output:
+            output = gzip.open(args.output, 'wb') if args.output.endswith('.gz') else open(args.output, 'wb')
+        else:
+            output = sys.stdout.buffer
+        counts = {record_type: 0 for record_type in types}
+        with output:
+            for record in export_records(storage, types):
+                if record['type'] in counts:
+                    counts[record['type']] += 1
+                output.write(serialization.dumps(record) + b'\n')
+        print(f"导出完成: {counts}", file=sys.stderr)
+        storage.close()
+    else:
+        def show_progress(report: Dict[str, Any], _changes: Dict[str, Any]) -> None:
+            print(f"第 {report['batches']} 批: {report['lines']} 行，导入 {report['imported']}，"
+                  f"跳过 {report['skipped']}，失败 {report['failed']}", file=sys.stderr)
+
+        if args.input == '-':
+            source = sys.stdin.buffer
+        else:
+            source = gzip.open(args.input, 'rb') if args.input.endswith('.gz') else open(args.input, 'rb')
+        importer = Importer(storage, batch_size=args.batch_size, batch_bytes=config.IMPORT_BATCH_BYTES,
+                            max_line_bytes=config.IMPORT_MAX_LINE_BYTES, max_errors=config.IMPORT_MAX_ERRORS,
+                            dry_run=args.dry_run, skip_existing=args.skip_existing, on_batch=show_progress)
+        with source:
+            result = importer.run(source)
+        print(serialization.dumps_text(result, pretty=True))
+        storage.close()
+        sys.exit(1 if result['aborted'] or result['failed'] else 0)